@@ -5,27 +5,55 @@ Supports: Create, Read, Update, Delete with exceptions, Advanced date/time parsi
 
 import os
 import json
+import asyncio
+import contextvars
+import functools
+import hmac
+import hashlib
+import uuid
 import datetime
+import email.utils
 import re
-from typing import Optional, Dict
+import bisect
+import itertools
+import random
+import threading
+import time
+import io
+import shutil
+import subprocess
+import wave
+import zlib
+import math
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from concurrent.futures import wait as futures_wait
+from contextlib import contextmanager
+from typing import Optional, Dict, NamedTuple
 
+import numpy as np
 import gradio as gr
 from fastapi import FastAPI, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from starlette.middleware.sessions import SessionMiddleware
 
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError
 
 from google_auth_oauthlib.flow import Flow
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient import discovery_cache
+from googleapiclient.errors import HttpError
 from google.auth.transport.requests import Request as GoogleRequest
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 
 from dateutil import parser
 import pytz
 
-from groq import Groq
+from groq import Groq, AsyncGroq, APIConnectionError
 
 # ================== ENV ==================
 
@@ -35,7 +63,128 @@ GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 SESSION_SECRET = os.getenv("SESSION_SECRET", "change-me")
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
-groq_client = Groq(api_key=GROQ_API_KEY)
+# "two_step" (classify, then extract), "combined" (one JSON-mode call) or "ab" (split users)
+LLM_EXTRACTION_MODE = os.getenv("LLM_EXTRACTION_MODE", "two_step")
+LLM_COMBINED_AB_PERCENT = int(os.getenv("LLM_COMBINED_AB_PERCENT", "50"))
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "86400"))
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")  # "memory" or "postgres"
+
+# Model routing: classification and simple extraction try the small model first and
+# escalate to the large one on low confidence or a reply that fails validation
+LLM_MODELS = {
+    "small": os.getenv("LLM_MODEL_SMALL", "llama-3.1-8b-instant"),
+    "large": os.getenv("LLM_MODEL_LARGE", "llama-3.3-70b-versatile"),
+}
+LLM_ROUTING_ENABLED = os.getenv("LLM_ROUTING_ENABLED", "1") == "1"
+LLM_ESCALATE_CONFIDENCE = float(os.getenv("LLM_ESCALATE_CONFIDENCE", "0.7"))
+LLM_COMPACT_PROMPTS = os.getenv("LLM_COMPACT_PROMPTS", "1") == "1"
+
+# Resilience around Groq and Google calls: an overall deadline per call, jittered retries of
+# transient failures (reads only, for Google), a hedged duplicate once an attempt outlives the
+# recent p95, and a circuit breaker per provider that fails fast while it is down
+RESILIENCE_ENABLED = os.getenv("RESILIENCE_ENABLED", "1") == "1"
+GROQ_DEADLINE = float(os.getenv("GROQ_DEADLINE", "20"))
+WHISPER_DEADLINE = float(os.getenv("WHISPER_DEADLINE", "30"))
+GOOGLE_DEADLINE = float(os.getenv("GOOGLE_DEADLINE", "20"))
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "10"))  # socket timeout per Calendar request
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.2"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "2"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "1") == "1"
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# Per-stage latency histograms on /metrics (Prometheus text format), in seconds
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+METRICS_BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_BUCKETS", "0.001,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30").split(","))
+
+# Threads for the psycopg2 / googleapiclient calls the async chat pipeline still makes
+BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", "32"))
+
+# Start the likely criteria extraction alongside classify_intent (opt-in)
+SPECULATIVE_EXTRACTION = os.getenv("SPECULATIVE_EXTRACTION", "0") == "1"
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+CREDS_CACHE_SIZE = int(os.getenv("CREDS_CACHE_SIZE", "256"))
+CREDS_CACHE_TTL = float(os.getenv("CREDS_CACHE_TTL", "300"))
+
+# One entry per user per thread that talks to Calendar for them
+SERVICE_CACHE_SIZE = int(os.getenv("SERVICE_CACHE_SIZE", "1024"))
+SERVICE_CACHE_TTL = float(os.getenv("SERVICE_CACHE_TTL", "1800"))
+
+TOKEN_REFRESH_ENABLED = os.getenv("TOKEN_REFRESH_ENABLED", "1") == "1"
+TOKEN_REFRESH_INTERVAL = float(os.getenv("TOKEN_REFRESH_INTERVAL", "60"))
+TOKEN_REFRESH_JITTER = float(os.getenv("TOKEN_REFRESH_JITTER", "0.2"))
+TOKEN_REFRESH_LEAD = float(os.getenv("TOKEN_REFRESH_LEAD", "600"))
+TOKEN_REFRESH_ACTIVE_WINDOW = float(os.getenv("TOKEN_REFRESH_ACTIVE_WINDOW", "3600"))
+TOKEN_REFRESH_CONCURRENCY = int(os.getenv("TOKEN_REFRESH_CONCURRENCY", "4"))
+
+EVENT_MIRROR_ENABLED = os.getenv("EVENT_MIRROR_ENABLED", "1") == "1"
+EVENT_MIRROR_SYNC_INTERVAL = float(os.getenv("EVENT_MIRROR_SYNC_INTERVAL", "30"))
+EVENT_MIRROR_USERS = int(os.getenv("EVENT_MIRROR_USERS", "256"))
+EVENT_MIRROR_TTL = float(os.getenv("EVENT_MIRROR_TTL", "3600"))
+EVENT_MIRROR_PUSH_INTERVAL = float(os.getenv("EVENT_MIRROR_PUSH_INTERVAL", "900"))
+
+EVENT_PAGE_SIZE = int(os.getenv("EVENT_PAGE_SIZE", "50"))
+EVENT_PREFETCH = os.getenv("EVENT_PREFETCH", "1") == "1"
+
+# Public HTTPS address of /calendar/notifications; push notifications are off when unset
+CALENDAR_WEBHOOK_URL = os.getenv("CALENDAR_WEBHOOK_URL")
+CALENDAR_WATCH_TTL = int(os.getenv("CALENDAR_WATCH_TTL", "604800"))
+CALENDAR_WATCH_RENEW_BEFORE = float(os.getenv("CALENDAR_WATCH_RENEW_BEFORE", "86400"))
+
+# Voice input: downmix/resample/trim/re-encode before the Whisper upload
+AUDIO_PREPROCESS = os.getenv("AUDIO_PREPROCESS", "1") == "1"
+AUDIO_SAMPLE_RATE = int(os.getenv("AUDIO_SAMPLE_RATE", "16000"))
+AUDIO_CODEC = os.getenv("AUDIO_CODEC", "opus")  # "opus" (needs ffmpeg) or "wav"
+AUDIO_OPUS_BITRATE = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+AUDIO_VAD_MIN_RMS = float(os.getenv("AUDIO_VAD_MIN_RMS", "200"))
+AUDIO_VAD_PAD_MS = int(os.getenv("AUDIO_VAD_PAD_MS", "250"))
+# Hands-free voice mode: transcribe segments while the user speaks, auto-submit at end of utterance
+VOICE_STREAMING = os.getenv("VOICE_STREAMING", "1") == "1"
+VOICE_STREAM_EVERY = float(os.getenv("VOICE_STREAM_EVERY", "0.5"))
+VOICE_PAUSE_MS = int(os.getenv("VOICE_PAUSE_MS", "300"))
+VOICE_END_SILENCE_MS = int(os.getenv("VOICE_END_SILENCE_MS", "900"))
+VOICE_MAX_SEGMENT_S = float(os.getenv("VOICE_MAX_SEGMENT_S", "8"))
+# A session that gets no chunk for this long belongs to a tab that went away mid-stream
+VOICE_SESSION_TTL = float(os.getenv("VOICE_SESSION_TTL", "120"))
+VOICE_SESSION_MAX = int(os.getenv("VOICE_SESSION_MAX", "256"))
+# Local intent classifier: confident predictions skip the classify LLM call
+INTENT_LOCAL_ENABLED = os.getenv("INTENT_LOCAL_ENABLED", "1") == "1"
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "intent_classifier.json"))
+INTENT_LOCAL_THRESHOLD = float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.8"))
+# Delete/update act on the calendar, so they need more confidence, and never skip the LLM
+# when the message negates or chains commands ("don't cancel…", "thanks, now delete…")
+INTENT_LOCAL_DESTRUCTIVE_THRESHOLD = float(os.getenv("INTENT_LOCAL_DESTRUCTIVE_THRESHOLD", "0.9"))
+# JSONL log of (message, LLM intent, latency) pairs to retrain from; off when unset
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH")
+
+# Rule-based delete/update argument parsing; the LLM only sees what the rules can't fully explain
+ARGS_RULES_ENABLED = os.getenv("ARGS_RULES_ENABLED", "1") == "1"
+ARGS_RULES_THRESHOLD = float(os.getenv("ARGS_RULES_THRESHOLD", "1.0"))
+
+# Nominal uplink used to turn bytes saved into an upload-time estimate in the logs
+AUDIO_UPLINK_KBPS = float(os.getenv("AUDIO_UPLINK_KBPS", "1000"))
+
+INDIA_TZ = pytz.timezone('Asia/Kolkata')
+
+# Resolved slot/criteria dates and times and parsed event timestamps
+DATETIME_CACHE_SIZE = int(os.getenv("DATETIME_CACHE_SIZE", "4096"))
+DATETIME_CACHE_TTL = float(os.getenv("DATETIME_CACHE_TTL", "86400"))
+
+# With the resilience layer on, retries are ours (bounded by the deadline), not the SDK's
+groq_client = Groq(api_key=GROQ_API_KEY, max_retries=0 if RESILIENCE_ENABLED else 2)
+async_groq_client = AsyncGroq(api_key=GROQ_API_KEY, max_retries=0 if RESILIENCE_ENABLED else 2)
 
 SCOPES = [
     "https://www.googleapis.com/auth/calendar",
@@ -50,10 +199,981 @@ REDIRECT_URI = os.getenv("REDIRECT_URI", "https://amanansari.voicecalendaragent.
 app = FastAPI()
 app.add_middleware(SessionMiddleware, secret_key=SESSION_SECRET)
 
+# ================== ASYNC RUNTIME ==================
+
+blocking_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="blocking")
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run a blocking call on the bounded pool without tying up the event loop"""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()  # keeps current_intent for the spans fn opens
+    return await loop.run_in_executor(blocking_executor, functools.partial(context.run, fn, *args, **kwargs))
+
+async def stream_blocking(fn, *args, **kwargs):
+    """Run fn(*args, progress=callback, **kwargs) on the blocking pool.
+
+    Yields ("progress", [messages]) whenever fn reports progress from its thread, batching
+    whatever queued up in the meantime, and finally ("result", return value).
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def progress(message):
+        loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    context = contextvars.copy_context()
+    future = loop.run_in_executor(blocking_executor, functools.partial(context.run, fn, *args, progress=progress, **kwargs))
+    getter = None
+    while True:
+        if getter is None:
+            getter = asyncio.ensure_future(queue.get())
+        done, _ = await asyncio.wait({getter, future}, return_when=asyncio.FIRST_COMPLETED)
+        if getter not in done:
+            getter.cancel()
+            break
+        batch = [getter.result()]
+        getter = None
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        yield "progress", batch
+
+    # fn finished; anything it reported last is already queued ahead of the completion
+    leftover = []
+    while not queue.empty():
+        leftover.append(queue.get_nowait())
+    if leftover:
+        yield "progress", leftover
+    yield "result", future.result()
+
+# ================== RESILIENCE ==================
+
+class ProviderUnavailable(Exception):
+    """A provider kept failing or its breaker is open; str() is safe to show the user"""
+
+    def __init__(self, provider: str):
+        super().__init__(f"{provider} is not responding right now, please try again in a minute")
+        self.provider = provider
+
+
+class CircuitBreaker:
+    """closed → open after failure_threshold consecutive transient failures; after
+    reset_timeout one probe call is let through (half_open) and its outcome decides"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURES, reset_timeout: float = BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.probing = False
+                print(f"🟡 {self.name}: breaker half-open, probing")
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"🟢 {self.name}: breaker closed")
+            self.state = "closed"
+            self.failures = 0
+            self.probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.probing = False
+                self.trips += 1
+                print(f"🔴 {self.name}: breaker open for {self.reset_timeout:.0f}s after {self.failures} failure(s)")
+
+
+class LatencyWindow:
+    """Latencies (seconds) of recent successful attempts, for the hedge trigger"""
+
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self.samples)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+# Hedged sync attempts run here so the caller can wait on whichever finishes first
+resilience_executor = ThreadPoolExecutor(max_workers=BLOCKING_POOL_SIZE, thread_name_prefix="hedge")
+
+
+class ResiliencePolicy:
+    """Deadline, retries, hedging and a circuit breaker around one provider's calls.
+
+    attempt_fn(timeout) makes one attempt, where timeout is the time left before the call's
+    deadline (None when the layer is off). Transient failures (per retryable) count against
+    the breaker and are retried with jittered backoff if the call is idempotent; anything
+    else means the provider answered and is re-raised as is. A call that runs out of
+    attempts, time or breaker raises ProviderUnavailable.
+    """
+
+    def __init__(self, name: str, deadline: float, retryable, hedge: bool = HEDGE_ENABLED,
+                 attempts: int = RETRY_ATTEMPTS):
+        self.name = name
+        self.deadline = deadline
+        self.retryable = retryable
+        self.hedge = hedge
+        self.attempts = max(1, attempts)
+        self.breaker = CircuitBreaker(name)
+        self.latencies = LatencyWindow()
+        self.counters = {"calls": 0, "failures": 0, "retries": 0, "timeouts": 0,
+                         "hedges": 0, "hedge_wins": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def hedge_after(self, idempotent: bool) -> Optional[float]:
+        if not (self.hedge and idempotent):
+            return None
+        return self.latencies.quantile(HEDGE_QUANTILE)
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise ProviderUnavailable(self.name)
+
+    def _settle(self, error: Exception, attempt: int, deadline_at: float, idempotent: bool) -> float:
+        """After a failed attempt: the backoff before the next one, or raise"""
+        if isinstance(error, (TimeoutError, asyncio.TimeoutError, FuturesTimeout)):
+            self._count("timeouts")
+        if not self.retryable(error):
+            self.breaker.success()
+            raise error
+        self._count("failures")
+        self.breaker.failure()
+        delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.5)
+        if not idempotent or attempt + 1 >= self.attempts or time.monotonic() + delay >= deadline_at:
+            print(f"❌ {self.name}: giving up after {attempt + 1} attempt(s) ({error})")
+            raise ProviderUnavailable(self.name) from error
+        self._count("retries")
+        print(f"🔁 {self.name}: retrying in {delay:.2f}s ({error})")
+        return delay
+
+    def _succeeded(self, started: float):
+        self.latencies.add(time.monotonic() - started)
+        self.breaker.success()
+
+    def call(self, attempt_fn, idempotent: bool = True):
+        if not RESILIENCE_ENABLED:
+            return attempt_fn(None)
+        self._count("calls")
+        deadline_at = time.monotonic() + self.deadline
+        for attempt in range(self.attempts):
+            self._admit()
+            started = time.monotonic()
+            try:
+                result = self._attempt(attempt_fn, deadline_at, idempotent)
+            except Exception as e:
+                time.sleep(self._settle(e, attempt, deadline_at, idempotent))
+                continue
+            self._succeeded(started)
+            return result
+
+    def _attempt(self, attempt_fn, deadline_at: float, idempotent: bool):
+        remaining = deadline_at - time.monotonic()
+        hedge_after = self.hedge_after(idempotent)
+        if hedge_after is None or hedge_after >= remaining:
+            return attempt_fn(remaining)
+
+        primary = resilience_executor.submit(attempt_fn, remaining)
+        done, pending = futures_wait({primary}, timeout=hedge_after)
+        if done:
+            pending = done
+        else:
+            self._count("hedges")
+            print(f"🪁 {self.name}: hedging after {hedge_after * 1000:.0f} ms")
+            pending.add(resilience_executor.submit(attempt_fn, deadline_at - time.monotonic()))
+
+        error = None
+        while pending:
+            done, pending = futures_wait(pending, timeout=max(0.0, deadline_at - time.monotonic()),
+                                         return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            winners = [future for future in done if future.exception() is None]
+            if winners:
+                if winners[0] is not primary:
+                    self._count("hedge_wins")
+                return winners[0].result()
+            error = next(iter(done)).exception()
+        for future in pending:
+            future.cancel()  # a running attempt is bounded by its own timeout
+        raise error or TimeoutError(f"{self.name} timed out")
+
+    async def call_async(self, attempt_fn, idempotent: bool = True):
+        """call() for attempt_fn(timeout) returning an awaitable"""
+        if not RESILIENCE_ENABLED:
+            return await attempt_fn(None)
+        self._count("calls")
+        deadline_at = time.monotonic() + self.deadline
+        for attempt in range(self.attempts):
+            self._admit()
+            started = time.monotonic()
+            try:
+                result = await self._attempt_async(attempt_fn, deadline_at, idempotent)
+            except Exception as e:
+                await asyncio.sleep(self._settle(e, attempt, deadline_at, idempotent))
+                continue
+            self._succeeded(started)
+            return result
+
+    async def _attempt_async(self, attempt_fn, deadline_at: float, idempotent: bool):
+        def launch():
+            remaining = max(0.0, deadline_at - time.monotonic())
+            return asyncio.ensure_future(asyncio.wait_for(attempt_fn(remaining), remaining))
+
+        primary = launch()
+        pending = {primary}
+        try:
+            hedge_after = self.hedge_after(idempotent)
+            if hedge_after is not None and hedge_after < deadline_at - time.monotonic():
+                done, pending = await asyncio.wait(pending, timeout=hedge_after)
+                if done:
+                    pending = done
+                else:
+                    self._count("hedges")
+                    print(f"🪁 {self.name}: hedging after {hedge_after * 1000:.0f} ms")
+                    pending.add(launch())
+
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # exception() on every finished task, so a failed loser isn't logged as unretrieved
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    if winners[0] is not primary:
+                        self._count("hedge_wins")
+                    return winners[0].result()
+                error = next(iter(done)).exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self.counters)
+        p95 = self.latencies.quantile(HEDGE_QUANTILE)
+        stats.update(breaker=self.breaker.state, trips=self.breaker.trips,
+                     p95_ms=round(p95 * 1000) if p95 is not None else None)
+        return stats
+
+
+def groq_retryable(error: Exception) -> bool:
+    """Connection failures, timeouts, 408/409/429 and 5xx"""
+    if isinstance(error, (APIConnectionError, TimeoutError, asyncio.TimeoutError, FuturesTimeout)):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status in (408, 409, 429) or status >= 500)
+
+
+def google_retryable(error: Exception) -> bool:
+    """Socket errors and timeouts, 408/429 and 5xx"""
+    if isinstance(error, HttpError):
+        return error.resp.status in (408, 429) or error.resp.status >= 500
+    return isinstance(error, (OSError, httplib2.HttpLib2Error, FuturesTimeout))
+
+
+def groq_timeout(timeout: Optional[float]) -> dict:
+    """Per-attempt timeout kwarg for the Groq SDK (timeout=None there means none at all)"""
+    return {"timeout": timeout} if timeout else {}
+
+
+# One policy per model so a struggling small model trips its own breaker and escalation
+# to the large one goes straight through
+groq_policies = {tier: ResiliencePolicy(f"Groq ({model})", GROQ_DEADLINE, groq_retryable)
+                 for tier, model in LLM_MODELS.items()}
+whisper_policy = ResiliencePolicy("Groq transcription", WHISPER_DEADLINE, groq_retryable)
+# Hedging a Calendar read means a fresh connection per read (see google_execute), so it is opt-in
+google_policy = ResiliencePolicy("Google Calendar", GOOGLE_DEADLINE, google_retryable,
+                                 hedge=os.getenv("GOOGLE_HEDGE_ENABLED", "0") == "1")
+
+
+def google_http(credentials):
+    """Authorized httplib2 client with a socket timeout"""
+    return AuthorizedHttp(credentials, http=httplib2.Http(timeout=GOOGLE_HTTP_TIMEOUT))
+
+
+def google_execute(request, http=None):
+    """request.execute() under google_policy; only reads (GET) are retried or hedged.
+
+    http, if given, is used instead of the connection of the service that built the request.
+    """
+    idempotent = getattr(request, "method", None) == "GET"
+    isolated = idempotent and google_policy.hedge
+
+    def attempt(timeout):
+        # httplib2 isn't thread-safe and a losing hedge keeps running after its twin returns,
+        # so hedgeable reads can't share the cached service's connection
+        return request.execute(http=google_http(request.http.credentials) if isolated else http)
+
+    with span(f"google:{getattr(request, 'methodId', None) or 'batch'}"):
+        return google_policy.call(attempt, idempotent=idempotent)
+
+
+def resilience_stats() -> dict:
+    policies = {f"groq:{tier}": policy for tier, policy in groq_policies.items()}
+    policies.update(whisper=whisper_policy, google=google_policy)
+    return {name: policy.stats() for name, policy in policies.items()}
+
+# ================== METRICS ==================
+
+# Intent of the chat turn being served; chat() sets it once known, and run_blocking /
+# stream_blocking carry it onto the pool so Calendar and Postgres spans are labelled too
+current_intent = contextvars.ContextVar("current_intent", default="none")
+
+
+class Histogram:
+    """Latency histogram per label set, rendered in the Prometheus text format"""
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}  # label values → [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        with self._lock:
+            snapshot = {key: (list(counts), total) for key, (counts, total) in self.series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(snapshot.items()):
+            labels = ",".join(f'{name}="{_label_value(value)}"' for name, value in zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                lines.append(f'{self.name}_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {cumulative}")
+        return lines
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+stage_seconds = Histogram(
+    "calendar_agent_stage_seconds",
+    "Time spent per pipeline stage",
+    ("stage", "intent", "outcome"),
+    METRICS_BUCKETS,
+)
+
+
+@contextmanager
+def span(stage: str, intent: Optional[str] = None):
+    """Time the block into stage_seconds.
+
+    Yields the labels dict: intent defaults to current_intent, outcome to "ok". The block
+    may set either (e.g. outcome "local"/"llm", "cached"/"db"); an exception makes the
+    outcome "error", or "unavailable" for ProviderUnavailable.
+    """
+    labels = {"intent": intent or current_intent.get(), "outcome": "ok"}
+    started = time.perf_counter()
+    try:
+        yield labels
+    except ProviderUnavailable:
+        labels["outcome"] = "unavailable"
+        raise
+    except (asyncio.CancelledError, GeneratorExit):
+        labels["outcome"] = "cancelled"
+        raise
+    except Exception:
+        labels["outcome"] = "error"
+        raise
+    finally:
+        if METRICS_ENABLED:
+            # LLM replies aren't trusted to keep the label set small
+            if labels["intent"] not in INTENTS:
+                labels["intent"] = "none" if labels["intent"] in (None, "none") else "other"
+            stage_seconds.observe(time.perf_counter() - started, stage=stage, **labels)
+
+
+def timed(stage: str):
+    """Decorator: run the whole function inside span(stage)"""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _stat_lines(name: str, stats: dict, group: Optional[str] = None) -> list:
+    """Numeric leaves of a stats dict as name{stat=...} gauges; one level of nesting
+    becomes a `group` label (per cache, per kind, ...)"""
+    lines = [f"# TYPE {name} gauge"]
+    for key, value in stats.items():
+        leaves = value.items() if isinstance(value, dict) else [(key, value)]
+        for stat, leaf in leaves:
+            if not isinstance(leaf, (int, float)):
+                continue
+            labels = f'stat="{_label_value(stat)}"'
+            if isinstance(value, dict):
+                labels = f'{group}="{_label_value(key)}",' + labels
+            lines.append(f"{name}{{{labels}}} {float(leaf)}")
+    return lines
+
+
+def render_metrics() -> str:
+    lines = stage_seconds.render()
+    lines += _stat_lines("calendar_agent_db_pool", db_pool.stats())
+    lines += _stat_lines("calendar_agent_cache", {
+        "creds": creds_cache.stats(),
+        "service": service_cache.stats(),
+        "event_mirrors": event_mirrors.stats(),
+        "llm": llm_cache.stats(),
+        "datetime": datetime_cache.stats(),
+    }, group="cache")
+    lines += _stat_lines("calendar_agent_llm_cache", llm_cache_stats(), group="kind")
+    lines += _stat_lines("calendar_agent_llm_route", llm_route_stats, group="route")
+    lines += _stat_lines("calendar_agent_local_intent", local_intent_stats)
+    lines += _stat_lines("calendar_agent_rule_args", args_rule_stats, group="kind")
+    lines += _stat_lines("calendar_agent_speculation", speculation_stats)
+    lines += _stat_lines("calendar_agent_datetime_paths", datetime_parse_paths, group="kind")
+
+    resilience = resilience_stats()
+    lines += _stat_lines("calendar_agent_resilience", resilience, group="policy")
+    lines.append("# TYPE calendar_agent_breaker_state gauge")
+    for policy, stats in resilience.items():
+        for state in ("closed", "half_open", "open"):
+            lines.append(f'calendar_agent_breaker_state{{policy="{policy}",state="{state}"}} '
+                         f'{1 if stats["breaker"] == state else 0}')
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/metrics")
+def metrics():
+    if not METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# ================== CACHING ==================
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after a fixed TTL"""
+
+    _MISSING = object()
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, self._MISSING)
+            if entry is self._MISSING:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+creds_cache = TTLCache(maxsize=CREDS_CACHE_SIZE, ttl=CREDS_CACHE_TTL)
+service_cache = TTLCache(maxsize=SERVICE_CACHE_SIZE, ttl=SERVICE_CACHE_TTL)
+event_mirrors = TTLCache(maxsize=EVENT_MIRROR_USERS, ttl=EVENT_MIRROR_TTL)
+llm_cache = TTLCache(maxsize=LLM_CACHE_SIZE, ttl=LLM_CACHE_TTL)
+
+# ================== DATETIME PARSING ==================
+
+datetime_cache = TTLCache(DATETIME_CACHE_SIZE, DATETIME_CACHE_TTL)
+
+
+def memoized_parse(kind: str, text: str, today, resolve, normalize: bool = True):
+    """resolve(text, today) behind datetime_cache, keyed by (kind, normalized text, today).
+
+    `today` is the local date for relative inputs ("tomorrow") and None for absolute ones,
+    so cached answers roll over at local midnight. Failures (None) are cached too.
+    """
+    if normalize:
+        text = " ".join(text.lower().split())
+    key = (kind, text, today)
+    value = datetime_cache.get(key, TTLCache._MISSING)
+    if value is TTLCache._MISSING:
+        value = resolve(text, today)
+        datetime_cache.set(key, value)
+    return value
+
+
+MONTHS = {
+    name: number
+    for number, names in enumerate([
+        ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"),
+        ("may",), ("jun", "june"), ("jul", "july"), ("aug", "august"),
+        ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"), ("dec", "december"),
+    ], start=1)
+    for name in names
+}
+WEEKDAYS = {
+    name: number
+    for number, names in enumerate([
+        ("mon", "monday"), ("tue", "tues", "tuesday"), ("wed", "wednesday"),
+        ("thu", "thur", "thurs", "thursday"), ("fri", "friday"), ("sat", "saturday"), ("sun", "sunday"),
+    ])
+    for name in names
+}
+_DT_TOKEN_RE = re.compile(r"\d+|[a-z]+|[/:.-]")
+_MERIDIEM_RE = re.compile(r"\b([ap])\.?m\b\.?")
+_OCLOCK_RE = re.compile(r"o['\s]?\s*clock")
+_DATE_FILLERS = {"on", "the", "of", "st", "nd", "rd", "th", ","}
+_TIME_FILLERS = {"at", "around", "about", "by"}
+
+# Which parser resolved each input: the grammar, the dateutil fallback, or neither
+datetime_parse_paths = {
+    kind: {"grammar": 0, "dateutil": 0, "failed": 0} for kind in ("date", "time", "timestamp")
+}
+
+
+def tokenize_datetime(text: str) -> list:
+    text = _OCLOCK_RE.sub(" oclock", _MERIDIEM_RE.sub(r"\1m", text.lower()))
+    return _DT_TOKEN_RE.findall(text)
+
+
+def _year_from_token(token: str) -> Optional[int]:
+    if len(token) == 2:
+        return int(expand_two_digit_year(token))
+    if len(token) == 4:
+        return int(token)
+    return None
+
+
+def _numeric_date(tokens: list) -> Optional[tuple]:
+    """12/5, 12/5/25, 2025-12-16 → (year or None, month, day); month-first like dateutil"""
+    if len(tokens) not in (3, 5) or any(sep not in ("/", "-") for sep in tokens[1::2]):
+        return None
+    numbers = tokens[0::2]
+    if not all(number.isdigit() for number in numbers):
+        return None
+    if len(numbers[0]) == 4:
+        if len(numbers) != 3:
+            return None
+        return int(numbers[0]), int(numbers[1]), int(numbers[2])
+    first, second = int(numbers[0]), int(numbers[1])
+    month, day = (second, first) if first > 12 else (first, second)
+    year = _year_from_token(numbers[2]) if len(numbers) == 3 else None
+    if len(numbers) == 3 and year is None:
+        return None
+    return year, month, day
+
+
+def _named_month_date(tokens: list) -> Optional[tuple]:
+    """16 Dec, Dec 16, 16 Dec 25, December 16 2025 → (year or None, month, day)"""
+    if len(tokens) not in (2, 3):
+        return None
+    if tokens[0] in MONTHS:
+        month, day = tokens[0], tokens[1]
+    elif tokens[1] in MONTHS:
+        day, month = tokens[0], tokens[1]
+    else:
+        return None
+    if not day.isdigit() or len(day) > 2:
+        return None
+    year = None
+    if len(tokens) == 3:
+        year = _year_from_token(tokens[2]) if tokens[2].isdigit() else None
+        if year is None:
+            return None
+    return year, MONTHS[month], int(day)
+
+
+def match_date(text: str, today: datetime.date) -> Optional[tuple]:
+    """Deterministic grammar for the date forms the app accepts; returns (date, anchored).
+
+    today / tomorrow / day after tomorrow; [this|next|coming] <weekday> (the nearest one
+    from today, today included, except "next", which is always after today); "16 Dec",
+    "Dec 16 2025", "16 Dec 25"; "12/5", "12/5/25", "2025-12-16". `anchored` is False when
+    no year was given, so callers may roll a past date into next year. None if the text
+    isn't one of these forms.
+    """
+    tokens = [token for token in tokenize_datetime(text) if token not in _DATE_FILLERS]
+    if not tokens:
+        return None
+    if tokens[-3:] == ["day", "after", "tomorrow"]:
+        return today + datetime.timedelta(days=2), True
+    if "tomorrow" in tokens:
+        return today + datetime.timedelta(days=1), True
+    if "today" in tokens:
+        return today, True
+
+    if tokens[-1] in WEEKDAYS and len(tokens) <= 2:
+        qualifier = tokens[0] if len(tokens) == 2 else None
+        if qualifier not in (None, "this", "next", "coming"):
+            return None
+        ahead = (WEEKDAYS[tokens[-1]] - today.weekday()) % 7
+        if qualifier == "next" and ahead == 0:
+            ahead = 7
+        return today + datetime.timedelta(days=ahead), True
+
+    if tokens[0] in WEEKDAYS:
+        tokens = tokens[1:]
+    parts = _numeric_date(tokens) or _named_month_date(tokens)
+    if parts is None:
+        return None
+    year, month, day = parts
+    try:
+        return datetime.date(year or today.year, month, day), year is not None
+    except ValueError:
+        return None
+
+
+def match_time(text: str) -> Optional[tuple]:
+    """Deterministic grammar for times: "3 PM", "3:30 pm", "14:00", "6 o'clock", "noon".
+
+    Returns (hour, minute), or None if the text isn't one of these forms. A bare hour
+    without am/pm is taken as given (6 o'clock → 06:00), as dateutil does.
+    """
+    tokens = [token for token in tokenize_datetime(text) if token not in _TIME_FILLERS]
+    meridiem = None
+    while tokens and tokens[-1] in ("am", "pm", "oclock"):
+        token = tokens.pop()
+        if token != "oclock":
+            if meridiem:
+                return None
+            meridiem = token
+    if tokens == ["noon"] and meridiem is None:
+        return 12, 0
+    if tokens == ["midnight"] and meridiem is None:
+        return 0, 0
+
+    if len(tokens) == 1 and tokens[0].isdigit() and len(tokens[0]) <= 2:
+        hour, minute = int(tokens[0]), 0
+    elif (len(tokens) == 3 and tokens[1] in (":", ".") and tokens[0].isdigit()
+          and tokens[2].isdigit() and len(tokens[0]) <= 2 and len(tokens[2]) == 2):
+        hour, minute = int(tokens[0]), int(tokens[2])
+    else:
+        return None
+
+    if meridiem:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if meridiem == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def _note_path(kind: str, path: str, text: str):
+    datetime_parse_paths[kind][path] += 1
+    if path != "grammar":
+        print(f"🔍 {kind} '{text}' resolved via {path}")
+
+
+def dateutil_parse(kind: str, text: str, **kwargs) -> datetime.datetime:
+    """parser.parse, timed as the dateutil:<kind> stage"""
+    with span(f"dateutil:{kind}"):
+        return parser.parse(text, **kwargs)
+
+
+def _parse_slot_date(date_str: str, today: datetime.date) -> Optional[datetime.date]:
+    matched = match_date(date_str, today)
+    if matched:
+        _note_path("date", "grammar", date_str)
+        target_date, anchored = matched
+        if not anchored and target_date < today:
+            target_date = target_date.replace(year=today.year + 1)
+        return target_date
+    try:
+        default = datetime.datetime.combine(today, datetime.time())
+        parsed = dateutil_parse("date", expand_two_digit_year(date_str), fuzzy=True, default=default)
+    except Exception as e:
+        _note_path("date", "failed", date_str)
+        print(f"Date parsing failed for '{date_str}': {e}, using today")
+        return None
+    _note_path("date", "dateutil", date_str)
+    target_date = parsed.date()
+    if parsed.year == today.year and target_date < today:
+        target_date = target_date.replace(year=today.year + 1)
+    return target_date
+
+
+def _parse_clock_time(time_str: str, today=None) -> Optional[tuple]:
+    matched = match_time(time_str)
+    if matched:
+        _note_path("time", "grammar", time_str)
+        return matched
+    try:
+        parsed = dateutil_parse("time", time_str, fuzzy=True)
+    except Exception:
+        _note_path("time", "failed", time_str)
+        return None
+    _note_path("time", "dateutil", time_str)
+    return parsed.hour, parsed.minute
+
+
+def _parse_timestamp(value: str, today=None) -> datetime.datetime:
+    # The API sends RFC 3339 (or a bare date for all-day events), which fromisoformat reads
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+        datetime_parse_paths["timestamp"]["grammar"] += 1
+        return parsed
+    except ValueError:
+        datetime_parse_paths["timestamp"]["dateutil"] += 1
+        return dateutil_parse("timestamp", value)
+
+
+def parse_slot_date(date_str: str, today: datetime.date) -> Optional[datetime.date]:
+    """Date slot ("tomorrow", "16 Dec", "25/12/25") → date, rolled into next year if already past"""
+    return memoized_parse("slot_date", date_str, today, _parse_slot_date)
+
+
+def parse_clock_time(time_str: str) -> Optional[tuple]:
+    """Time slot or criteria ("3 PM", "14:30") → (hour, minute)"""
+    return memoized_parse("clock_time", time_str, None, _parse_clock_time)
+
+
+def parse_timestamp(value: str) -> datetime.datetime:
+    """Calendar API timestamp → datetime; the same strings come back on every listing"""
+    return memoized_parse("timestamp", value, None, _parse_timestamp, normalize=False)
+
 # ================== DATABASE ==================
 
+class ConnectionPool:
+    """Bounded, thread-safe pool of psycopg2 connections with health checks"""
+
+    def __init__(self, dsn, minconn, maxconn, timeout, healthcheck_idle):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self._idle = []  # (conn, last_used) pairs, most recently used last
+        self._size = 0
+        self._cond = threading.Condition()
+        self._counters = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+        }
+
+    def _connect(self):
+        conn = psycopg2.connect(self.dsn, cursor_factory=RealDictCursor)
+        with self._cond:
+            self._counters["created"] += 1
+        return conn
+
+    def fill(self):
+        """Open connections until the pool holds at least minconn"""
+        while True:
+            with self._cond:
+                if self._size >= self.minconn:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                if not waited:
+                    self._counters["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters["timeouts"] += 1
+                    raise PoolError(f"No database connection available after {self.timeout}s")
+                self._cond.wait(remaining)
+
+            self._counters["checkouts"] += 1
+            if waited:
+                self._counters["wait_seconds"] += time.monotonic() - started
+
+        if conn is not None and not self._is_healthy(conn, last_used):
+            print("⚠️ Discarding broken pooled DB connection")
+            self._close(conn)
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+
+        return conn
+
+    def putconn(self, conn, discard=False):
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        if discard or conn.closed:
+            self._close(conn)
+            self._release_slot()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _close(self, conn):
+        with self._cond:
+            self._counters["discarded"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                **self._counters,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max": self.maxconn,
+            }
+
+
+db_pool = ConnectionPool(
+    DATABASE_URL,
+    minconn=DB_POOL_MIN,
+    maxconn=DB_POOL_MAX,
+    timeout=DB_POOL_TIMEOUT,
+    healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE,
+)
+
+
 def init_db():
     try:
+        db_pool.fill()
         with get_db() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
@@ -65,13 +1185,41 @@ def init_db():
                         expiry TIMESTAMP
                     )
                 """)
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS calendar_channels (
+                        channel_id VARCHAR(64) PRIMARY KEY,
+                        user_id VARCHAR(255) NOT NULL,
+                        resource_id VARCHAR(255),
+                        expiration TIMESTAMP
+                    )
+                """)
+                if LLM_CACHE_BACKEND == "postgres":
+                    cur.execute("""
+                        CREATE TABLE IF NOT EXISTS llm_cache (
+                            key VARCHAR(64) PRIMARY KEY,
+                            value TEXT NOT NULL,
+                            expires_at TIMESTAMP NOT NULL
+                        )
+                    """)
                 print("✅ Database initialized")
     except Exception as e:
         print(f"❌ DB init error: {e}")
 
+@contextmanager
 def get_db():
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    """Check out a pooled connection; commits on success, rolls back on error"""
+    conn = db_pool.getconn()
+    broken = False
+    try:
+        with conn:
+            yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        db_pool.putconn(conn, discard=broken)
 
+@timed("save_tokens")
 def save_tokens(user_id, email, creds: Credentials):
     with get_db() as conn:
         with conn.cursor() as cur:
@@ -91,12 +1239,38 @@ def save_tokens(user_id, email, creds: Credentials):
                 creds.refresh_token,
                 creds.expiry
             ))
+    creds_cache.set(user_id, creds)
 
-def load_tokens(user_id) -> Optional[Credentials]:
+def update_tokens(user_id, creds: Credentials):
+    """Persist refreshed credentials for an existing user in a single statement"""
     with get_db() as conn:
         with conn.cursor() as cur:
-            cur.execute("SELECT * FROM user_tokens WHERE user_id=%s", (user_id,))
-            row = cur.fetchone()
+            cur.execute("""
+                UPDATE user_tokens
+                SET access_token = %s,
+                    refresh_token = COALESCE(%s, refresh_token),
+                    expiry = %s
+                WHERE user_id = %s
+            """, (
+                creds.token,
+                creds.refresh_token,
+                creds.expiry,
+                user_id
+            ))
+    creds_cache.set(user_id, creds)
+
+def load_tokens(user_id) -> Optional[Credentials]:
+    with span("load_tokens") as labels:
+        cached = creds_cache.get(user_id)
+        if cached is not None:
+            labels["outcome"] = "cached"
+            return cached
+
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT * FROM user_tokens WHERE user_id=%s", (user_id,))
+                row = cur.fetchone()
+        labels["outcome"] = "db" if row else "missing"
 
     if not row:
         return None
@@ -110,8 +1284,33 @@ def load_tokens(user_id) -> Optional[Credentials]:
         scopes=SCOPES,
     )
     creds.expiry = row["expiry"]
+    creds_cache.set(user_id, creds)
     return creds
 
+# ================== GOOGLE API DISCOVERY ==================
+
+_discovery_docs = {}
+_discovery_lock = threading.Lock()
+
+def get_discovery_document(api: str, version: str) -> dict:
+    """Parse the discovery document bundled with googleapiclient once per process"""
+    key = (api, version)
+    doc = _discovery_docs.get(key)
+    if doc is None:
+        with _discovery_lock:
+            doc = _discovery_docs.get(key)
+            if doc is None:
+                content = discovery_cache.get_static_doc(api, version)
+                if content is None:
+                    raise Exception(f"No bundled discovery document for {api} {version}")
+                doc = json.loads(content)
+                _discovery_docs[key] = doc
+    return doc
+
+def build_service(api: str, version: str, creds: Credentials):
+    # build_from_document only fills in defaults on the shared dict, so reusing it is safe
+    return build_from_document(get_discovery_document(api, version), http=google_http(creds))
+
 # ================== GOOGLE OAUTH ==================
 
 @app.get("/login")
@@ -159,10 +1358,13 @@ def oauth2callback(request: Request):
         flow.fetch_token(authorization_response=str(request.url))
         creds = flow.credentials
 
-        oauth = build("oauth2", "v2", credentials=creds)
-        user = oauth.userinfo().get().execute()
+        oauth = build_service("oauth2", "v2", creds)
+        user = google_execute(oauth.userinfo().get())
 
         save_tokens(user["id"], user["email"], creds)
+        mark_active(user["id"])
+        if CALENDAR_WEBHOOK_URL:
+            _push_executor.submit(ensure_watch_channel, user["id"])
         
         request.session["user_id"] = user["id"]
         request.session["email"] = user["email"]
@@ -176,6 +1378,15 @@ def oauth2callback(request: Request):
 
 @app.get("/logout")
 def logout(request: Request):
+    user_id = request.session.get("user_id")
+    if user_id:
+        # Otherwise the refresher would keep renewing the channel until the user goes idle
+        mark_inactive(user_id)
+        if CALENDAR_WEBHOOK_URL:
+            _push_executor.submit(stop_watch_channel, user_id)
+        creds_cache.invalidate(user_id)
+        service_cache.invalidate_where(lambda key: key[0] == user_id)
+        event_mirrors.invalidate(user_id)
     request.session.clear()
     return RedirectResponse("/")
 
@@ -308,72 +1519,719 @@ def privacy_policy():
 # ================== GRADIO MOUNTING ==================
 # Mount Gradio AFTER all FastAPI routes are defined
 
-# ================== CALENDAR SERVICE ==================
+# ================== TOKEN REFRESH ==================
 
-def get_calendar_service(user_id):
-    creds = load_tokens(user_id)
-    if not creds:
-        raise Exception("User not authenticated. Please login.")
+_last_active = {}
+_refresh_locks = {}
+_activity_lock = threading.Lock()
 
-    if creds.expired and creds.refresh_token:
+def _utcnow():
+    # google-auth keeps expiry as a naive UTC datetime, and so does user_tokens.expiry
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+def mark_active(user_id):
+    with _activity_lock:
+        _last_active[user_id] = time.time()
+
+def mark_inactive(user_id):
+    with _activity_lock:
+        _last_active.pop(user_id, None)
+
+def recently_active_users(window: float) -> list:
+    cutoff = time.time() - window
+    with _activity_lock:
+        stale = [uid for uid, seen in _last_active.items() if seen < cutoff]
+        for uid in stale:
+            del _last_active[uid]
+            _refresh_locks.pop(uid, None)
+        return list(_last_active)
+
+def _refresh_lock_for(user_id):
+    with _activity_lock:
+        return _refresh_locks.setdefault(user_id, threading.Lock())
+
+def needs_refresh(creds: Credentials, lead_seconds: float = 0) -> bool:
+    if creds.expired or creds.expiry is None:
+        return True
+    return creds.expiry <= _utcnow() + datetime.timedelta(seconds=lead_seconds)
+
+def refresh_credentials(user_id, creds: Credentials, lead_seconds: float = 0) -> Credentials:
+    """Refresh and persist credentials unless another thread already did"""
+    with _refresh_lock_for(user_id):
+        if not needs_refresh(creds, lead_seconds):
+            return creds
         creds.refresh(GoogleRequest())
+        update_tokens(user_id, creds)
+    return creds
+
+
+class TokenRefresher:
+    """Background thread that refreshes tokens of active users before they expire"""
+
+    def __init__(self, interval, jitter, lead, active_window, concurrency):
+        self.interval = interval
+        self.jitter = jitter
+        self.lead = lead
+        self.active_window = active_window
+        self.concurrency = concurrency
+        self.refreshed = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="token-refresh")
+        self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+        self._thread.start()
+        print(f"✅ Token refresher started (every ~{self.interval:.0f}s, lead {self.lead:.0f}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _next_delay(self) -> float:
+        spread = self.interval * self.jitter
+        return max(1.0, self.interval + random.uniform(-spread, spread))
+
+    def _run(self):
+        while not self._stop.wait(self._next_delay()):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Token refresher error: {e}")
+
+    def due_users(self) -> list:
+        active = recently_active_users(self.active_window)
+        if not active:
+            return []
+        threshold = _utcnow() + datetime.timedelta(seconds=self.lead)
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT email FROM user_tokens WHERE user_id=%s", (user_id,))
-                row = cur.fetchone()
-                email = row["email"] if row else ""
-        save_tokens(user_id, email, creds)
+                cur.execute("""
+                    SELECT user_id FROM user_tokens
+                    WHERE user_id = ANY(%s)
+                      AND refresh_token IS NOT NULL
+                      AND (expiry IS NULL OR expiry <= %s)
+                """, (active, threshold))
+                return [row["user_id"] for row in cur.fetchall()]
+
+    def run_once(self):
+        due = self.due_users()
+        if due:
+            list(self._executor.map(self._refresh_user, due))
+        if CALENDAR_WEBHOOK_URL:
+            # Watch channels expire as well; renew them on the same schedule
+            renew = channels_due_for_renewal(recently_active_users(self.active_window))
+            list(self._executor.map(ensure_watch_channel, renew))
+
+    def _refresh_user(self, user_id):
+        try:
+            creds = load_tokens(user_id)
+            if creds is None or not creds.refresh_token:
+                return
+            refresh_credentials(user_id, creds, lead_seconds=self.lead)
+            self.refreshed += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"❌ Background token refresh failed for {user_id}: {e}")
+
+
+token_refresher = TokenRefresher(
+    interval=TOKEN_REFRESH_INTERVAL,
+    jitter=TOKEN_REFRESH_JITTER,
+    lead=TOKEN_REFRESH_LEAD,
+    active_window=TOKEN_REFRESH_ACTIVE_WINDOW,
+    concurrency=TOKEN_REFRESH_CONCURRENCY,
+)
+
+# ================== CALENDAR SERVICE ==================
+
+@timed("get_calendar_service")
+def get_calendar_service(user_id):
+    mark_active(user_id)
+    creds = load_tokens(user_id)
+    if not creds:
+        raise Exception("User not authenticated. Please login.")
+
+    if creds.expired and creds.refresh_token:
+        # Normally the background refresher gets here first; this is the fallback
+        refresh_credentials(user_id, creds)
     elif creds.expired:
         raise Exception("Token expired. Please login again.")
 
-    return build("calendar", "v3", credentials=creds)
+    # Credentials refresh in place, so a cached service stays valid for as long as
+    # the user's Credentials object is the same one it was built with. A service holds one
+    # httplib2 connection, which isn't thread-safe, so each thread gets its own.
+    key = (user_id, threading.get_ident())
+    entry = service_cache.get(key)
+    if entry is not None and entry[0] is creds:
+        return entry[1]
 
-# ================== CALENDAR FUNCTIONS ==================
+    service = build_service("calendar", "v3", creds)
+    service_cache.set(key, (creds, service))
+    return service
 
-def parse_datetime(date_str, time_str):
-    """Enhanced datetime parsing supporting multiple date formats"""
-    india_tz = pytz.timezone('Asia/Kolkata')
-    today = datetime.datetime.now(india_tz)
-    
-    date_str_lower = date_str.lower()
-    
-    if "tomorrow" in date_str_lower:
-        target_date = today.date() + datetime.timedelta(days=1)
-    elif "today" in date_str_lower:
-        target_date = today.date()
-    else:
-        try:
-            temp_str = date_str
-            year_match = re.search(r'\b(\d{2})\b$', date_str)
-            if year_match:
-                two_digit_year = int(year_match.group(1))
-                if two_digit_year < 50:
-                    four_digit_year = 2000 + two_digit_year
+# ================== EVENT MIRROR ==================
+
+def iter_event_pages(service, page_size, http=None, **params):
+    """Yield events.list responses one page at a time, following nextPageToken lazily"""
+    page_token = None
+    while True:
+        response = google_execute(service.events().list(
+            calendarId='primary',
+            maxResults=page_size,
+            pageToken=page_token,
+            **params
+        ), http=http)
+        yield response
+        page_token = response.get('nextPageToken')
+        if not page_token:
+            return
+
+
+def iter_upcoming_pages(service, page_size=EVENT_PAGE_SIZE, http=None):
+    """Yield lists of upcoming events in start order, one API page at a time"""
+    now = datetime.datetime.now(INDIA_TZ).isoformat()
+    for response in iter_event_pages(service, page_size, http=http, timeMin=now, singleEvents=True,
+                                     orderBy='startTime'):
+        yield response.get('items', [])
+
+
+def iter_upcoming_events(service, page_size=EVENT_PAGE_SIZE):
+    for page in iter_upcoming_pages(service, page_size):
+        yield from page
+
+
+_END = object()
+
+def prefetched(iterable):
+    """Yield from an iterable while its next item is already being produced on a worker thread"""
+    iterator = iter(iterable)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+    try:
+        future = executor.submit(next, iterator, _END)
+        while True:
+            item = future.result()
+            if item is _END:
+                return
+            future = executor.submit(next, iterator, _END)
+            yield item
+    finally:
+        # A consumer that stops early doesn't wait for an item it no longer needs: a
+        # queued fetch is cancelled and one already running finishes in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def event_datetime(value: dict) -> datetime.datetime:
+    """Timezone-aware datetime for an event's start/end (all-day events start at local midnight)"""
+    if value.get('dateTime'):
+        return parse_timestamp(value['dateTime'])
+    return INDIA_TZ.localize(parse_timestamp(value['date']))
+
+
+class EventIndex:
+    """Immutable snapshot of events, parsed once and sorted by start instant.
+
+    Also keyed by local date and local wall-clock time, so criteria matching is a
+    dict lookup or bisect instead of a scan with a parse per event.
+    """
+
+    def __init__(self, events):
+        entries = []
+        for event in events:
+            try:
+                entries.append((event_datetime(event['start']), event_datetime(event['end']), event))
+            except Exception as e:
+                print(f"Skipping unparseable event {event.get('id')}: {e}")
+        entries.sort(key=lambda entry: entry[0])
+
+        self.entries = entries
+        self.starts = [start for start, _, _ in entries]
+        self.max_duration = max((end - start for start, end, _ in entries), default=datetime.timedelta(0))
+        self.by_id = {}
+        self.by_date = {}  # local date -> positions in start order
+        self.by_time = {}  # (hour, minute) local wall clock -> positions, timed events only
+        for position, (start, end, event) in enumerate(entries):
+            local = start.astimezone(INDIA_TZ)
+            self.by_id[event['id']] = (start, end, local)
+            self.by_date.setdefault(local.date(), []).append(position)
+            if event['start'].get('dateTime'):
+                self.by_time.setdefault((local.hour, local.minute), []).append(position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _select(self, positions, now=None) -> list:
+        entries = self.entries
+        return [entries[p][2] for p in positions if now is None or entries[p][1] > now]
+
+    def bounds(self, event) -> tuple:
+        """Pre-parsed (start, end) for an indexed event"""
+        return self.by_id[event['id']][:2]
+
+    def local_start(self, event) -> datetime.datetime:
+        return self.by_id[event['id']][2]
+
+    def upcoming(self, now, limit=None) -> list:
+        # Anything still running at `now` started no earlier than now - max_duration
+        events = []
+        for position in range(bisect.bisect_left(self.starts, now - self.max_duration), len(self.entries)):
+            _, end, event = self.entries[position]
+            if end > now:
+                events.append(event)
+                if limit and len(events) >= limit:
+                    break
+        return events
+
+    def between(self, start, end, now=None) -> list:
+        """Events starting in [start, end)"""
+        return self._select(range(bisect.bisect_left(self.starts, start), bisect.bisect_left(self.starts, end)), now)
+
+    def on_date(self, date, now=None) -> list:
+        return self._select(self.by_date.get(date, ()), now)
+
+    def at_time(self, hour, minute, now=None) -> list:
+        return self._select(self.by_time.get((hour, minute), ()), now)
+
+
+class EventMirror:
+    """Local copy of a user's primary calendar, kept current with incremental syncToken pulls"""
+
+    PAGE_SIZE = 2500
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self.events = {}  # event id -> event resource
+        self.sync_token = None
+        self.synced_at = 0.0
+        self.stale = True
+        self.push_expires = 0.0  # epoch seconds until which a watch channel delivers changes
+        self.lock = threading.RLock()
+        self._index = None  # EventIndex over self.events, rebuilt lazily after changes
+
+    def _pull(self, service, **params):
+        response = {}
+        for response in iter_event_pages(service, self.PAGE_SIZE, singleEvents=True, **params):
+            self.apply_changes(response.get('items', []))
+        return response.get('nextSyncToken')
+
+    def full_sync(self, service):
+        # timeMin/orderBy cannot be combined with sync tokens, so the seed pulls everything
+        with self.lock:
+            self.events = {}
+            self._index = None
+            self.sync_token = self._pull(service)
+            self.synced_at = time.monotonic()
+            self.stale = False
+            print(f"🔄 Event mirror seeded with {len(self.events)} events")
+
+    def incremental_sync(self, service):
+        with self.lock:
+            try:
+                self.sync_token = self._pull(service, syncToken=self.sync_token)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                print("⚠️ Sync token expired, running full resync")
+                self.full_sync(service)
+                return
+            self.synced_at = time.monotonic()
+            self.stale = False
+
+    @property
+    def push_active(self) -> bool:
+        return time.time() < self.push_expires
+
+    def sync(self, service, force=False):
+        # With push notifications the interval is only a safety net for lost messages
+        interval = EVENT_MIRROR_PUSH_INTERVAL if self.push_active else self.sync_interval
+        with self.lock:
+            if self.sync_token is None:
+                self.full_sync(service)
+            elif force or self.stale or time.monotonic() - self.synced_at >= interval:
+                self.incremental_sync(service)
+
+    def mark_stale(self):
+        self.stale = True
+
+    def apply_changes(self, items):
+        """Merge changed/cancelled event resources, from a sync pull or our own mutations"""
+        with self.lock:
+            for item in items:
+                if item.get('status') == 'cancelled':
+                    self.events.pop(item['id'], None)
                 else:
-                    four_digit_year = 1900 + two_digit_year
-                temp_str = date_str.replace(year_match.group(1), str(four_digit_year))
-            
-            parsed = parser.parse(temp_str, fuzzy=True, default=today.replace(year=today.year))
-            target_date = parsed.date()
-            
-            if parsed.year == today.year and target_date < today.date():
-                target_date = target_date.replace(year=today.year + 1)
-                
+                    self.events[item['id']] = item
+            if items:
+                self._index = None
+
+    def apply_deleted(self, event_ids):
+        self.apply_changes([{'id': event_id, 'status': 'cancelled'} for event_id in event_ids])
+
+    def index(self) -> "EventIndex":
+        with self.lock:
+            if self._index is None:
+                self._index = EventIndex(self.events.values())
+            return self._index
+
+    def upcoming(self, now=None) -> list:
+        """Events that have not ended yet, in start order (same semantics as timeMin=now)"""
+        now = now or datetime.datetime.now(INDIA_TZ)
+        return self.index().upcoming(now)
+
+
+def get_event_mirror(user_id) -> EventMirror:
+    mirror = event_mirrors.get(user_id)
+    if mirror is None:
+        mirror = EventMirror(sync_interval=EVENT_MIRROR_SYNC_INTERVAL)
+        event_mirrors.set(user_id, mirror)
+    return mirror
+
+
+def mirror_apply(user_id, changed=(), deleted_ids=()):
+    """Reflect our own successful mutations in the mirror without waiting for the next pull"""
+    if not EVENT_MIRROR_ENABLED:
+        return
+    mirror = event_mirrors.get(user_id)
+    if mirror is None:
+        return
+    if changed:
+        mirror.apply_changes(list(changed))
+    if deleted_ids:
+        mirror.apply_deleted(list(deleted_ids))
+
+# ================== PUSH NOTIFICATIONS ==================
+
+_watch_channels = {}  # channel id -> user id
+_push_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="calendar-push")
+
+def channel_token(channel_id: str) -> str:
+    return hmac.new(SESSION_SECRET.encode(), channel_id.encode(), hashlib.sha256).hexdigest()
+
+def _from_epoch_ms(value) -> Optional[datetime.datetime]:
+    if not value:
+        return None
+    return datetime.datetime.fromtimestamp(int(value) / 1000, datetime.timezone.utc).replace(tzinfo=None)
+
+def _from_http_date(value) -> float:
+    """Epoch seconds of an HTTP date header such as X-Goog-Channel-Expiration; 0 if unreadable"""
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+
+def set_push_expiry(user_id, expires: float):
+    """Mirror reads rely on notifications until the channel expires (0 turns that off)"""
+    if EVENT_MIRROR_ENABLED:
+        mirror = event_mirrors.get(user_id)
+        if mirror is not None:
+            mirror.push_expires = expires
+
+def register_watch_channel(user_id, service):
+    """Open an events.watch channel for the user's primary calendar, replacing older ones"""
+    channel_id = uuid.uuid4().hex
+    _watch_channels[channel_id] = user_id  # the initial "sync" message can beat the INSERT below
+    try:
+        response = google_execute(service.events().watch(
+            calendarId='primary',
+            body={
+                "id": channel_id,
+                "type": "web_hook",
+                "address": CALENDAR_WEBHOOK_URL,
+                "token": channel_token(channel_id),
+                "params": {"ttl": str(CALENDAR_WATCH_TTL)},
+            }
+        ))
+    except Exception:
+        _watch_channels.pop(channel_id, None)
+        raise
+
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM calendar_channels WHERE user_id=%s RETURNING channel_id, resource_id",
+                (user_id,)
+            )
+            old_channels = cur.fetchall()
+            cur.execute("""
+                INSERT INTO calendar_channels (channel_id, user_id, resource_id, expiration)
+                VALUES (%s,%s,%s,%s)
+            """, (
+                channel_id,
+                user_id,
+                response.get("resourceId"),
+                _from_epoch_ms(response.get("expiration"))
+            ))
+
+    for old in old_channels:
+        _watch_channels.pop(old["channel_id"], None)
+        try:
+            google_execute(service.channels().stop(body={"id": old["channel_id"], "resourceId": old["resource_id"]}))
         except Exception as e:
-            print(f"Date parsing failed for '{date_str}': {e}, using today")
-            target_date = today.date()
-    
+            print(f"⚠️ Could not stop old watch channel {old['channel_id']}: {e}")
+
+    if EVENT_MIRROR_ENABLED:
+        get_event_mirror(user_id).push_expires = int(response.get("expiration") or 0) / 1000
+    print(f"📡 Watch channel {channel_id} registered for {user_id}")
+    return channel_id
+
+def channels_due_for_renewal(user_ids) -> list:
+    """Users without a channel, or whose channel expires within CALENDAR_WATCH_RENEW_BEFORE"""
+    if not user_ids:
+        return []
+    threshold = _utcnow() + datetime.timedelta(seconds=CALENDAR_WATCH_RENEW_BEFORE)
+    with get_db() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT user_id FROM calendar_channels
+                WHERE user_id = ANY(%s) AND expiration > %s
+            """, (list(user_ids), threshold))
+            healthy = {row["user_id"] for row in cur.fetchall()}
+    return [user_id for user_id in user_ids if user_id not in healthy]
+
+def ensure_watch_channel(user_id):
     try:
-        time_parsed = parser.parse(time_str, fuzzy=True)
-        hour = time_parsed.hour
-        minute = time_parsed.minute
+        if channels_due_for_renewal([user_id]):
+            register_watch_channel(user_id, get_calendar_service(user_id))
+    except Exception as e:
+        # Without a live channel the mirror has to go back to polling at its normal interval
+        set_push_expiry(user_id, 0.0)
+        print(f"❌ Watch channel registration failed for {user_id}: {e}")
+
+def stop_watch_channel(user_id):
+    """Stop and forget the user's watch channel (on logout)"""
+    try:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "DELETE FROM calendar_channels WHERE user_id=%s RETURNING channel_id, resource_id",
+                    (user_id,)
+                )
+                channels = cur.fetchall()
+        if not channels:
+            return
+        creds = load_tokens(user_id)
+        service = build_service("calendar", "v3", creds) if creds else None
+        for channel in channels:
+            _watch_channels.pop(channel["channel_id"], None)
+            if service is not None:
+                google_execute(service.channels().stop(
+                    body={"id": channel["channel_id"], "resourceId": channel["resource_id"]}))
+        print(f"📡 Watch channel stopped for {user_id}")
+    except Exception as e:
+        print(f"⚠️ Could not stop watch channel for {user_id}: {e}")
+
+def lookup_channel_user(channel_id: str) -> Optional[str]:
+    user_id = _watch_channels.get(channel_id)
+    if user_id is None:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT user_id FROM calendar_channels WHERE channel_id=%s", (channel_id,))
+                row = cur.fetchone()
+        if row:
+            user_id = row["user_id"]
+            _watch_channels[channel_id] = user_id
+    return user_id
+
+def _refresh_mirror(user_id):
+    try:
+        get_event_mirror(user_id).sync(get_calendar_service(user_id))
+    except Exception as e:
+        print(f"❌ Push-triggered sync failed for {user_id}: {e}")
+
+@app.post("/calendar/notifications")
+def calendar_notification(request: Request):
+    channel_id = request.headers.get("X-Goog-Channel-ID", "")
+    token = request.headers.get("X-Goog-Channel-Token", "")
+    state = request.headers.get("X-Goog-Resource-State", "")
+
+    if not channel_id or not hmac.compare_digest(token, channel_token(channel_id)):
+        return Response(status_code=403)
+
+    user_id = lookup_channel_user(channel_id)
+    if not user_id:
+        return Response(status_code=404)
+
+    if EVENT_MIRROR_ENABLED:
+        mirror = event_mirrors.get(user_id)
+        if mirror is not None:
+            # Google sends the expiry with every message, so a mirror created after the
+            # channel was registered learns it here
+            expires = _from_http_date(request.headers.get("X-Goog-Channel-Expiration"))
+            mirror.push_expires = max(mirror.push_expires, expires)
+            if state != "sync":
+                # Invalidate now, and pull the change in the background so the next read is warm
+                mirror.mark_stale()
+                _push_executor.submit(_refresh_mirror, user_id)
+
+    print(f"📨 Calendar notification for {user_id}: {state}")
+    return Response(status_code=204)
+
+# ================== CRITERIA MATCHING ==================
+
+def expand_two_digit_year(date_str: str) -> str:
+    year_match = re.search(r'\b(\d{2})\b$', date_str)
+    if not year_match:
+        return date_str
+    two_digit_year = int(year_match.group(1))
+    four_digit_year = 2000 + two_digit_year if two_digit_year < 50 else 1900 + two_digit_year
+    return date_str.replace(year_match.group(1), str(four_digit_year))
+
+
+def _resolve_target_date(date_str: str, today: datetime.date) -> Optional[datetime.date]:
+    matched = match_date(date_str, today)
+    if matched:
+        _note_path("date", "grammar", date_str)
+        return matched[0]
+    try:
+        target_date = dateutil_parse("date", expand_two_digit_year(date_str), fuzzy=True).date()
     except Exception:
-        hour = 9
-        minute = 0
-    
+        _note_path("date", "failed", date_str)
+        return None
+    _note_path("date", "dateutil", date_str)
+    return target_date
+
+
+def resolve_target_date(date_str: str, today: datetime.date) -> Optional[datetime.date]:
+    """Resolve a criteria date ("today", "tomorrow", "16 Dec 25", ...) once per command"""
+    return memoized_parse("criteria_date", date_str, today, _resolve_target_date)
+
+
+def resolve_target_time(time_str: str) -> Optional[tuple]:
+    """Resolve a criteria time ("2 PM", "14:00", ...) to (hour, minute) once per command"""
+    return parse_clock_time(time_str)
+
+
+class CriteriaMatcher:
+    """Criteria dict compiled into a predicate, with every target value resolved up front.
+
+    Accepts the shapes produced by extract_delete_criteria ("type"/"value"/"except") and
+    extract_update_criteria ("criteria_type"/"criteria_value"). "except" may be a single
+    clause or a list of clauses; an event matches if the include clause matches and no
+    except clause does.
+    """
+
+    def __init__(self, include: tuple, excludes: list, today: datetime.date):
+        self.include = self._compile_clause(*include, today)
+        self.excludes = [clause for clause in (self._compile_clause(*ex, today) for ex in excludes) if clause]
+
+    @staticmethod
+    def _compile_clause(clause_type, value, today):
+        value = str(value or "").lower().strip()
+        if clause_type in ("all", "next"):
+            return (clause_type, None)
+        if clause_type == "name":
+            # An empty name must never turn into "match everything"
+            return ("name", value) if value else None
+        if clause_type == "time":
+            target = resolve_target_time(value) if value else None
+            return ("time", target) if target else None
+        if clause_type == "date":
+            target = resolve_target_date(value, today) if value else None
+            return ("date", target) if target else None
+        return None
+
+    @staticmethod
+    def _clause_matches(clause, event, index) -> bool:
+        clause_type, target = clause
+        if clause_type == "all":
+            return True
+        if clause_type == "name":
+            return target in event.get('summary', '').lower()
+        local = index.local_start(event)
+        if clause_type == "time":
+            return bool(event['start'].get('dateTime')) and (local.hour, local.minute) == target
+        if clause_type == "date":
+            return local.date() == target
+        return False
+
+    @property
+    def valid(self) -> bool:
+        return self.include is not None
+
+    def excluded(self, event, index) -> bool:
+        return any(self._clause_matches(clause, event, index) for clause in self.excludes)
+
+    def matches(self, event, index) -> bool:
+        if self.include is None or self.include[0] == "next":
+            return False
+        return self._clause_matches(self.include, event, index) and not self.excluded(event, index)
+
+    def select(self, index, now) -> tuple:
+        """(matched, skipped) upcoming events; time/date includes are index lookups, not scans"""
+        if self.include is None:
+            return [], []
+
+        clause_type, target = self.include
+        if clause_type == "time":
+            candidates = index.at_time(*target, now=now)
+        elif clause_type == "date":
+            candidates = index.on_date(target, now=now)
+        elif clause_type == "next":
+            candidates = index.upcoming(now, limit=1)
+        elif clause_type == "all":
+            candidates = index.upcoming(now)
+        else:
+            candidates = [event for event in index.upcoming(now) if self._clause_matches(self.include, event, index)]
+
+        matched, skipped = [], []
+        for event in candidates:
+            (skipped if self.excluded(event, index) else matched).append(event)
+        return matched, skipped
+
+
+def compile_criteria(criteria: dict, today: datetime.date) -> CriteriaMatcher:
+    include_type = criteria.get("type", criteria.get("criteria_type"))
+    include_value = criteria.get("value", criteria.get("criteria_value"))
+
+    excepts = criteria.get("except") or []
+    if isinstance(excepts, dict):
+        excepts = [excepts]
+    excludes = [(ex.get("type"), ex.get("value")) for ex in excepts if ex.get("type") and ex.get("value")]
+
+    return CriteriaMatcher((include_type, include_value), excludes, today)
+
+# ================== CALENDAR FUNCTIONS ==================
+
+def parse_datetime(date_str, time_str):
+    """Enhanced datetime parsing supporting multiple date formats"""
+    today = datetime.datetime.now(INDIA_TZ).date()
+    target_date = parse_slot_date(date_str, today) or today
+    hour, minute = parse_clock_time(time_str) or (9, 0)
     naive_dt = datetime.datetime.combine(target_date, datetime.time(hour=hour, minute=minute))
-    result = india_tz.localize(naive_dt)
-    return result
+    return INDIA_TZ.localize(naive_dt)
+
+
+def event_id_for(user_id, title: str, start: datetime.datetime) -> str:
+    """Client-chosen event id, so re-sending an insert whose reply was lost can't create a
+    second event (hex digits are valid in Calendar's base32hex ids)"""
+    return hashlib.sha1(f"{user_id}|{title}|{start.isoformat()}".encode()).hexdigest()
+
+
+def insert_event(service, event: dict) -> dict:
+    """events.insert with event["id"] set; a 409 means that id exists already"""
+    try:
+        return google_execute(service.events().insert(calendarId="primary", body=event))
+    except HttpError as e:
+        if e.resp.status != 409:
+            raise
+    # Either an earlier attempt did land (its reply timed out and the user retried), or
+    # the same meeting was created and deleted before and the id is taken by a cancelled event
+    existing = google_execute(service.events().get(calendarId="primary", eventId=event["id"]))
+    if existing.get("status") != "cancelled":
+        print(f"♻️ Event {event['id']} already exists, not inserting it again")
+        return existing
+    event = {key: value for key, value in event.items() if key != "id"}
+    return google_execute(service.events().insert(calendarId="primary", body=event))
 
 
 def create_calendar_event(user_id, name, date_str, time_str, title=None):
@@ -387,13 +2245,15 @@ def create_calendar_event(user_id, name, date_str, time_str, title=None):
         service = get_calendar_service(user_id)
 
         event = {
+            "id": event_id_for(user_id, title, start_aware),
             "summary": title,
             "start": {"dateTime": start_aware.isoformat(), "timeZone": "Asia/Kolkata"},
             "end": {"dateTime": end_aware.isoformat(), "timeZone": "Asia/Kolkata"},
             "description": "Created by Calendar Agent"
         }
 
-        result = service.events().insert(calendarId="primary", body=event).execute()
+        result = insert_event(service, event)
+        mirror_apply(user_id, changed=[result])
         
         print(f"✅ Event created: {result['id']}")
 
@@ -403,27 +2263,88 @@ def create_calendar_event(user_id, name, date_str, time_str, title=None):
             "link": result.get("htmlLink", "")
         }
 
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"❌ Event creation error: {e}")
         return {"success": False, "message": f"❌ Error: {e}"}
 
 
-def list_upcoming_events(user_id, max_results=10, return_raw=False):
+CALENDAR_BATCH_LIMIT = 50  # Calendar API rejects batches with more calls than this
+
+def execute_batch(service, requests) -> list:
+    """Run API requests as HTTP batches; returns (response, error) pairs in input order"""
+    results = [None] * len(requests)
+    
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+    
+    for offset in range(0, len(requests), CALENDAR_BATCH_LIMIT):
+        chunk = requests[offset:offset + CALENDAR_BATCH_LIMIT]
+        batch = service.new_batch_http_request(callback=callback)
+        for idx, request in enumerate(chunk, offset):
+            batch.add(request, request_id=str(idx))
+        try:
+            google_execute(batch)
+        except Exception as e:
+            for idx in range(offset, offset + len(chunk)):
+                if results[idx] is None:
+                    results[idx] = (None, e)
+    
+    return results
+
+
+def delete_events(user_id, service, events, progress=None) -> tuple:
+    """Batch-delete events; returns (deleted, failed) lists of events"""
+    progress = progress or (lambda message: None)
+    requests = [service.events().delete(calendarId='primary', eventId=event['id']) for event in events]
+    deleted, failed = [], []
+    for event, (_, error) in zip(events, execute_batch(service, requests)):
+        if error is None:
+            deleted.append(event)
+            progress(f"🗑️ Deleted **{event.get('summary', 'Untitled')}**")
+        else:
+            print(f"Error deleting event {event['id']}: {error}")
+            failed.append(event)
+            progress(f"⚠️ Could not delete **{event.get('summary', 'Untitled')}**")
+    mirror_apply(user_id, deleted_ids=[event['id'] for event in deleted])
+    return deleted, failed
+
+
+def iter_event_indexes(user_id, service):
+    """Yield EventIndex chunks to match against: the whole mirror at once, or one per API page.
+
+    Without the mirror, pages are streamed (and prefetched over a connection of their own,
+    since httplib2 connections must not be shared across threads), so matching and
+    batch mutations on one page overlap with loading the next and memory stays flat.
+    """
+    if EVENT_MIRROR_ENABLED:
+        mirror = get_event_mirror(user_id)
+        mirror.sync(service)
+        yield mirror.index()
+        return
+
+    if EVENT_PREFETCH:
+        pages = prefetched(iter_upcoming_pages(service, http=google_http(load_tokens(user_id))))
+    else:
+        pages = iter_upcoming_pages(service)
+    for page in pages:
+        yield EventIndex(page)
+
+
+def list_upcoming_events(user_id, max_results=10, return_raw=False, progress=None):
     """List upcoming calendar events"""
+    progress = progress or (lambda message: None)
     try:
         service = get_calendar_service(user_id)
-        india_tz = pytz.timezone('Asia/Kolkata')
-        now = datetime.datetime.now(india_tz).isoformat()
 
-        events_result = service.events().list(
-            calendarId='primary',
-            timeMin=now,
-            maxResults=max_results,
-            singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        events = events_result.get('items', [])
+        if EVENT_MIRROR_ENABLED:
+            mirror = get_event_mirror(user_id)
+            mirror.sync(service)
+            events = mirror.upcoming()[:max_results]
+        else:
+            page_size = min(max_results, EVENT_PAGE_SIZE)
+            events = list(itertools.islice(iter_upcoming_events(service, page_size), max_results))
 
         if return_raw:
             return events
@@ -432,443 +2353,1217 @@ def list_upcoming_events(user_id, max_results=10, return_raw=False):
             return "📅 No upcoming events found."
 
         response = "📅 **Upcoming Events:**\n\n"
+        progress(response)
         for idx, event in enumerate(events, 1):
             start = event['start'].get('dateTime', event['start'].get('date'))
             summary = event.get('summary', 'No title')
             
             try:
-                dt = parser.parse(start)
+                dt = parse_timestamp(start)
                 formatted_time = dt.strftime('%b %d, %I:%M %p')
             except:
                 formatted_time = start
             
-            response += f"{idx}. **{summary}** - {formatted_time}\n"
+            line = f"{idx}. **{summary}** - {formatted_time}"
+            response += line + "\n"
+            progress(line)
 
         return response
 
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"❌ List events error: {e}")
         return f"❌ Error listing events: {e}"
 
 
-def update_event_time(user_id, criteria_type, criteria_value, time_change_type, time_amount):
+def reschedule_events(user_id, service, index, events, delta, progress=None) -> tuple:
+    """Shift timed events by delta in one batch; returns (details, failed_count)"""
+    progress = progress or (lambda message: None)
+    pending = []
+    for event in events:
+        if not event['start'].get('dateTime') or not event['end'].get('dateTime'):
+            continue
+        
+        start_dt, end_dt = index.bounds(event)
+        new_start = start_dt + delta
+        body = dict(event)
+        body['start'] = {**event['start'], 'dateTime': new_start.isoformat()}
+        body['end'] = {**event['end'], 'dateTime': (end_dt + delta).isoformat()}
+        
+        request = service.events().update(calendarId='primary', eventId=event['id'], body=body)
+        pending.append((event, start_dt, new_start, request))
+    
+    results = execute_batch(service, [request for _, _, _, request in pending])
+    
+    details = []
+    failed_count = 0
+    updated_events = []
+    for (event, start_dt, new_start, _), (updated_event, error) in zip(pending, results):
+        if error is not None:
+            failed_count += 1
+            print(f"Error updating event {event.get('id')}: {error}")
+            progress(f"⚠️ Could not move **{event.get('summary', 'Untitled')}**")
+            continue
+        
+        updated_events.append(updated_event)
+        summary = event.get('summary', 'Untitled')
+        old_time = start_dt.strftime('%b %d at %I:%M %p')
+        new_time = new_start.strftime('%b %d at %I:%M %p')
+        details.append(f"• **{summary}**: {old_time} → {new_time}")
+        progress(details[-1])
+    
+    mirror_apply(user_id, changed=updated_events)
+    return details, failed_count
+
+
+def update_event_time(user_id, criteria_type, criteria_value, time_change_type, time_amount, progress=None):
     """Update event time - postpone or prepone"""
+    progress = progress or (lambda message: None)
     try:
         service = get_calendar_service(user_id)
-        india_tz = pytz.timezone('Asia/Kolkata')
-        now = datetime.datetime.now(india_tz)
+        now = datetime.datetime.now(INDIA_TZ)
         
-        events = list_upcoming_events(user_id, max_results=50, return_raw=True)
+        if time_change_type == "postpone":
+            delta = datetime.timedelta(hours=time_amount)
+        else:  # prepone
+            delta = datetime.timedelta(hours=-time_amount)
         
-        if not events:
-            return "📅 No upcoming events to update."
+        matcher = compile_criteria({"type": criteria_type, "value": criteria_value}, now.date())
         
-        updated_count = 0
+        found_events = False
+        matched_events = False
+        processed_ids = set()  # a postponed event can show up again on a later page
         updated_details = []
+        failed_count = 0
         
-        # Find matching event(s)
-        matching_events = []
-        
-        if criteria_type == "name":
-            search_term = criteria_value.lower().strip()
-            for event in events:
-                summary = event.get('summary', '').lower()
-                if search_term in summary:
-                    matching_events.append(event)
-        
-        elif criteria_type == "time":
-            target_time = criteria_value.lower().strip()
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                try:
-                    dt = parser.parse(start)
-                    event_time = dt.strftime('%I:%M %p').lower()
-                    event_time_24 = dt.strftime('%H:%M')
-                    
-                    try:
-                        target_dt = parser.parse(target_time, fuzzy=True)
-                        target_formatted = target_dt.strftime('%I:%M %p').lower()
-                        target_24 = target_dt.strftime('%H:%M')
-                        
-                        if event_time == target_formatted or event_time_24 == target_24:
-                            matching_events.append(event)
-                    except:
-                        pass
-                except:
-                    pass
-        
-        elif criteria_type == "date":
-            date_str = criteria_value.lower().strip()
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                try:
-                    event_dt = parser.parse(start)
-                    
-                    if date_str == 'today':
-                        if event_dt.date() == now.date():
-                            matching_events.append(event)
-                    elif date_str == 'tomorrow':
-                        tomorrow = now.date() + datetime.timedelta(days=1)
-                        if event_dt.date() == tomorrow:
-                            matching_events.append(event)
-                    else:
-                        try:
-                            target_date_str = date_str
-                            year_match = re.search(r'\b(\d{2})\b$', target_date_str)
-                            if year_match:
-                                two_digit_year = int(year_match.group(1))
-                                four_digit_year = 2000 + two_digit_year if two_digit_year < 50 else 1900 + two_digit_year
-                                target_date_str = target_date_str.replace(year_match.group(1), str(four_digit_year))
-                            
-                            target_dt = parser.parse(target_date_str, fuzzy=True)
-                            if event_dt.date() == target_dt.date():
-                                matching_events.append(event)
-                        except:
-                            pass
-                except:
-                    pass
+        for index in iter_event_indexes(user_id, service):
+            if not index.upcoming(now, limit=1):
+                continue
+            found_events = True
+            
+            # Find matching event(s)
+            matching_events, _ = matcher.select(index, now)
+            matching_events = [event for event in matching_events if event['id'] not in processed_ids]
+            if matching_events:
+                matched_events = True
+                processed_ids.update(event['id'] for event in matching_events)
+                progress(f"🔎 Found {len(matching_events)} event(s) to reschedule…")
+                
+                # Update the matched events
+                details, failed = reschedule_events(user_id, service, index, matching_events, delta, progress)
+                updated_details.extend(details)
+                failed_count += failed
+            
+            if criteria_type == "next":
+                break
         
-        elif criteria_type == "next":
-            if events:
-                matching_events.append(events[0])
+        if not found_events:
+            return "📅 No upcoming events to update."
         
-        if not matching_events:
+        if not matched_events:
             return f"❌ No events found matching '{criteria_value}'."
         
-        # Update the matched events
-        for event in matching_events:
-            try:
-                event_id = event['id']
-                start = event['start'].get('dateTime')
-                end = event['end'].get('dateTime')
-                
-                if not start or not end:
-                    continue
-                
-                start_dt = parser.parse(start)
-                end_dt = parser.parse(end)
-                
-                # Calculate time delta
-                if time_change_type == "postpone":
-                    delta = datetime.timedelta(hours=time_amount)
-                else:  # prepone
-                    delta = datetime.timedelta(hours=-time_amount)
-                
-                new_start = start_dt + delta
-                new_end = end_dt + delta
-                
-                # Update the event
-                event['start']['dateTime'] = new_start.isoformat()
-                event['end']['dateTime'] = new_end.isoformat()
-                
-                updated_event = service.events().update(
-                    calendarId='primary',
-                    eventId=event_id,
-                    body=event
-                ).execute()
-                
-                updated_count += 1
-                summary = event.get('summary', 'Untitled')
-                old_time = start_dt.strftime('%b %d at %I:%M %p')
-                new_time = new_start.strftime('%b %d at %I:%M %p')
-                updated_details.append(f"• **{summary}**: {old_time} → {new_time}")
-                
-            except Exception as e:
-                print(f"Error updating event {event.get('id')}: {e}")
-        
+        updated_count = len(updated_details)
         if updated_count > 0:
             action = "Postponed" if time_change_type == "postpone" else "Preponed"
             response = f"⏰ {action} **{updated_count}** event(s) by {time_amount} hour(s):\n\n"
             response += "\n".join(updated_details)
+            if failed_count > 0:
+                response += f"\n⚠️ Failed to update **{failed_count}** event(s)."
             return response
         else:
             return "❌ Failed to update events."
         
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"❌ Update error: {e}")
         return f"❌ Error updating events: {e}"
 
 
-def delete_event_by_criteria(user_id, criteria_type, criteria_value, except_criteria=None):
+def delete_event_by_criteria(user_id, criteria_type, criteria_value, except_criteria=None, progress=None):
     """Delete events based on criteria with optional exceptions"""
+    progress = progress or (lambda message: None)
     try:
         service = get_calendar_service(user_id)
-        india_tz = pytz.timezone('Asia/Kolkata')
-        now = datetime.datetime.now(india_tz)
+        now = datetime.datetime.now(INDIA_TZ)
         
-        events = list_upcoming_events(user_id, max_results=50, return_raw=True)
+        if criteria_type not in ("all", "time", "name"):
+            return "❌ Invalid delete criteria."
         
-        if not events:
-            return "📅 No upcoming events to delete."
+        matcher = compile_criteria(
+            {"type": criteria_type, "value": criteria_value, "except": except_criteria},
+            now.date()
+        )
         
-        deleted_count = 0
-        skipped_count = 0
+        found_events = False
         deleted_names = []
         skipped_names = []
+        failed_count = 0
         
-        def should_skip_event(event):
-            if not except_criteria:
-                return False
-            
-            except_type = except_criteria.get('type')
-            except_value = except_criteria.get('value', '').lower().strip()
-            
-            if except_type == 'name':
-                summary = event.get('summary', '').lower()
-                if except_value in summary:
-                    return True
+        for index in iter_event_indexes(user_id, service):
+            if not index.upcoming(now, limit=1):
+                continue
+            found_events = True
             
-            elif except_type == 'date':
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                try:
-                    event_dt = parser.parse(start)
-                    
-                    if except_value == 'today':
-                        if event_dt.date() == now.date():
-                            return True
-                    elif except_value == 'tomorrow':
-                        tomorrow = now.date() + datetime.timedelta(days=1)
-                        if event_dt.date() == tomorrow:
-                            return True
-                    else:
-                        try:
-                            except_date_str = except_value
-                            year_match = re.search(r'\b(\d{2})\b$', except_date_str)
-                            if year_match:
-                                two_digit_year = int(year_match.group(1))
-                                four_digit_year = 2000 + two_digit_year if two_digit_year < 50 else 1900 + two_digit_year
-                                except_date_str = except_date_str.replace(year_match.group(1), str(four_digit_year))
-                            
-                            except_dt = parser.parse(except_date_str, fuzzy=True)
-                            if event_dt.date() == except_dt.date():
-                                return True
-                        except:
-                            pass
-                except:
-                    pass
+            to_delete, skipped = matcher.select(index, now)
+            skipped_names.extend(event.get('summary', 'Untitled') for event in skipped)
             
-            return False
+            if to_delete:
+                progress(f"🔎 Found {len(to_delete)} event(s) to delete…")
+            deleted, failed = delete_events(user_id, service, to_delete, progress)
+            deleted_names.extend(event.get('summary', 'Untitled') for event in deleted)
+            failed_count += len(failed)
+        
+        if not found_events:
+            return "📅 No upcoming events to delete."
+        
+        deleted_count = len(deleted_names)
+        skipped_count = len(skipped_names)
         
         if criteria_type == "all":
-            for event in events:
-                if should_skip_event(event):
-                    skipped_count += 1
-                    skipped_names.append(event.get('summary', 'Untitled'))
-                    continue
-                
-                try:
-                    service.events().delete(calendarId='primary', eventId=event['id']).execute()
-                    deleted_count += 1
-                    deleted_names.append(event.get('summary', 'Untitled'))
-                except Exception as e:
-                    print(f"Error deleting event {event['id']}: {e}")
-            
             response = f"🗑️ Deleted **{deleted_count}** upcoming events."
+            if failed_count > 0:
+                response += f"\n⚠️ Failed to delete **{failed_count}** event(s)."
             if skipped_count > 0:
                 response += f"\n✅ Kept **{skipped_count}** events as requested:\n" + "\n".join([f"• {name}" for name in skipped_names])
             return response
         
-        elif criteria_type == "time":
-            target_time = criteria_value.lower().strip()
-            
-            for event in events:
-                if should_skip_event(event):
-                    skipped_count += 1
-                    skipped_names.append(event.get('summary', 'Untitled'))
-                    continue
-                
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                try:
-                    dt = parser.parse(start)
-                    event_time = dt.strftime('%I:%M %p').lower()
-                    event_time_24 = dt.strftime('%H:%M')
-                    
-                    try:
-                        target_dt = parser.parse(target_time, fuzzy=True)
-                        target_formatted = target_dt.strftime('%I:%M %p').lower()
-                        target_24 = target_dt.strftime('%H:%M')
-                        
-                        if event_time == target_formatted or event_time_24 == target_24:
-                            service.events().delete(calendarId='primary', eventId=event['id']).execute()
-                            deleted_count += 1
-                            deleted_names.append(event.get('summary', 'Untitled'))
-                    except:
-                        pass
-                except:
-                    pass
-            
-            if deleted_count > 0:
-                response = f"🗑️ Deleted **{deleted_count}** event(s) at {criteria_value}:\n" + "\n".join([f"• {name}" for name in deleted_names])
-                if skipped_count > 0:
-                    response += f"\n✅ Kept **{skipped_count}** events as requested"
-                return response
-            else:
-                return f"❌ No events found at {criteria_value}."
-        
-        elif criteria_type == "name":
-            search_term = criteria_value.lower().strip()
-            
-            for event in events:
-                if should_skip_event(event):
-                    skipped_count += 1
-                    skipped_names.append(event.get('summary', 'Untitled'))
-                    continue
-                
-                summary = event.get('summary', '').lower()
-                if search_term in summary:
-                    service.events().delete(calendarId='primary', eventId=event['id']).execute()
-                    deleted_count += 1
-                    deleted_names.append(event.get('summary', 'Untitled'))
-            
-            if deleted_count > 0:
-                response = f"🗑️ Deleted **{deleted_count}** event(s) matching '{criteria_value}':\n" + "\n".join([f"• {name}" for name in deleted_names])
-                if skipped_count > 0:
-                    response += f"\n✅ Kept **{skipped_count}** events as requested"
-                return response
-            else:
-                return f"❌ No events found matching '{criteria_value}'."
+        if criteria_type == "time":
+            where = f"at {criteria_value}"
+        else:
+            where = f"matching '{criteria_value}'"
         
-        return "❌ Invalid delete criteria."
+        if deleted_count > 0:
+            response = f"🗑️ Deleted **{deleted_count}** event(s) {where}:\n" + "\n".join([f"• {name}" for name in deleted_names])
+            if failed_count > 0:
+                response += f"\n⚠️ Failed to delete **{failed_count}** event(s)."
+            if skipped_count > 0:
+                response += f"\n✅ Kept **{skipped_count}** events as requested"
+            return response
+        elif failed_count > 0:
+            return f"❌ Failed to delete **{failed_count}** event(s) {where}."
+        else:
+            return f"❌ No events found {where}."
         
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"❌ Delete error: {e}")
         return f"❌ Error deleting events: {e}"
 
-# ================== INTENT CLASSIFICATION ==================
+# ================== PROMPT TEMPLATES ==================
+
+# Compact prompts for every LLM call kind; the long few-shot prompts further down are used
+# when LLM_COMPACT_PROMPTS=0. Bump a kind's version whenever either of its prompts changes
+# so the response cache never serves a reply to an older prompt. {message} is substituted.
+PROMPT_TEMPLATES = {
+    "classify": {
+        "version": "2",
+        "compact": """Classify a calendar assistant message. Reply with JSON only:
+{"intent": "create_event"|"list_events"|"delete_event"|"update_event"|"greeting"|"thanks"|"other", "confidence": 0.0-1.0}
+create_event: schedule/book/set up. list_events: show/list/upcoming. delete_event: cancel/delete/remove. update_event: postpone/prepone/reschedule/delay/advance/move.
+Message: "{message}\"""",
+    },
+    "extract_update": {
+        "version": "2",
+        "compact": """Extract the reschedule request. Reply with JSON only:
+{"action": "postpone"|"prepone", "criteria_type": "name"|"time"|"date"|"next", "criteria_value": string|null, "time_amount": hours as number}
+"Postpone meeting with Bob by 2 hours" -> {"action": "postpone", "criteria_type": "name", "criteria_value": "Bob", "time_amount": 2}
+"Prepone next meeting by 30 minutes" -> {"action": "prepone", "criteria_type": "next", "criteria_value": null, "time_amount": 0.5}
+Message: "{message}\"""",
+    },
+    "extract_delete": {
+        "version": "3",
+        "compact": """Extract what to delete. Reply with JSON only:
+{"type": "all"|"time"|"name", "value": string|null, "except": {"type": "name"|"date"|null, "value": string|null}}
+"Delete event at 2 PM" -> {"type": "time", "value": "2 PM", "except": {"type": null, "value": null}}
+"Cancel all except meeting with Aman" -> {"type": "all", "value": null, "except": {"type": "name", "value": "Aman"}}
+"Cancel all except tomorrow" -> {"type": "all", "value": null, "except": {"type": "date", "value": "tomorrow"}}
+Message: "{message}\"""",
+    },
+    "command": {
+        "version": "2",
+        "compact": """Classify a calendar assistant message and extract its arguments. Reply with JSON only:
+{"intent": "create_event"|"list_events"|"delete_event"|"update_event"|"greeting"|"thanks"|"other", "confidence": 0.0-1.0,
+ "delete": null|{"type": "all"|"time"|"name", "value": string|null, "except": {"type": "name"|"date"|null, "value": string|null}},
+ "update": null|{"action": "postpone"|"prepone", "criteria_type": "name"|"time"|"date"|"next", "criteria_value": string|null, "time_amount": hours as number}}
+Fill "delete" only for delete_event and "update" only for update_event.
+"Cancel all except today's" -> {"intent": "delete_event", "confidence": 0.95, "delete": {"type": "all", "value": null, "except": {"type": "date", "value": "today"}}, "update": null}
+"Delay next meeting by 30 minutes" -> {"intent": "update_event", "confidence": 0.95, "delete": null, "update": {"action": "postpone", "criteria_type": "next", "criteria_value": null, "time_amount": 0.5}}
+Message: "{message}\"""",
+    },
+}
+
+PROMPT_VERSIONS = {
+    kind: template["version"] + ("-compact" if LLM_COMPACT_PROMPTS else "")
+    for kind, template in PROMPT_TEMPLATES.items()
+}
+
+
+def render_prompt(kind: str, user_message: str) -> str:
+    if LLM_COMPACT_PROMPTS:
+        return PROMPT_TEMPLATES[kind]["compact"].replace("{message}", user_message)
+    return LLM_CALLS[kind]["prompt"](user_message)
+
+# ================== LLM RESPONSE CACHE ==================
+
+_RELATIVE_DATE_RE = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|this|next|last|"
+    r"mon|tue|wed|thu|fri|sat|sun|monday|tuesday|wednesday|thursday|friday|saturday|sunday)\b"
+)
+_NORMALIZE_DROP_RE = re.compile(r"[^a-z0-9\s:'/.\-]")
+
+_llm_cache_stats = {}
+_llm_cache_stats_lock = threading.Lock()
+
+
+def normalize_message(text: str) -> str:
+    """Lowercase, drop emoji/punctuation noise and collapse whitespace"""
+    text = _NORMALIZE_DROP_RE.sub(" ", text.lower())
+    return " ".join(text.split()).strip(" .")
+
+
+def llm_cache_key(kind: str, user_message: str) -> Optional[str]:
+    if not LLM_CACHE_ENABLED:
+        return None
+    normalized = normalize_message(user_message)
+    if not normalized:
+        return None
+    parts = [kind, PROMPT_VERSIONS[kind], normalized]
+    if _RELATIVE_DATE_RE.search(normalized):
+        # "tomorrow" means something else tomorrow; scope such replies to the local date
+        parts.append(datetime.datetime.now(INDIA_TZ).date().isoformat())
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def _count_llm_cache(kind: str, outcome: str):
+    with _llm_cache_stats_lock:
+        counters = _llm_cache_stats.setdefault(kind, {"memory_hits": 0, "db_hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+
+def llm_cache_get(kind: str, key: Optional[str]) -> Optional[dict]:
+    if key is None:
+        return None
+
+    value = llm_cache.get(key)
+    if value is not None:
+        _count_llm_cache(kind, "memory_hits")
+        return json.loads(value)
+
+    if LLM_CACHE_BACKEND == "postgres":
+        try:
+            with get_db() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT value FROM llm_cache WHERE key=%s AND expires_at > %s", (key, _utcnow()))
+                    row = cur.fetchone()
+            if row:
+                llm_cache.set(key, row["value"])
+                _count_llm_cache(kind, "db_hits")
+                return json.loads(row["value"])
+        except Exception as e:
+            print(f"⚠️ LLM cache lookup failed: {e}")
+
+    _count_llm_cache(kind, "misses")
+    return None
+
+
+def llm_cache_put(key: Optional[str], value: dict):
+    if key is None:
+        return
+    serialized = json.dumps(value)
+    llm_cache.set(key, serialized)
+
+    if LLM_CACHE_BACKEND == "postgres":
+        try:
+            with get_db() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        INSERT INTO llm_cache (key, value, expires_at) VALUES (%s,%s,%s)
+                        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+                    """, (key, serialized, _utcnow() + datetime.timedelta(seconds=LLM_CACHE_TTL)))
+        except Exception as e:
+            print(f"⚠️ LLM cache write failed: {e}")
+
+
+def llm_cache_stats() -> dict:
+    with _llm_cache_stats_lock:
+        stats = {kind: dict(counters) for kind, counters in _llm_cache_stats.items()}
+    for counters in stats.values():
+        lookups = counters["memory_hits"] + counters["db_hits"] + counters["misses"]
+        counters["hit_rate"] = (lookups - counters["misses"]) / lookups if lookups else 0.0
+    return stats
+
+# ================== LOCAL INTENT CLASSIFIER ==================
+
+class IntentClassifier:
+    """Hashed word uni/bigrams and character trigrams, fed to a multinomial logistic
+    regression. Pure Python, so it trains and predicts anywhere the app runs."""
+
+    VERSION = 1
+
+    def __init__(self, intents: list, dims: int = 1 << 18, weights: Optional[dict] = None,
+                 bias: Optional[list] = None):
+        self.intents = list(intents)
+        self.dims = dims
+        self.weights = weights or {}  # feature index -> [weight per intent]
+        self.bias = bias or [0.0] * len(self.intents)
+
+    def features(self, text: str) -> dict:
+        words = normalize_message(text).split()
+        grams = [f"w:{word}" for word in words]
+        grams += [f"b:{first} {second}" for first, second in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            grams += [f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        counts = {}
+        for gram in grams:
+            index = zlib.crc32(gram.encode()) % self.dims
+            counts[index] = counts.get(index, 0.0) + 1.0
+        norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+        return {index: value / norm for index, value in counts.items()}
+
+    def _probabilities(self, features: dict) -> list:
+        scores = list(self.bias)
+        for index, value in features.items():
+            row = self.weights.get(index)
+            if row:
+                for k, weight in enumerate(row):
+                    scores[k] += weight * value
+        top = max(scores)
+        exps = [math.exp(score - top) for score in scores]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def probabilities(self, text: str) -> dict:
+        return dict(zip(self.intents, self._probabilities(self.features(text))))
+
+    def predict(self, text: str) -> tuple:
+        """(intent, probability) of the most likely intent"""
+        probabilities = self._probabilities(self.features(text))
+        best = max(range(len(probabilities)), key=probabilities.__getitem__)
+        return self.intents[best], probabilities[best]
+
+    @classmethod
+    def train(cls, examples: list, epochs: int = 30, learning_rate: float = 0.5,
+              l2: float = 1e-5, seed: int = 0) -> "IntentClassifier":
+        """SGD on (text, intent) pairs"""
+        intents = sorted({intent for _, intent in examples})
+        model = cls(intents)
+        rows = [(model.features(text), intents.index(intent)) for text, intent in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(rows)
+            rate = learning_rate / (1 + 0.1 * epoch)
+            for features, label in rows:
+                probabilities = model._probabilities(features)
+                gradient = [p - (1.0 if k == label else 0.0) for k, p in enumerate(probabilities)]
+                for k, g in enumerate(gradient):
+                    model.bias[k] -= rate * g
+                for index, value in features.items():
+                    row = model.weights.setdefault(index, [0.0] * len(intents))
+                    for k, g in enumerate(gradient):
+                        row[k] -= rate * (g * value + l2 * row[k])
+        return model
+
+    def save(self, path: str, prune: float = 1e-4, metadata: Optional[dict] = None):
+        weights = {
+            str(index): [round(weight, 5) for weight in row]
+            for index, row in self.weights.items()
+            if max(abs(weight) for weight in row) >= prune
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as file:
+            json.dump({
+                "version": self.VERSION,
+                "intents": self.intents,
+                "dims": self.dims,
+                "bias": [round(b, 5) for b in self.bias],
+                "weights": weights,
+                "metadata": metadata or {},
+            }, file, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path: str) -> "IntentClassifier":
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"unsupported intent model version {data.get('version')}")
+        weights = {int(index): row for index, row in data["weights"].items()}
+        return cls(data["intents"], data["dims"], weights, data["bias"])
+
+
+intent_model: Optional[IntentClassifier] = None
+local_intent_stats = {"local": 0, "escalated": 0}
+_local_intent_lock = threading.Lock()
+_intent_log_lock = threading.Lock()
+
+DESTRUCTIVE_INTENTS = ("delete_event", "update_event")
+_INTENT_HEDGE_RE = re.compile(r"\b(?:not|don'?t|dont|never|no|stop|instead|then|also|now)\b|,")
+
+
+def load_intent_model():
+    """Load the saved classifier at startup; without one every message goes to the LLM"""
+    global intent_model
+    if not INTENT_LOCAL_ENABLED:
+        return
+    try:
+        intent_model = IntentClassifier.load(INTENT_MODEL_PATH)
+        print(f"✅ Local intent classifier: {len(intent_model.weights)} features, "
+              f"threshold {INTENT_LOCAL_THRESHOLD}, {INTENT_LOCAL_DESTRUCTIVE_THRESHOLD} for delete/update")
+    except FileNotFoundError:
+        print(f"⚠️ No intent model at {INTENT_MODEL_PATH}, classifying with the LLM only")
+    except Exception as e:
+        print(f"❌ Could not load intent model: {e}")
+
+
+def accept_local_intent(user_message: str, intent: str, confidence: float,
+                        threshold: float = None, destructive_threshold: float = None) -> bool:
+    """Whether a local prediction can stand without the LLM"""
+    if intent in DESTRUCTIVE_INTENTS:
+        if _INTENT_HEDGE_RE.search(user_message.lower()):
+            return False
+        if destructive_threshold is None:
+            destructive_threshold = INTENT_LOCAL_DESTRUCTIVE_THRESHOLD
+        return confidence >= destructive_threshold
+    if threshold is None:
+        threshold = INTENT_LOCAL_THRESHOLD
+    return confidence >= threshold
+
+
+def classify_intent_locally(user_message: str) -> Optional[dict]:
+    """The local prediction if accept_local_intent allows it, else None (escalate)"""
+    if intent_model is None:
+        return None
+    started = time.perf_counter()
+    intent, confidence = intent_model.predict(user_message)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if not accept_local_intent(user_message, intent, confidence):
+        with _local_intent_lock:
+            local_intent_stats["escalated"] += 1
+        print(f"🎯 Local intent {intent} ({confidence:.2f}) not trusted, asking the LLM")
+        return None
+    with _local_intent_lock:
+        local_intent_stats["local"] += 1
+    print(f"🎯 Intent classified locally: {intent} ({confidence:.2f}, {elapsed_ms:.2f} ms)")
+    return {"intent": intent, "confidence": round(confidence, 3), "source": "local"}
+
+
+def log_intent_example(user_message: str, result: dict, latency_ms: float):
+    """Append an LLM-labelled message to INTENT_LOG_PATH for the next training run"""
+    if not INTENT_LOG_PATH or result.get("confidence", 0) <= 0:
+        return
+    record = {
+        "text": normalize_message(user_message),
+        "intent": result.get("intent"),
+        "confidence": result.get("confidence"),
+        "latency_ms": round(latency_ms, 1),
+    }
+    try:
+        with _intent_log_lock, open(INTENT_LOG_PATH, "a") as file:
+            file.write(json.dumps(record) + "\n")
+    except Exception as e:
+        print(f"⚠️ Could not log intent example: {e}")
+
+# ================== RULE-BASED ARGUMENTS ==================
+
+_DELETE_VERB_RE = re.compile(r"\b(?:cancel|delete|remove|clear|drop|erase|wipe|get rid of)\b")
+_EXCEPT_RE = re.compile(r"\b(?:except(?:\s+for)?|but\s+not|other\s+than|apart\s+from|besides)\b")
+_ALL_RE = re.compile(r"\b(?:all|everything|every|entire|whole)\b")
+_POSTPONE_RE = re.compile(r"\b(?:postpone|delay|push(?:\s+back)?|move\s+back|later)\b")
+_PREPONE_RE = re.compile(r"\b(?:prepone|advance|bring\s+forward|pull(?:\s+forward)?|move\s+(?:forward|up)|earlier)\b")
+_NEXT_RE = re.compile(r"\b(?:next|upcoming)\s+(?:meeting|event|call|one)\b")
+_AMOUNT_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30, "forty": 40, "forty five": 45,
+    "half an": 0.5, "half a": 0.5,
+}
+_AMOUNT_RE = re.compile(
+    r"\b(?:by\s+)?(?P<amount>\d+(?:\.\d+)?|"
+    + "|".join(sorted(_AMOUNT_WORDS, key=len, reverse=True)).replace(" ", r"\s+")
+    + r")(?P<half>\s+and\s+a\s+half)?\s*(?P<unit>hours?|hrs?|h|minutes?|mins?)\b"
+)
+_ARGS_FILLER_WORDS = {
+    "please", "can", "could", "you", "i", "want", "to", "me", "just", "my", "the", "a", "an", "of",
+    "on", "at", "in", "for", "s", "that", "is", "are", "scheduled", "meeting", "meetings", "event",
+    "events", "call", "calls", "calendar", "one", "ones", "all", "up", "back", "forward", "move",
+    "reschedule", "shift", "by", "with",
+}
+
+# Guesses (a bare one-word name, a 12-hour time without am/pm, 12/10) are left to the LLM
+ARGS_MIN_SLOT_CONFIDENCE = 0.8
+
+args_rule_stats = {"delete": {"rules": 0, "llm": 0}, "update": {"rules": 0, "llm": 0}}
+
+
+def _coverage(text: str, spans: list) -> float:
+    """Share of the words in text that a recognised span or a filler word explains"""
+    words = re.findall(r"[a-z0-9]+", text)
+    if not words:
+        return 0.0
+    chars = list(text)
+    for start, end in spans:
+        chars[start:end] = " " * (end - start)
+    leftover = [word for word in re.findall(r"[a-z0-9]+", "".join(chars)) if word not in _ARGS_FILLER_WORDS]
+    return 1 - len(leftover) / len(words)
+
+
+def _parse_amount(match) -> float:
+    raw = " ".join(match.group("amount").split())
+    amount = float(raw) if raw[0].isdigit() else float(_AMOUNT_WORDS[raw])
+    if match.group("half"):
+        amount += 0.5
+    if match.group("unit").startswith("m"):
+        amount /= 60
+    amount = round(amount, 4)
+    return int(amount) if amount == int(amount) else amount
+
+
+def _slot_spans(text: str, offset: int = 0) -> tuple:
+    """best_slots() of text, the spans of every candidate shifted by offset, and whether
+    the slots are unsure: a slot had more than one candidate (best_slots would silently
+    drop the others) or its best one is below ARGS_MIN_SLOT_CONFIDENCE"""
+    candidates = scan_slots(text)
+    offset += len(text) - len(text.lstrip())  # scan_slots positions are relative to the stripped text
+    spans = [(offset + c.start, offset + c.end) for c in candidates]
+    slots = [c.slot for c in candidates]
+    best = best_slots(candidates)
+    guessed = any(c.confidence < ARGS_MIN_SLOT_CONFIDENCE for c in best.values())
+    return best, spans, guessed or len(slots) != len(set(slots))
+
+
+def _mask(text: str, spans: list) -> str:
+    for start, end in spans:
+        text = text[:start] + " " * (end - start) + text[end:]
+    return text
+
+
+def parse_delete_args(user_message: str) -> Optional[tuple]:
+    """Rules for extract_delete_criteria's JSON shape; returns (criteria, confidence) or None.
+
+    Handles "cancel all [except <date | meeting with X>]", "delete event at 2 PM" and
+    "cancel meeting with Bob"; anything with another target, a guessed slot, several
+    targets or several exceptions goes to the LLM.
+    """
+    text = user_message.lower().strip()
+    verb = _DELETE_VERB_RE.search(text)
+    if not verb:
+        return None
+    spans = [verb.span()]
+
+    except_match = _EXCEPT_RE.search(text)
+    main_end = except_match.start() if except_match else len(text)
+    best, slot_spans, unsure = _slot_spans(text[:main_end])
+    if unsure or ("time" in best and "name" in best):
+        return None
+    spans += slot_spans
+
+    except_clause = {"type": None, "value": None}
+    if except_match:
+        spans.append(except_match.span())
+        except_best, except_spans, unsure = _slot_spans(text[except_match.end():], except_match.end())
+        if unsure or len(except_best) > 1:
+            return None
+        spans += except_spans
+        if "date" in except_best:
+            except_clause = {"type": "date", "value": except_best["date"].value}
+        elif "name" in except_best:
+            except_clause = {"type": "name", "value": except_best["name"].value}
+        else:
+            return None
+
+    if "date" in best:
+        return None
+    if "time" in best:
+        criteria = {"type": "time", "value": best["time"].value}
+    elif "name" in best:
+        criteria = {"type": "name", "value": best["name"].value}
+    else:
+        every = _ALL_RE.search(text[:main_end])
+        if not every and not except_match and not re.search(r"\b(?:clear|wipe)\b", text):
+            return None
+        if every:
+            spans.append(every.span())
+        criteria = {"type": "all", "value": None}
+    criteria["except"] = except_clause
+    return criteria, _coverage(text, spans)
+
+
+def parse_update_args(user_message: str) -> Optional[tuple]:
+    """Rules for extract_update_criteria's JSON shape; returns (criteria, confidence) or None.
+
+    Needs a direction (postpone/delay/push back vs prepone/advance/bring forward), an
+    amount ("by 2 hours", "30 minutes", "half an hour") and a target: the next meeting,
+    a time, "meeting with X" or a date. Exactly one target: "the 2 PM meeting with Bob"
+    could mean either, so it goes to the LLM.
+    """
+    text = user_message.lower().strip()
+    postpone = [match.span() for match in _POSTPONE_RE.finditer(text)]
+    prepone = [match.span() for match in _PREPONE_RE.finditer(text)]
+    amount = _AMOUNT_RE.search(text)
+    if bool(postpone) == bool(prepone) or not amount:
+        return None
+    action = "postpone" if postpone else "prepone"
+    spans = postpone + prepone + [amount.span()]
+
+    # Direction words and the amount aren't slots ("meeting earlier" is not a name)
+    best, slot_spans, unsure = _slot_spans(_mask(text, spans))
+    upcoming = _NEXT_RE.search(text)
+    if unsure or len(best) + bool(upcoming) > 1:
+        return None
+    spans += slot_spans
+    if upcoming:
+        spans.append(upcoming.span())
+        criteria_type, criteria_value = "next", None
+    elif best:
+        criteria_type, target = next(iter(best.items()))
+        criteria_value = target.value
+    else:
+        return None
+
+    criteria = {
+        "action": action,
+        "criteria_type": criteria_type,
+        "criteria_value": criteria_value,
+        "time_amount": _parse_amount(amount),
+    }
+    return criteria, _coverage(text, spans)
+
+
+def rule_args(kind: str, user_message: str) -> Optional[dict]:
+    """Criteria from the rules when they explain the whole message, else None (ask the LLM)"""
+    if not ARGS_RULES_ENABLED:
+        return None
+    parse = parse_delete_args if kind == "delete" else parse_update_args
+    parsed = parse(user_message)
+    if parsed is None or parsed[1] < ARGS_RULES_THRESHOLD:
+        args_rule_stats[kind]["llm"] += 1
+        return None
+    args_rule_stats[kind]["rules"] += 1
+    print(f"🔍 {kind.capitalize()} criteria (rules, {parsed[1]:.2f}): {parsed[0]}")
+    return parsed[0]
+
+# ================== INTENT CLASSIFICATION ==================
+
+def classify_prompt(user_message: str) -> str:
+    return f"""You are a calendar assistant. Classify the user's intent.
+
+User message: "{user_message}"
+
+Respond ONLY with a JSON object (no markdown, no extra text):
+{{
+    "intent": "create_event" | "list_events" | "delete_event" | "update_event" | "greeting" | "thanks" | "other",
+    "confidence": 0.0-1.0
+}}
+
+Intent guidelines:
+- "delete_event" includes: cancel, delete, remove events
+- "create_event" includes: schedule, create, book, set up meetings
+- "list_events" includes: show, list, what's on calendar, upcoming
+- "update_event" includes: postpone, prepone, reschedule, delay, advance, move forward, move back
+
+Examples:
+- "Schedule meeting with Bob tomorrow" -> {{"intent": "create_event", "confidence": 0.95}}
+- "List my meetings" -> {{"intent": "list_events", "confidence": 0.9}}
+- "Cancel meeting at 2 PM" -> {{"intent": "delete_event", "confidence": 0.9}}
+- "Delete all events" -> {{"intent": "delete_event", "confidence": 0.95}}
+- "Postpone meeting by 2 hours" -> {{"intent": "update_event", "confidence": 0.95}}
+- "Prepone tomorrow's meeting by 1 hour" -> {{"intent": "update_event", "confidence": 0.95}}
+- "Hi" -> {{"intent": "greeting", "confidence": 1.0}}
+"""
+
+
+def update_criteria_prompt(user_message: str) -> str:
+    return f"""Extract update criteria from the user's message about postponing or preponing events.
+
+User message: "{user_message}"
+
+Respond ONLY with a JSON object (no markdown):
+{{
+    "action": "postpone" | "prepone",
+    "criteria_type": "name" | "time" | "date" | "next",
+    "criteria_value": "meeting name or time or date" | null,
+    "time_amount": number (hours as integer or float)
+}}
+
+Examples:
+- "Postpone meeting with Bob by 2 hours" -> {{"action": "postpone", "criteria_type": "name", "criteria_value": "Bob", "time_amount": 2}}
+- "Prepone 2 PM meeting by 1 hour" -> {{"action": "prepone", "criteria_type": "time", "criteria_value": "2 PM", "time_amount": 1}}
+- "Postpone tomorrow's meeting by 3 hours" -> {{"action": "postpone", "criteria_type": "date", "criteria_value": "tomorrow", "time_amount": 3}}
+- "Prepone next meeting by 30 minutes" -> {{"action": "prepone", "criteria_type": "next", "criteria_value": null, "time_amount": 0.5}}
+- "Delay meeting at 6 o'clock by 1 hour" -> {{"action": "postpone", "criteria_type": "time", "criteria_value": "6 o'clock", "time_amount": 1}}
+"""
+
+
+def delete_criteria_prompt(user_message: str) -> str:
+    return f"""Extract deletion criteria from the user's message, including any exceptions.
+
+User message: "{user_message}"
+
+Respond ONLY with a JSON object (no markdown):
+{{
+    "type": "all" | "time" | "name",
+    "value": "specific time or name" | null,
+    "except": {{
+        "type": "name" | "date" | null,
+        "value": "exception value" | null
+    }}
+}}
+
+Examples:
+- "Cancel all meetings" -> {{"type": "all", "value": null, "except": {{"type": null, "value": null}}}}
+- "Delete event at 2 PM" -> {{"type": "time", "value": "2 PM", "except": {{"type": null, "value": null}}}}
+- "Cancel all events except meeting with Aman" -> {{"type": "all", "value": null, "except": {{"type": "name", "value": "Aman"}}}}
+- "Delete all meetings except today's" -> {{"type": "all", "value": null, "except": {{"type": "date", "value": "today"}}}}
+- "Cancel all except tomorrow" -> {{"type": "all", "value": null, "except": {{"type": "date", "value": "tomorrow"}}}}
+- "Remove all events except 16 Dec" -> {{"type": "all", "value": null, "except": {{"type": "date", "value": "16 Dec"}}}}
+"""
+
+
+def classify_intent(user_message: str) -> dict:
+    """Classify user intent locally when confident, otherwise with the LLM"""
+    with span("classify_intent") as labels:
+        local = classify_intent_locally(user_message)
+        if local:
+            labels.update(intent=local["intent"], outcome="local")
+            return local
+        started = time.perf_counter()
+        result = llm_call("classify", user_message)
+        labels.update(intent=result.get("intent"), outcome="llm")
+    log_intent_example(user_message, result, (time.perf_counter() - started) * 1000)
+    return result
+
+
+def extract_update_criteria(user_message: str) -> dict:
+    """Extract update/reschedule criteria from user message"""
+    with span("extract_update", "update_event") as labels:
+        criteria = rule_args("update", user_message)
+        labels["outcome"] = "rules" if criteria else "llm"
+        return criteria or llm_call("extract_update", user_message)
+
+
+def extract_delete_criteria(user_message: str) -> dict:
+    """Extract what to delete from user message, including exceptions"""
+    with span("extract_delete", "delete_event") as labels:
+        criteria = rule_args("delete", user_message)
+        labels["outcome"] = "rules" if criteria else "llm"
+        return criteria or llm_call("extract_delete", user_message)
+
+
+async def classify_intent_async(user_message: str) -> dict:
+    with span("classify_intent") as labels:
+        local = classify_intent_locally(user_message)
+        if local:
+            labels.update(intent=local["intent"], outcome="local")
+            return local
+        started = time.perf_counter()
+        result = await llm_call_async("classify", user_message)
+        labels.update(intent=result.get("intent"), outcome="llm")
+    if INTENT_LOG_PATH:
+        await run_blocking(log_intent_example, user_message, result, (time.perf_counter() - started) * 1000)
+    return result
+
+
+async def extract_update_criteria_async(user_message: str) -> dict:
+    with span("extract_update", "update_event") as labels:
+        criteria = rule_args("update", user_message)
+        labels["outcome"] = "rules" if criteria else "llm"
+        return criteria or await llm_call_async("extract_update", user_message)
+
+
+async def extract_delete_criteria_async(user_message: str) -> dict:
+    with span("extract_delete", "delete_event") as labels:
+        criteria = rule_args("delete", user_message)
+        labels["outcome"] = "rules" if criteria else "llm"
+        return criteria or await llm_call_async("extract_delete", user_message)
+
+
+# ================== COMBINED EXTRACTION ==================
+
+INTENTS = ("create_event", "list_events", "delete_event", "update_event", "greeting", "thanks", "other")
+
+COMMAND_SCHEMA = {
+    "intent": INTENTS,
+    "delete": {
+        "type": ("all", "time", "name"),
+        "except_type": ("name", "date", None),
+    },
+    "update": {
+        "action": ("postpone", "prepone"),
+        "criteria_type": ("name", "time", "date", "next"),
+    },
+}
+
+
+def parse_json_reply(text: str) -> dict:
+    text = text.strip().replace("```json", "").replace("```", "").strip()
+    return json.loads(text)
+
+
+def validate_command(data: dict) -> dict:
+    """Check a combined-extraction reply against COMMAND_SCHEMA; raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError("reply is not an object")
+
+    intent = data.get("intent")
+    if intent not in COMMAND_SCHEMA["intent"]:
+        raise ValueError(f"unknown intent {intent!r}")
+    confidence = data.get("confidence", 0.0)
+    if not isinstance(confidence, (int, float)) or not 0.0 <= confidence <= 1.0:
+        raise ValueError(f"bad confidence {confidence!r}")
+
+    command = {"intent": intent, "confidence": float(confidence)}
+
+    if intent == "delete_event":
+        command["delete"] = validate_delete_args(data.get("delete"))
+    elif intent == "update_event":
+        command["update"] = validate_update_args(data.get("update"))
+
+    return command
+
+
+def validate_intent(data: dict) -> dict:
+    """Check a classify reply; raises ValueError"""
+    if not isinstance(data, dict) or data.get("intent") not in COMMAND_SCHEMA["intent"]:
+        raise ValueError(f"bad intent reply {data!r}")
+    return data
+
+
+def validate_delete_args(delete: dict) -> dict:
+    """Check delete criteria against COMMAND_SCHEMA; raises ValueError"""
+    if not isinstance(delete, dict) or delete.get("type") not in COMMAND_SCHEMA["delete"]["type"]:
+        raise ValueError(f"bad delete arguments {delete!r}")
+    if delete["type"] != "all" and not delete.get("value"):
+        raise ValueError("delete by time/name needs a value")
+    except_clause = delete.get("except") or {}
+    if except_clause.get("type") not in COMMAND_SCHEMA["delete"]["except_type"]:
+        raise ValueError(f"bad except clause {except_clause!r}")
+    # "except today" read as a person would delete everything, today's meetings included
+    if except_clause.get("type") == "name" and any(
+            candidate.slot == "date" for candidate in scan_slots(str(except_clause.get("value") or ""))):
+        raise ValueError(f"except-by-name value {except_clause['value']!r} is a date")
+    return {
+        "type": delete["type"],
+        "value": delete.get("value"),
+        "except": {"type": except_clause.get("type"), "value": except_clause.get("value")},
+    }
+
+
+def validate_update_args(update: dict) -> dict:
+    """Check update criteria against COMMAND_SCHEMA; raises ValueError"""
+    if not isinstance(update, dict):
+        raise ValueError(f"bad update arguments {update!r}")
+    if update.get("action") not in COMMAND_SCHEMA["update"]["action"]:
+        raise ValueError(f"bad action {update.get('action')!r}")
+    if update.get("criteria_type") not in COMMAND_SCHEMA["update"]["criteria_type"]:
+        raise ValueError(f"bad criteria_type {update.get('criteria_type')!r}")
+    amount = update.get("time_amount")
+    if not isinstance(amount, (int, float)) or amount <= 0:
+        raise ValueError(f"bad time_amount {amount!r}")
+    return {
+        "action": update["action"],
+        "criteria_type": update["criteria_type"],
+        "criteria_value": update.get("criteria_value"),
+        "time_amount": amount,
+    }
+
+
+def command_prompt(user_message: str) -> str:
+    return f"""You are a calendar assistant. Classify the user's intent and extract its arguments.
+
+User message: "{user_message}"
+
+Respond with a JSON object:
+{{
+    "intent": "create_event" | "list_events" | "delete_event" | "update_event" | "greeting" | "thanks" | "other",
+    "confidence": 0.0-1.0,
+    "delete": null | {{"type": "all" | "time" | "name", "value": string | null, "except": {{"type": "name" | "date" | null, "value": string | null}}}},
+    "update": null | {{"action": "postpone" | "prepone", "criteria_type": "name" | "time" | "date" | "next", "criteria_value": string | null, "time_amount": hours as number}}
+}}
+
+Fill "delete" only for delete_event and "update" only for update_event; otherwise null.
+- "delete_event": cancel, delete, remove events
+- "create_event": schedule, create, book, set up meetings
+- "list_events": show, list, what's on calendar, upcoming
+- "update_event": postpone, prepone, reschedule, delay, advance, move forward, move back
+
+Examples:
+- "List my meetings" -> {{"intent": "list_events", "confidence": 0.9, "delete": null, "update": null}}
+- "Cancel all events except meeting with Aman" -> {{"intent": "delete_event", "confidence": 0.95, "delete": {{"type": "all", "value": null, "except": {{"type": "name", "value": "Aman"}}}}, "update": null}}
+- "Delete event at 2 PM" -> {{"intent": "delete_event", "confidence": 0.9, "delete": {{"type": "time", "value": "2 PM", "except": {{"type": null, "value": null}}}}, "update": null}}
+- "Delete all meetings except today's" -> {{"intent": "delete_event", "confidence": 0.95, "delete": {{"type": "all", "value": null, "except": {{"type": "date", "value": "today"}}}}, "update": null}}
+- "Postpone meeting with Bob by 2 hours" -> {{"intent": "update_event", "confidence": 0.95, "delete": null, "update": {{"action": "postpone", "criteria_type": "name", "criteria_value": "Bob", "time_amount": 2}}}}
+- "Prepone next meeting by 30 minutes" -> {{"intent": "update_event", "confidence": 0.95, "delete": null, "update": {{"action": "prepone", "criteria_type": "next", "criteria_value": null, "time_amount": 0.5}}}}
+- "Delay meeting at 6 o'clock by 1 hour" -> {{"intent": "update_event", "confidence": 0.95, "delete": null, "update": {{"action": "postpone", "criteria_type": "time", "criteria_value": "6 o'clock", "time_amount": 1}}}}
+- "Hi" -> {{"intent": "greeting", "confidence": 1.0, "delete": null, "update": null}}
+"""
+
+
+def extract_command(user_message: str) -> Optional[dict]:
+    """Classify intent and extract delete/update arguments in one JSON-mode call.
+
+    Returns None when the reply fails validation, so callers can fall back to the
+    two-step classify_intent + extract_* flow.
+    """
+    with span("extract_command") as labels:
+        command = llm_call("command", user_message)
+        labels.update(intent=(command or {}).get("intent"), outcome="ok" if command else "invalid")
+        return command
+
+
+async def extract_command_async(user_message: str) -> Optional[dict]:
+    with span("extract_command") as labels:
+        command = await llm_call_async("command", user_message)
+        labels.update(intent=(command or {}).get("intent"), outcome="ok" if command else "invalid")
+        return command
+
+
+def use_combined_extraction(user_id) -> bool:
+    if LLM_EXTRACTION_MODE == "combined":
+        return True
+    if LLM_EXTRACTION_MODE == "ab":
+        # Stable per-user bucket, so a user stays in one arm across sessions
+        bucket = int(hashlib.sha256(str(user_id).encode()).hexdigest(), 16) % 100
+        return bucket < LLM_COMBINED_AB_PERCENT
+    return False
+
+# ================== LLM CALLS ==================
+
+# Everything that differs between the Groq call sites; llm_call / llm_call_async do the rest.
+# "route" lists the model tiers to try in order; "validate" decides whether a reply from
+# an earlier tier is good enough or the call escalates.
+LLM_CALLS = {
+    "classify": {
+        "prompt": classify_prompt,
+        "max_tokens": 100,
+        "parse": parse_json_reply,
+        "validate": validate_intent,
+        "route": ("small", "large"),
+        "log": "🎯 Intent classified",
+        "error": "❌ Intent classification error",
+        "fallback": {"intent": "other", "confidence": 0.0},
+    },
+    "extract_update": {
+        "prompt": update_criteria_prompt,
+        "max_tokens": 150,
+        "parse": parse_json_reply,
+        "validate": validate_update_args,
+        "route": ("small", "large"),
+        "log": "🔍 Update criteria",
+        "error": "❌ Criteria extraction error",
+        "fallback": {"action": None, "criteria_type": None, "criteria_value": None, "time_amount": 0},
+    },
+    "extract_delete": {
+        "prompt": delete_criteria_prompt,
+        "max_tokens": 150,
+        "parse": parse_json_reply,
+        "validate": validate_delete_args,
+        "route": ("small", "large"),
+        "log": "🔍 Delete criteria",
+        "error": "❌ Criteria extraction error",
+        "fallback": {"type": "other", "value": None, "except": {"type": None, "value": None}},
+    },
+    "command": {
+        "prompt": command_prompt,
+        "max_tokens": 200,
+        "json_mode": True,
+        "parse": lambda text: validate_command(parse_json_reply(text)),
+        "route": ("large",),
+        "log": "🎯 Command extracted",
+        "error": "❌ Combined extraction error",
+        "fallback": None,
+    },
+}
+
+llm_route_stats = {}
+_llm_route_lock = threading.Lock()
+
+
+def llm_route(kind: str) -> tuple:
+    return LLM_CALLS[kind]["route"] if LLM_ROUTING_ENABLED else ("large",)
+
+
+def _llm_request(kind: str, user_message: str, tier: str = "large") -> dict:
+    spec = LLM_CALLS[kind]
+    request = {
+        "model": LLM_MODELS[tier],
+        "messages": [{"role": "user", "content": render_prompt(kind, user_message)}],
+        "temperature": 0.1,
+        "max_tokens": spec["max_tokens"],
+    }
+    if spec.get("json_mode") or LLM_COMPACT_PROMPTS:
+        request["response_format"] = {"type": "json_object"}
+    return request
 
-def classify_intent(user_message: str) -> dict:
-    """Use LLM to classify user intent"""
-    try:
-        prompt = f"""You are a calendar assistant. Classify the user's intent.
 
-User message: "{user_message}"
+def _llm_fallback(kind: str):
+    fallback = LLM_CALLS[kind]["fallback"]
+    return json.loads(json.dumps(fallback)) if fallback is not None else None
 
-Respond ONLY with a JSON object (no markdown, no extra text):
-{{
-    "intent": "create_event" | "list_events" | "delete_event" | "update_event" | "greeting" | "thanks" | "other",
-    "confidence": 0.0-1.0
-}}
 
-Intent guidelines:
-- "delete_event" includes: cancel, delete, remove events
-- "create_event" includes: schedule, create, book, set up meetings
-- "list_events" includes: show, list, what's on calendar, upcoming
-- "update_event" includes: postpone, prepone, reschedule, delay, advance, move forward, move back
+def _check_reply(kind: str, result, final: bool):
+    """Raise ValueError if a non-final tier's reply should escalate; the last tier's reply
+    is used as parsed, as it always was"""
+    validate = LLM_CALLS[kind].get("validate")
+    if final or validate is None:
+        return
+    validate(result)
+    confidence = result.get("confidence") if isinstance(result, dict) else None
+    if isinstance(confidence, (int, float)) and confidence < LLM_ESCALATE_CONFIDENCE:
+        raise ValueError(f"low confidence {confidence}")
 
-Examples:
-- "Schedule meeting with Bob tomorrow" -> {{"intent": "create_event", "confidence": 0.95}}
-- "List my meetings" -> {{"intent": "list_events", "confidence": 0.9}}
-- "Cancel meeting at 2 PM" -> {{"intent": "delete_event", "confidence": 0.9}}
-- "Delete all events" -> {{"intent": "delete_event", "confidence": 0.95}}
-- "Postpone meeting by 2 hours" -> {{"intent": "update_event", "confidence": 0.95}}
-- "Prepone tomorrow's meeting by 1 hour" -> {{"intent": "update_event", "confidence": 0.95}}
-- "Hi" -> {{"intent": "greeting", "confidence": 1.0}}
-"""
 
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=100
-        )
-        
-        result = response.choices[0].message.content.strip()
-        result = result.replace("```json", "").replace("```", "").strip()
-        
-        intent_data = json.loads(result)
-        print(f"🎯 Intent classified: {intent_data}")
-        return intent_data
+def record_llm_route(kind: str, tier: str, response, started: float, outcome: str):
+    """Per kind/model counters: calls, outcome, tokens and latency"""
+    latency_ms = (time.perf_counter() - started) * 1000
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    key = f"{kind}:{LLM_MODELS[tier]}"
+    with _llm_route_lock:
+        stats = llm_route_stats.setdefault(key, {
+            "calls": 0, "ok": 0, "escalated": 0, "error": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "latency_ms": 0.0,
+        })
+        stats["calls"] += 1
+        stats[outcome] += 1
+        stats["prompt_tokens"] += prompt_tokens
+        stats["completion_tokens"] += completion_tokens
+        stats["latency_ms"] += latency_ms
+    if METRICS_ENABLED:
+        stage_seconds.observe(latency_ms / 1000, stage=f"llm:{kind}:{tier}", intent=current_intent.get(), outcome=outcome)
+    print(f"📡 {kind} via {LLM_MODELS[tier]}: {outcome}, {latency_ms:.0f} ms, "
+          f"{prompt_tokens}+{completion_tokens} tokens")
 
-    except Exception as e:
-        print(f"❌ Intent classification error: {e}")
-        return {"intent": "other", "confidence": 0.0}
 
+def llm_call(kind: str, user_message: str):
+    """Cached, routed Groq completion for one of LLM_CALLS; returns the kind's fallback on failure.
 
-def extract_update_criteria(user_message: str) -> dict:
-    """Extract update/reschedule criteria from user message"""
-    try:
-        prompt = f"""Extract update criteria from the user's message about postponing or preponing events.
+    A ProviderUnavailable from the last tier is raised instead, so chat() can say so.
+    """
+    spec = LLM_CALLS[kind]
+    cache_key = llm_cache_key(kind, user_message)
+    cached = llm_cache_get(kind, cache_key)
+    if cached is not None:
+        return cached
 
-User message: "{user_message}"
+    tiers = llm_route(kind)
+    for position, tier in enumerate(tiers):
+        final = position == len(tiers) - 1
+        started = time.perf_counter()
+        response = None
+        try:
+            request = _llm_request(kind, user_message, tier)
+            response = groq_policies[tier].call(
+                lambda timeout: groq_client.chat.completions.create(**request, **groq_timeout(timeout)))
+            result = spec["parse"](response.choices[0].message.content)
+            _check_reply(kind, result, final)
+        except Exception as e:
+            record_llm_route(kind, tier, response, started, "error" if final else "escalated")
+            if final:
+                print(f"{spec['error']}: {e}")
+                if isinstance(e, ProviderUnavailable):
+                    raise
+                return _llm_fallback(kind)
+            print(f"🔀 {kind}: escalating past {LLM_MODELS[tier]} ({e})")
+            continue
 
-Respond ONLY with a JSON object (no markdown):
-{{
-    "action": "postpone" | "prepone",
-    "criteria_type": "name" | "time" | "date" | "next",
-    "criteria_value": "meeting name or time or date" | null,
-    "time_amount": number (hours as integer or float)
-}}
+        record_llm_route(kind, tier, response, started, "ok")
+        print(f"{spec['log']}: {result}")
+        llm_cache_put(cache_key, result)
+        return result
 
-Examples:
-- "Postpone meeting with Bob by 2 hours" -> {{"action": "postpone", "criteria_type": "name", "criteria_value": "Bob", "time_amount": 2}}
-- "Prepone 2 PM meeting by 1 hour" -> {{"action": "prepone", "criteria_type": "time", "criteria_value": "2 PM", "time_amount": 1}}
-- "Postpone tomorrow's meeting by 3 hours" -> {{"action": "postpone", "criteria_type": "date", "criteria_value": "tomorrow", "time_amount": 3}}
-- "Prepone next meeting by 30 minutes" -> {{"action": "prepone", "criteria_type": "next", "criteria_value": null, "time_amount": 0.5}}
-- "Delay meeting at 6 o'clock by 1 hour" -> {{"action": "postpone", "criteria_type": "time", "criteria_value": "6 o'clock", "time_amount": 1}}
-"""
 
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=150
-        )
-        
-        result = response.choices[0].message.content.strip()
-        result = result.replace("```json", "").replace("```", "").strip()
-        
-        criteria = json.loads(result)
-        print(f"🔍 Update criteria: {criteria}")
-        return criteria
+async def llm_call_async(kind: str, user_message: str):
+    """llm_call on AsyncGroq; the Postgres cache tier, if enabled, runs on the blocking pool"""
+    spec = LLM_CALLS[kind]
+    cache_key = llm_cache_key(kind, user_message)
+    if LLM_CACHE_BACKEND == "postgres":
+        cached = await run_blocking(llm_cache_get, kind, cache_key)
+    else:
+        cached = llm_cache_get(kind, cache_key)
+    if cached is not None:
+        return cached
 
-    except Exception as e:
-        print(f"❌ Criteria extraction error: {e}")
-        return {"action": None, "criteria_type": None, "criteria_value": None, "time_amount": 0}
+    tiers = llm_route(kind)
+    for position, tier in enumerate(tiers):
+        final = position == len(tiers) - 1
+        started = time.perf_counter()
+        response = None
+        try:
+            request = _llm_request(kind, user_message, tier)
+            response = await groq_policies[tier].call_async(
+                lambda timeout: async_groq_client.chat.completions.create(**request, **groq_timeout(timeout)))
+            result = spec["parse"](response.choices[0].message.content)
+            _check_reply(kind, result, final)
+        except Exception as e:
+            record_llm_route(kind, tier, response, started, "error" if final else "escalated")
+            if final:
+                print(f"{spec['error']}: {e}")
+                if isinstance(e, ProviderUnavailable):
+                    raise
+                return _llm_fallback(kind)
+            print(f"🔀 {kind}: escalating past {LLM_MODELS[tier]} ({e})")
+            continue
 
+        record_llm_route(kind, tier, response, started, "ok")
+        print(f"{spec['log']}: {result}")
+        if LLM_CACHE_BACKEND == "postgres":
+            await run_blocking(llm_cache_put, cache_key, result)
+        else:
+            llm_cache_put(cache_key, result)
+        return result
 
-def extract_delete_criteria(user_message: str) -> dict:
-    """Extract what to delete from user message, including exceptions"""
-    try:
-        prompt = f"""Extract deletion criteria from the user's message, including any exceptions.
+# ================== SPECULATIVE EXTRACTION ==================
 
-User message: "{user_message}"
+_DELETE_HINT_RE = re.compile(r"\b(cancel|delete|remove|clear|drop|erase)\b")
+_UPDATE_HINT_RE = re.compile(r"\b(postpone|prepone|reschedule|delay|advance|push|pull|move|shift|bring forward)\b")
 
-Respond ONLY with a JSON object (no markdown):
-{{
-    "type": "all" | "time" | "name",
-    "value": "specific time or name" | null,
-    "except": {{
-        "type": "name" | "date" | null,
-        "value": "exception value" | null
-    }}
-}}
+speculation_stats = {"attempts": 0, "used": 0, "wasted": 0}
+_speculation_lock = threading.Lock()
 
-Examples:
-- "Cancel all meetings" -> {{"type": "all", "value": null, "except": {{"type": null, "value": null}}}}
-- "Delete event at 2 PM" -> {{"type": "time", "value": "2 PM", "except": {{"type": null, "value": null}}}}
-- "Cancel all events except meeting with Aman" -> {{"type": "all", "value": null, "except": {{"type": "name", "value": "Aman"}}}}
-- "Delete all meetings except today's" -> {{"type": "all", "value": null, "except": {{"type": "date", "value": "today"}}}}
-- "Cancel all except tomorrow" -> {{"type": "all", "value": null, "except": {{"type": "date", "value": "tomorrow"}}}}
-- "Remove all events except 16 Dec" -> {{"type": "all", "value": null, "except": {{"type": "date", "value": "16 Dec"}}}}
-"""
 
-        response = groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=150
-        )
-        
-        result = response.choices[0].message.content.strip()
-        result = result.replace("```json", "").replace("```", "").strip()
-        
-        criteria = json.loads(result)
-        print(f"🔍 Delete criteria: {criteria}")
-        return criteria
+def guess_intent_locally(user_message: str) -> Optional[str]:
+    """Keyword pre-check; only needs to be right often enough for speculation to pay off"""
+    text = user_message.lower()
+    is_delete = bool(_DELETE_HINT_RE.search(text))
+    is_update = bool(_UPDATE_HINT_RE.search(text))
+    if is_delete == is_update:
+        return None
+    return "delete_event" if is_delete else "update_event"
 
-    except Exception as e:
-        print(f"❌ Criteria extraction error: {e}")
-        return {"type": "other", "value": None, "except": {"type": None, "value": None}}
+
+def start_speculation(user_message: str) -> Optional[tuple]:
+    """Kick off the extractor the message probably needs; returns (guessed intent, task)"""
+    guess = guess_intent_locally(user_message)
+    if guess is None:
+        return None
+    extractor = extract_delete_criteria_async if guess == "delete_event" else extract_update_criteria_async
+    with _speculation_lock:
+        speculation_stats["attempts"] += 1
+    return guess, asyncio.create_task(extractor(user_message))
+
+
+async def settle_speculation(speculation: Optional[tuple], intent: Optional[str]) -> Optional[dict]:
+    """Criteria from the speculative call if the classifier agreed, else cancel and discard it"""
+    if speculation is None:
+        return None
+    guess, task = speculation
+    if guess == intent:
+        with _speculation_lock:
+            speculation_stats["used"] += 1
+        return await task
+
+    if not task.cancel() and not task.cancelled():
+        task.exception()  # already finished; don't leave a failure unretrieved
+    with _speculation_lock:
+        speculation_stats["wasted"] += 1
+        attempts = speculation_stats["attempts"]
+        wasted = speculation_stats["wasted"]
+    print(f"🎲 Speculative {guess} extraction wasted (intent {intent}); {wasted}/{attempts} wasted so far")
+    return None
 
 # ================== SLOT FILLING STATE MACHINE ==================
 
@@ -892,6 +3587,12 @@ class SlotFillingStateMachine:
     def get_slot(self, slot_name: str):
         return self.slots.get(slot_name)
     
+    def fill_slots(self, values: dict):
+        """Fill still-empty slots from extract_slots() output; filled slots are kept"""
+        for slot_name, value in values.items():
+            if value and not self.get_slot(slot_name):
+                self.update_slot(slot_name, value)
+    
     def all_slots_filled(self) -> bool:
         return all(self.slots.values())
     
@@ -911,92 +3612,124 @@ class SlotFillingStateMachine:
 
 # ================== SLOT EXTRACTORS ==================
 
-def extract_name_slot(text: str) -> Optional[str]:
+class SlotCandidate(NamedTuple):
+    slot: str
+    value: str
+    start: int
+    end: int
+    confidence: float
+
+
+_MONTH_ALT = "|".join(sorted(MONTHS, key=len, reverse=True))
+_YEAR = r"(?:\s+(?:\d{4}|\d{2})\b(?!\s*(?:[ap]m\b|:|o['\s]?clock)))?"
+_NAME_STOPWORDS = {
+    "today", "tomorrow", "at", "on", "the", "a", "an", "meeting", "with", "by", "for", "in", "to",
+    "next", "this", "my", "all", "yes", "no", "ok", "sure", "everything", "mine", "please", "now", "it",
+}
+
+# One alternation for every slot form; name forms only consume their keyword (the name
+# itself sits in a lookahead) so dates and times right after it still get scanned.
+# The leading word boundary and first-character class let the engine skip most positions
+# without trying each branch: digits, day/today/tomorrow, this/next/coming and weekdays,
+# month names, with, meeting/schedule/event.
+_SLOT_SCAN_RE = re.compile(rf"""
+    \b(?=[\dacdefjmnostw])
+    (?:
+      (?P<clock>\b(?P<clock_hour>\d{{1,2}}):(?P<clock_minute>\d{{2}})\s*(?P<clock_ampm>[ap]m)?\b)
+    | (?P<oclock>\b(?P<oclock_hour>\d{{1,2}})\s*o['\s]?clock\b)
+    | (?P<meridiem>\b(?P<meridiem_hour>\d{{1,2}})\s*(?P<meridiem_ampm>[ap]m)\b)
+    | (?P<relative>\b(?:day\s+after\s+tomorrow|today|tomorrow))
+    | (?P<weekday>\b(?:(?:this|next|coming)\s+)?(?:mon|tues|wednes|thurs|fri|satur|sun)day\b)
+    | (?P<day_month>\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?(?:{_MONTH_ALT})\b{_YEAR})
+    | (?P<month_day>\b(?:{_MONTH_ALT})\s+\d{{1,2}}(?:st|nd|rd|th)?\b{_YEAR})
+    | (?P<numeric>\b\d{{1,2}}[/-]\d{{1,2}}(?:[/-](?:\d{{4}}|\d{{2}}))?\b)
+    | (?P<with>\bwith\b)(?=\s+(?P<with_name>[a-z]+)\b)
+    | (?P<keyword>\b(?:meeting|schedule|event)\b)(?=\s+(?P<keyword_name>[a-z]+)\b)
+    )
+""", re.X)
+
+_DATE_CONFIDENCE = {"relative": 0.95, "weekday": 0.9, "day_month": 0.85, "month_day": 0.85, "numeric": 0.7}
+
+
+def _clock_value(hour: int, minute: str, ampm: Optional[str]) -> tuple:
+    if ampm:
+        return f"{hour}:{minute} {ampm.upper()}", 0.95
+    if hour == 0 or hour > 12:
+        return f"{hour}:{minute}", 0.9
+    # No am/pm on a 12-hour time: meetings are assumed to be in the afternoon
+    return f"{hour}:{minute} PM", 0.7
+
+
+def _oclock_value(hour: int) -> str:
+    if 9 <= hour <= 11:
+        return f"{hour} AM"
+    if hour == 12:
+        return "12 PM"
+    return f"{hour} PM"
+
+
+def scan_slots(text: str) -> list:
+    """Every name/date/time candidate in one pass over the message, in text order"""
     text = text.lower().strip()
-    
-    match = re.search(r'with\s+(\w+)', text)
-    if match:
-        name = match.group(1)
-        if name not in ["today", "tomorrow", "at", "on", "the", "a"]:
-            return name.capitalize()
-    
-    match = re.search(r'(?:meeting|schedule|event)\s+(?:with\s+)?(\w+)', text)
-    if match:
-        name = match.group(1)
-        if name not in ["today", "tomorrow", "at", "on", "the", "a", "meeting", "with"]:
-            return name.capitalize()
-    
-    words = text.split()
-    if len(words) == 1 and len(words[0]) > 2:
-        if words[0] not in ["today", "tomorrow", "yes", "no", "ok", "sure"]:
-            return words[0].capitalize()
-    
-    return None
+    candidates = []
+    for match in _SLOT_SCAN_RE.finditer(text):
+        # lastgroup is the branch that matched (its name group, for the name forms)
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == "clock":
+            value, confidence = _clock_value(int(match.group("clock_hour")), match.group("clock_minute"),
+                                             match.group("clock_ampm"))
+            candidates.append(SlotCandidate("time", value, start, end, confidence))
+        elif kind == "oclock":
+            hour = int(match.group("oclock_hour"))
+            candidates.append(SlotCandidate("time", _oclock_value(hour), start, end, 0.8))
+        elif kind == "meridiem":
+            value = f"{match.group('meridiem_hour')} {match.group('meridiem_ampm').upper()}"
+            candidates.append(SlotCandidate("time", value, start, end, 0.95))
+        elif kind in ("with_name", "keyword_name"):
+            # "meeting with bob" leaves the keyword branch looking at "with", a stopword,
+            # so each name is reported once, by the with branch
+            name = match.group(kind)
+            if name not in _NAME_STOPWORDS and name not in MONTHS and name not in WEEKDAYS:
+                confidence = 0.85 if kind == "with_name" else 0.8
+                candidates.append(SlotCandidate("name", name.capitalize(), *match.span(kind), confidence))
+        else:
+            candidates.append(SlotCandidate("date", match.group(kind), start, end, _DATE_CONFIDENCE[kind]))
+
+    # A one-word reply to "who is the meeting with?" is the name
+    if not candidates:
+        words = text.split()
+        if len(words) == 1 and len(words[0]) > 2 and words[0].isalpha() and words[0] not in _NAME_STOPWORDS:
+            candidates.append(SlotCandidate("name", words[0].capitalize(), 0, len(words[0]), 0.5))
+    return candidates
+
+
+def best_slots(candidates: list) -> dict:
+    """Highest-confidence candidate per slot, earliest on ties"""
+    best = {}
+    for candidate in candidates:
+        current = best.get(candidate.slot)
+        if current is None or candidate.confidence > current.confidence:
+            best[candidate.slot] = candidate
+    return best
+
+
+def extract_slots(text: str) -> dict:
+    """{"name", "date", "time"} → extracted value or None, for SlotFillingStateMachine.fill_slots"""
+    best = best_slots(scan_slots(text))
+    return {slot: best[slot].value if slot in best else None for slot in ("name", "date", "time")}
+
+
+def extract_name_slot(text: str) -> Optional[str]:
+    return extract_slots(text)["name"]
 
 
 def extract_date_slot(text: str) -> Optional[str]:
-    """Enhanced date extraction supporting multiple formats"""
-    text = text.lower().strip()
-    
-    if "today" in text:
-        return "today"
-    if "tomorrow" in text:
-        return "tomorrow"
-    
-    days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    for day in days:
-        if day in text:
-            return day
-    
-    date_patterns = [
-        r'(\d{1,2})\s+(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|may|june|july|august|september|october|november|december)(?:\s+(\d{2,4}))?',
-        r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|may|june|july|august|september|october|november|december)\s+(\d{1,2})(?:\s+(\d{2,4}))?',
-        r'(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?'
-    ]
-    
-    for pattern in date_patterns:
-        match = re.search(pattern, text)
-        if match:
-            matched_text = match.group(0)
-            print(f"Found date pattern: {matched_text}")
-            return matched_text
-    
-    return None
+    return extract_slots(text)["date"]
 
 
 def extract_time_slot(text: str) -> Optional[str]:
-    """Enhanced time extraction supporting 6 o'clock, 6 o clock formats"""
-    text = text.lower().strip()
-    
-    match = re.search(r'(\d{1,2})\s*o[\'\s]?clock', text)
-    if match:
-        hour = int(match.group(1))
-        if 9 <= hour <= 11:
-            return f"{hour} AM"
-        elif hour == 12:
-            return "12 PM"
-        else:
-            return f"{hour} PM"
-    
-    time_patterns = [
-        r'(\d{1,2})\s*(am|pm)',
-        r'(\d{1,2}):(\d{2})\s*(am|pm)?',
-    ]
-    
-    for pattern in time_patterns:
-        match = re.search(pattern, text)
-        if match:
-            if len(match.groups()) == 2 and match.group(2) in ['am', 'pm']:
-                return f"{match.group(1)} {match.group(2).upper()}"
-            elif len(match.groups()) == 3:
-                hour = match.group(1)
-                minute = match.group(2)
-                period = match.group(3).upper() if match.group(3) else "PM"
-                return f"{hour}:{minute} {period}"
-            else:
-                return match.group(0)
-    
-    return None
+    return extract_slots(text)["time"]
 
 # ================== DIALOGUE MANAGER ==================
 
@@ -1023,42 +3756,262 @@ def generate_prompt(state_machine: SlotFillingStateMachine) -> str:
         }
         return slot_prompts.get(missing[0])
 
+# ================== AUDIO PREPROCESSING ==================
+
+FFMPEG = shutil.which("ffmpeg")
+AUDIO_BLOCK_FRAMES = 65536
+VAD_FRAME_MS = 30
+
+
+def _pcm_dtype(sample_width: int):
+    if sample_width == 1:
+        return np.uint8
+    if sample_width == 2:
+        return np.int16
+    if sample_width == 4:
+        return np.int32
+    raise ValueError(f"unsupported sample width {sample_width}")
+
+
+def _to_int16(block: np.ndarray, sample_width: int) -> np.ndarray:
+    if sample_width == 1:
+        return ((block.astype(np.int16) - 128) << 8).astype(np.int16)
+    if sample_width == 4:
+        return (block >> 16).astype(np.int16)
+    return block
+
+
+def read_wav_mono(path) -> tuple:
+    """Stream a PCM WAV in blocks, downmixing each block to mono int16; returns (samples, rate)"""
+    with wave.open(path, "rb") as wav:
+        channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+        dtype = _pcm_dtype(width)
+        blocks = []
+        while True:
+            raw = wav.readframes(AUDIO_BLOCK_FRAMES)
+            if not raw:
+                break
+            block = _to_int16(np.frombuffer(raw, dtype=dtype), width)
+            if channels > 1:
+                block = block.reshape(-1, channels).mean(axis=1).astype(np.int16)
+            blocks.append(block)
+    samples = np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.int16)
+    return samples, rate
+
+
+def decode_with_ffmpeg(path, rate: int) -> np.ndarray:
+    """Decode any container ffmpeg understands straight to mono int16 at `rate`"""
+    result = subprocess.run(
+        [FFMPEG, "-nostdin", "-loglevel", "error", "-i", path,
+         "-ac", "1", "-ar", str(rate), "-f", "s16le", "-"],
+        capture_output=True, check=True
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16)
+
+
+RESAMPLE_TAPS = 101
+
+
+@functools.lru_cache(maxsize=8)
+def lowpass_kernel(rate: int, target: int) -> np.ndarray:
+    """Blackman-windowed sinc low-pass for downsampling rate → target.
+
+    The cutoff sits at 0.4 × target so the transition band ends below the target's
+    Nyquist frequency (about 7.7 kHz for 48 or 44.1 kHz → 16 kHz).
+    """
+    cutoff = 0.4 * target / rate  # cycles per input sample
+    n = np.arange(RESAMPLE_TAPS) - (RESAMPLE_TAPS - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.blackman(RESAMPLE_TAPS)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(samples: np.ndarray, rate: int, target: int) -> np.ndarray:
+    """Resample mono int16. Downsampling low-passes first, otherwise everything above the
+    target's Nyquist frequency folds back into the speech band Whisper hears; integer
+    ratios then keep every n-th sample and the rest interpolate linearly."""
+    if rate == target or len(samples) == 0:
+        return samples
+    signal = samples.astype(np.float32)
+    if rate > target:
+        half = RESAMPLE_TAPS // 2
+        signal = np.convolve(signal, lowpass_kernel(rate, target))[half:half + len(signal)]
+    if rate % target == 0:
+        signal = signal[::rate // target]
+    else:
+        length = int(round(len(signal) * target / rate))
+        positions = np.linspace(0, len(signal) - 1, num=length)
+        signal = np.interp(positions, np.arange(len(signal)), signal)
+    return np.clip(np.round(signal), -32768, 32767).astype(np.int16)
+
+
+def frame_energies(samples: np.ndarray, rate: int, frame_ms: int = VAD_FRAME_MS) -> np.ndarray:
+    """RMS energy of consecutive frame_ms frames"""
+    frame = max(1, rate * frame_ms // 1000)
+    count = len(samples) // frame
+    if count == 0:
+        return np.zeros(0)
+    frames = samples[:count * frame].astype(np.float32).reshape(count, frame)
+    return np.sqrt((frames ** 2).mean(axis=1))
+
+
+def speech_threshold(energies: np.ndarray) -> float:
+    """Energy gate: a few times the noise floor, never below AUDIO_VAD_MIN_RMS"""
+    noise_floor = float(np.percentile(energies, 10)) if len(energies) else 0.0
+    return max(AUDIO_VAD_MIN_RMS, noise_floor * 3)
+
+
+def speech_bounds(samples: np.ndarray, rate: int) -> Optional[tuple]:
+    """Sample range [start, end) holding speech, padded by AUDIO_VAD_PAD_MS; None if silent"""
+    energies = frame_energies(samples, rate)
+    voiced = np.flatnonzero(energies >= speech_threshold(energies))
+    if len(voiced) == 0:
+        return None
+    frame = max(1, rate * VAD_FRAME_MS // 1000)
+    pad = rate * AUDIO_VAD_PAD_MS // 1000
+    start = max(0, voiced[0] * frame - pad)
+    end = min(len(samples), (voiced[-1] + 1) * frame + pad)
+    return start, end
+
+
+def encode_audio(samples: np.ndarray, rate: int) -> tuple:
+    """Encode mono int16 for upload; returns (filename, bytes)"""
+    if AUDIO_CODEC == "opus" and FFMPEG:
+        result = subprocess.run(
+            [FFMPEG, "-nostdin", "-loglevel", "error", "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "-",
+             "-c:a", "libopus", "-b:a", AUDIO_OPUS_BITRATE, "-application", "voip", "-f", "ogg", "-"],
+            input=samples.tobytes(), capture_output=True, check=True
+        )
+        return "speech.ogg", result.stdout
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return "speech.wav", buffer.getvalue()
+
+
+def preprocess_audio(path) -> Optional[tuple]:
+    """Mono, AUDIO_SAMPLE_RATE, silence-trimmed, compactly encoded (filename, bytes) for Whisper.
+
+    Returns None when no speech is found. Falls back to the original file when the input
+    can't be decoded (non-WAV without ffmpeg) or anything in the pipeline fails.
+    """
+    started = time.perf_counter()
+    original_size = os.path.getsize(path)
+    try:
+        try:
+            samples, rate = read_wav_mono(path)
+        except (wave.Error, EOFError, ValueError):
+            if not FFMPEG:
+                return os.path.basename(path), _read_file(path)
+            samples, rate = decode_with_ffmpeg(path, AUDIO_SAMPLE_RATE), AUDIO_SAMPLE_RATE
+
+        samples = resample(samples, rate, AUDIO_SAMPLE_RATE)
+        bounds = speech_bounds(samples, AUDIO_SAMPLE_RATE)
+        if bounds is None:
+            return None
+        trimmed = samples[bounds[0]:bounds[1]]
+        name, data = encode_audio(trimmed, AUDIO_SAMPLE_RATE)
+    except Exception as e:
+        print(f"⚠️ Audio preprocessing failed, uploading original: {e}")
+        return os.path.basename(path), _read_file(path)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    saved = original_size - len(data)
+    upload_saved_ms = saved * 8 / AUDIO_UPLINK_KBPS
+    trimmed_s = (len(samples) - len(trimmed)) / AUDIO_SAMPLE_RATE
+    print(f"🎙️ Audio {original_size / 1024:.0f} KB → {len(data) / 1024:.0f} KB ({name}), "
+          f"trimmed {trimmed_s:.1f}s silence, preprocessing {elapsed_ms:.0f} ms, "
+          f"~{upload_saved_ms:.0f} ms upload saved at {AUDIO_UPLINK_KBPS:.0f} kbps")
+    return name, data
+
 # ================== CHAT HANDLER ==================
 
-def chat(user_message, history, state_dict, request: gr.Request):
-    """Enhanced chat with intent classification + slot filling + delete + update support"""
+def format_created_reply(result: dict) -> str:
+    assistant_reply = result["message"]
+    if result.get("link"):
+        assistant_reply += f"\n🔗 [View Event]({result['link']})"
+    return assistant_reply
+
+
+async def stream_into(reply: dict, status: Optional[str], fn, *args, **kwargs):
+    """Run a calendar operation, mirroring its progress into the in-flight reply.
+
+    Yields after every update so chat() can push the history to the UI; the reply
+    ends up holding fn's return value.
+    """
+    lines = [status] if status else []
+    async for kind, value in stream_blocking(fn, *args, **kwargs):
+        if kind == "progress":
+            lines.extend(value)
+            reply["content"] = "\n".join(lines)
+        else:
+            reply["content"] = value
+        yield
+
+
+async def chat(user_message, history, state_dict, request: gr.Request):
+    """One chat turn (see chat_turn), timed end to end as the chat_turn stage"""
+    with span("chat_turn", "none") as labels:
+        turn = chat_turn(user_message, history, state_dict, request, labels)
+        while True:
+            # Gradio may resume each step in a fresh context, so re-establish the turn's intent
+            current_intent.set(labels["intent"])
+            try:
+                update = await turn.__anext__()
+            except StopAsyncIteration:
+                break
+            yield update
+
+
+async def chat_turn(user_message, history, state_dict, request, labels: dict):
+    """Enhanced chat with intent classification + slot filling + delete + update support.
+
+    Async generator: yields (history, textbox, state) as the turn progresses, so the
+    Chatbot shows status and partial results instead of freezing until the end. Sets
+    the turn's intent and outcome in `labels` for the chat_turn span.
+    """
+    def note_intent(intent):
+        labels["intent"] = intent
+        current_intent.set(intent)
+
     if not user_message or not isinstance(user_message, str) or not user_message.strip():
-        return history, "", state_dict
+        labels["outcome"] = "empty"
+        yield history, "", state_dict
+        return
 
     user_id = request.session.get("user_id")
 
     if not user_id:
+        labels["outcome"] = "unauthenticated"
         history.append({"role": "assistant", "content": "🔐 Please login: [Login with Google](/login)"})
-        return history, "", state_dict
+        yield history, "", state_dict
+        return
+
+    history.append({"role": "user", "content": user_message})
+    reply = {"role": "assistant", "content": "⏳ Understanding…"}
+    history.append(reply)
+    yield history, "", state_dict
 
     try:
         state_machine = SlotFillingStateMachine.from_dict(state_dict)
         
         if state_machine.active:
             print(f"📊 Continuing slot-filling. Current slots: {state_machine.slots}")
+            note_intent("create_event")
             
-            name = extract_name_slot(user_message)
-            date = extract_date_slot(user_message)
-            time = extract_time_slot(user_message)
-            
-            if name and not state_machine.get_slot("name"):
-                state_machine.update_slot("name", name)
-            
-            if date and not state_machine.get_slot("date"):
-                state_machine.update_slot("date", date)
-            
-            if time and not state_machine.get_slot("time"):
-                state_machine.update_slot("time", time)
+            state_machine.fill_slots(extract_slots(user_message))
             
             new_state_dict = state_machine.to_dict()
             
             if state_machine.all_slots_filled():
-                result = create_calendar_event(
+                reply["content"] = "📅 Creating your event…"
+                yield history, "", new_state_dict
+                
+                result = await run_blocking(
+                    create_calendar_event,
                     user_id=user_id,
                     name=state_machine.get_slot("name"),
                     date_str=state_machine.get_slot("date"),
@@ -1067,40 +4020,54 @@ def chat(user_message, history, state_dict, request: gr.Request):
                 
                 state_machine.deactivate()
                 
-                assistant_reply = result["message"]
-                if result.get("link"):
-                    assistant_reply += f"\n🔗 [View Event]({result['link']})"
-                
-                history.append({"role": "user", "content": user_message})
-                history.append({"role": "assistant", "content": assistant_reply})
-                return history, "", {}
+                reply["content"] = format_created_reply(result)
+                yield history, "", {}
+                return
             
-            prompt = generate_prompt(state_machine)
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": prompt})
-            return history, "", new_state_dict
+            reply["content"] = generate_prompt(state_machine)
+            yield history, "", new_state_dict
+            return
+        
+        command = await extract_command_async(user_message) if use_combined_extraction(user_id) else None
         
-        intent_data = classify_intent(user_message)
+        speculation = None
+        if command is None and SPECULATIVE_EXTRACTION:
+            speculation = start_speculation(user_message)
+        
+        try:
+            intent_data = command or await classify_intent_async(user_message)
+        except ProviderUnavailable:
+            await settle_speculation(speculation, None)
+            raise
         intent = intent_data.get("intent", "other")
+        note_intent(intent)
+        speculative_criteria = await settle_speculation(speculation, intent)
         
         if intent == "greeting":
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": "Hi! I can help you schedule meetings, list events, cancel them, or reschedule them. What would you like to do?"})
-            return history, "", state_dict
+            reply["content"] = "Hi! I can help you schedule meetings, list events, cancel them, or reschedule them. What would you like to do?"
+            yield history, "", state_dict
         
         elif intent == "thanks":
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": "You're welcome! 😊"})
-            return history, "", {}
+            reply["content"] = "You're welcome! 😊"
+            yield history, "", {}
         
         elif intent == "list_events":
-            events_list = list_upcoming_events(user_id)
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": events_list})
-            return history, "", state_dict
+            reply["content"] = "📅 Fetching your events…"
+            yield history, "", state_dict
+            
+            async for _ in stream_into(reply, None, list_upcoming_events, user_id):
+                yield history, "", state_dict
         
         elif intent == "delete_event":
-            criteria = extract_delete_criteria(user_message)
+            reply["content"] = "🔍 Working out which events to delete…"
+            yield history, "", state_dict
+            
+            if command:
+                criteria = command["delete"]
+            elif speculative_criteria is not None:
+                criteria = speculative_criteria
+            else:
+                criteria = await extract_delete_criteria_async(user_message)
             
             except_criteria = criteria.get("except", {})
             if except_criteria.get("type") and except_criteria.get("value"):
@@ -1108,105 +4075,288 @@ def chat(user_message, history, state_dict, request: gr.Request):
             else:
                 except_dict = None
             
-            result = delete_event_by_criteria(
+            reply["content"] = "🗑️ Deleting…"
+            yield history, "", state_dict
+            
+            async for _ in stream_into(
+                reply,
+                "🗑️ Deleting…",
+                delete_event_by_criteria,
                 user_id=user_id,
                 criteria_type=criteria.get("type", "other"),
                 criteria_value=criteria.get("value"),
                 except_criteria=except_dict
-            )
-            
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": result})
-            return history, "", state_dict
+            ):
+                yield history, "", state_dict
         
         elif intent == "update_event":
-            criteria = extract_update_criteria(user_message)
+            reply["content"] = "🔍 Working out which events to move…"
+            yield history, "", state_dict
+            
+            if command:
+                criteria = command["update"]
+            elif speculative_criteria is not None:
+                criteria = speculative_criteria
+            else:
+                criteria = await extract_update_criteria_async(user_message)
             
             if criteria.get("action") and criteria.get("time_amount"):
-                result = update_event_time(
+                reply["content"] = "⏰ Rescheduling…"
+                yield history, "", state_dict
+                
+                async for _ in stream_into(
+                    reply,
+                    "⏰ Rescheduling…",
+                    update_event_time,
                     user_id=user_id,
                     criteria_type=criteria.get("criteria_type", "next"),
                     criteria_value=criteria.get("criteria_value"),
                     time_change_type=criteria.get("action"),
                     time_amount=criteria.get("time_amount", 1)
-                )
-                
-                history.append({"role": "user", "content": user_message})
-                history.append({"role": "assistant", "content": result})
-                return history, "", state_dict
+                ):
+                    yield history, "", state_dict
             else:
-                history.append({"role": "user", "content": user_message})
-                history.append({"role": "assistant", "content": "❌ Could not understand the update request. Please specify which meeting to postpone/prepone and by how much time."})
-                return history, "", state_dict
+                reply["content"] = "❌ Could not understand the update request. Please specify which meeting to postpone/prepone and by how much time."
+                yield history, "", state_dict
         
         elif intent == "create_event":
             state_machine.activate()
             
-            name = extract_name_slot(user_message)
-            date = extract_date_slot(user_message)
-            time = extract_time_slot(user_message)
-            
-            if name:
-                state_machine.update_slot("name", name)
-            if date:
-                state_machine.update_slot("date", date)
-            if time:
-                state_machine.update_slot("time", time)
+            state_machine.fill_slots(extract_slots(user_message))
             
             new_state_dict = state_machine.to_dict()
             
             if state_machine.all_slots_filled():
-                result = create_calendar_event(
+                reply["content"] = "📅 Creating your event…"
+                yield history, "", new_state_dict
+                
+                result = await run_blocking(
+                    create_calendar_event,
                     user_id=user_id,
                     name=state_machine.get_slot("name"),
                     date_str=state_machine.get_slot("date"),
                     time_str=state_machine.get_slot("time")
                 )
                 
-                assistant_reply = result["message"]
-                if result.get("link"):
-                    assistant_reply += f"\n🔗 [View Event]({result['link']})"
-                
-                history.append({"role": "user", "content": user_message})
-                history.append({"role": "assistant", "content": assistant_reply})
-                return history, "", {}
+                reply["content"] = format_created_reply(result)
+                yield history, "", {}
+                return
             
-            prompt = generate_prompt(state_machine)
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": prompt})
-            return history, "", new_state_dict
+            reply["content"] = generate_prompt(state_machine)
+            yield history, "", new_state_dict
         
         else:
-            history.append({"role": "user", "content": user_message})
-            history.append({"role": "assistant", "content": "I can help you:\n• 📅 Schedule meetings\n• 📋 List upcoming events\n• 🗑️ Cancel/delete events\n• ⏰ Postpone/prepone meetings\n\nWhat would you like to do?"})
-            return history, "", state_dict
+            reply["content"] = "I can help you:\n• 📅 Schedule meetings\n• 📋 List upcoming events\n• 🗑️ Cancel/delete events\n• ⏰ Postpone/prepone meetings\n\nWhat would you like to do?"
+            yield history, "", state_dict
 
+    except ProviderUnavailable as e:
+        print(f"⚠️ {e}")
+        labels["outcome"] = "unavailable"
+        reply["content"] = f"⚠️ {e}"
+        yield history, "", state_dict
     except Exception as e:
         print(f"❌ Error: {e}")
-        history.append({"role": "user", "content": user_message})
-        history.append({"role": "assistant", "content": f"❌ Error: {str(e)}"})
-        return history, "", {}
+        labels["outcome"] = "error"
+        reply["content"] = f"❌ Error: {str(e)}"
+        yield history, "", {}
 
 
 def reset_conversation():
     return [], "", {}
 
 
-def transcribe_audio(audio_path):
+def _read_file(path) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+async def transcribe_audio(audio_path):
     if not audio_path:
         return ""
-    try:
-        with open(audio_path, "rb") as file:
-            transcription = groq_client.audio.transcriptions.create(
-                file=(audio_path, file.read()),
+    with span("transcribe_audio") as labels:
+        try:
+            if AUDIO_PREPROCESS:
+                upload = await run_blocking(preprocess_audio, audio_path)
+            else:
+                upload = (os.path.basename(audio_path), await run_blocking(_read_file, audio_path))
+            if upload is None:
+                print("🎙️ No speech detected, skipping transcription")
+                labels["outcome"] = "silence"
+                return ""
+            return await whisper_transcribe(upload)
+        except ProviderUnavailable as e:
+            print(f"⚠️ {e}")
+            labels["outcome"] = "unavailable"
+            gr.Warning(f"⚠️ {e}")
+            return ""
+        except Exception as e:
+            print(f"❌ Transcription error: {e}")
+            labels["outcome"] = "error"
+            return ""
+
+
+async def whisper_transcribe(upload: tuple) -> str:
+    """Send a (filename, bytes) upload to Whisper"""
+    with span("whisper"):
+        return await whisper_policy.call_async(
+            lambda timeout: async_groq_client.audio.transcriptions.create(
+                file=upload,
                 model="whisper-large-v3-turbo",
-                response_format="text"
+                response_format="text",
+                **groq_timeout(timeout)
             )
-        return transcription
+        )
+
+# ================== VOICE STREAMING ==================
+
+def chunk_to_mono(chunk) -> np.ndarray:
+    """Gradio streaming chunk (rate, array) → mono int16 at AUDIO_SAMPLE_RATE"""
+    rate, data = chunk
+    data = np.asarray(data)
+    if data.ndim > 1:
+        # mean() returns float64 even for int16 input; keep the input dtype so only
+        # genuinely float (±1.0) chunks get rescaled below
+        data = data.mean(axis=1).astype(data.dtype)
+    if data.dtype.kind == "f":
+        data = np.clip(data, -1.0, 1.0) * 32767
+    return resample(data.astype(np.int16), rate, AUDIO_SAMPLE_RATE)
+
+
+async def transcribe_segment(samples: np.ndarray) -> str:
+    """Trim, encode and transcribe one segment of an utterance"""
+    bounds = speech_bounds(samples, AUDIO_SAMPLE_RATE)
+    if bounds is None:
+        return ""
+    upload = await run_blocking(encode_audio, samples[bounds[0]:bounds[1]], AUDIO_SAMPLE_RATE)
+    try:
+        return (await whisper_transcribe(upload)).strip()
+    except ProviderUnavailable:
+        raise
     except Exception as e:
-        print(f"❌ Transcription error: {e}")
+        print(f"❌ Segment transcription error: {e}")
         return ""
 
+
+class VoiceSession:
+    """One hands-free utterance: segments are cut at short pauses and transcribed while
+    the user keeps talking; a longer silence after speech ends the utterance."""
+
+    def __init__(self):
+        self.pending = []
+        self.pending_samples = 0
+        self.segment_has_speech = False
+        self.heard_speech = False
+        self.silence_ms = 0
+        self.segments = []
+        self.started = time.perf_counter()
+
+    def feed(self, samples: np.ndarray) -> bool:
+        """Add audio; returns True once the utterance has ended"""
+        self.pending.append(samples)
+        self.pending_samples += len(samples)
+        for energy in frame_energies(samples, AUDIO_SAMPLE_RATE):
+            if energy >= AUDIO_VAD_MIN_RMS:
+                self.silence_ms = 0
+                self.segment_has_speech = self.heard_speech = True
+            else:
+                self.silence_ms += VAD_FRAME_MS
+
+        if self.segment_has_speech and self.silence_ms >= VOICE_PAUSE_MS:
+            self.cut()
+        elif self.pending_samples >= VOICE_MAX_SEGMENT_S * AUDIO_SAMPLE_RATE:
+            if self.segment_has_speech:
+                self.cut()
+            else:
+                # Leading silence: keep only the tail so the first word isn't clipped
+                tail = np.concatenate(self.pending)[-AUDIO_SAMPLE_RATE * AUDIO_VAD_PAD_MS // 1000:]
+                self.pending, self.pending_samples = [tail], len(tail)
+
+        return self.heard_speech and self.silence_ms >= VOICE_END_SILENCE_MS
+
+    def cut(self):
+        """Start transcribing the pending audio as its own segment"""
+        if self.pending and self.segment_has_speech:
+            samples = np.concatenate(self.pending)
+            self.segments.append(asyncio.ensure_future(transcribe_segment(samples)))
+        self.pending, self.pending_samples = [], 0
+        self.segment_has_speech = False
+
+    def partial(self) -> str:
+        """Transcript of the leading segments that have finished so far"""
+        texts = []
+        for task in self.segments:
+            if not task.done() or task.exception() is not None:
+                break
+            texts.append(task.result())
+        return " ".join(text for text in texts if text)
+
+    async def finish(self) -> str:
+        self.cut()
+        texts = await asyncio.gather(*self.segments)
+        transcript = " ".join(text for text in texts if text)
+        print(f"🎙️ Utterance done in {(time.perf_counter() - self.started) * 1000:.0f} ms "
+              f"({len(self.segments)} segment(s)): {transcript!r}")
+        return transcript
+
+    def cancel(self):
+        for task in self.segments:
+            task.cancel()
+
+
+# Gradio session hash -> VoiceSession; re-set on every chunk, so only idle ones expire
+voice_sessions = TTLCache(maxsize=VOICE_SESSION_MAX, ttl=VOICE_SESSION_TTL)
+
+
+async def finish_utterance(session: VoiceSession):
+    """(textbox, voice_submit) updates for an ended utterance; if Whisper is unavailable
+    the user is warned and nothing is submitted"""
+    try:
+        transcript = await session.finish()
+    except ProviderUnavailable as e:
+        print(f"⚠️ {e}")
+        session.cancel()
+        gr.Warning(f"⚠️ {e}")
+        return gr.update(), gr.update()
+    return transcript, transcript
+
+
+def drop_voice_session(request: gr.Request):
+    """Recording restarted or the tab closed: cancel the old utterance's segments"""
+    stale = voice_sessions.get(request.session_hash)
+    voice_sessions.invalidate(request.session_hash)
+    if stale:
+        stale.cancel()
+
+
+def start_voice(request: gr.Request):
+    drop_voice_session(request)
+    voice_sessions.set(request.session_hash, VoiceSession())
+
+
+async def stream_voice(chunk, request: gr.Request):
+    """Streaming mic handler: shows the partial transcript and, at end of utterance,
+    puts the final transcript into voice_submit, which feeds chat()."""
+    if chunk is None:
+        return gr.update(), gr.update()
+    session = voice_sessions.get(request.session_hash) or VoiceSession()
+    voice_sessions.set(request.session_hash, session)
+    if not session.feed(chunk_to_mono(chunk)):
+        return session.partial() or gr.update(), gr.update()
+
+    voice_sessions.invalidate(request.session_hash)
+    updates = await finish_utterance(session)
+    voice_sessions.set(request.session_hash, VoiceSession())
+    return updates
+
+
+async def stop_voice(request: gr.Request):
+    """Recording stopped before a long pause: submit whatever was said"""
+    session = voice_sessions.get(request.session_hash)
+    voice_sessions.invalidate(request.session_hash)
+    if session is None or not session.heard_speech:
+        return gr.update(), gr.update()
+    return await finish_utterance(session)
+
 # ================== GRADIO UI ==================
 
 custom_css = """
@@ -1315,6 +4465,16 @@ with gr.Blocks(title="Voice Calendar Agent", theme=gr.themes.Soft(), css=custom_
                 container=False
             )
     
+    if VOICE_STREAMING:
+        with gr.Row():
+            voice_stream = gr.Audio(
+                sources=["microphone"],
+                type="numpy",
+                streaming=True,
+                label="🎙️ Hands-free: speak, pause, and your message is sent",
+            )
+        voice_submit = gr.Textbox(visible=False)
+
     with gr.Row():
         send = gr.Button("📤 Send", variant="primary", scale=2)
         record_again = gr.Button("🎤 Record Again", variant="secondary", scale=1)
@@ -1342,6 +4502,19 @@ with gr.Blocks(title="Voice Calendar Agent", theme=gr.themes.Soft(), css=custom_
     voice_btn.change(transcribe_audio, voice_btn, msg)
     record_again.click(lambda: None, None, voice_btn)
 
+    if VOICE_STREAMING:
+        voice_stream.start_recording(start_voice, None, None)
+        voice_stream.stream(
+            stream_voice, voice_stream, [msg, voice_submit],
+            stream_every=VOICE_STREAM_EVERY, concurrency_limit=None
+        )
+        voice_stream.stop_recording(stop_voice, None, [msg, voice_submit])
+        # Clear after each turn so repeating the same sentence still fires .change
+        voice_submit.change(chat, [voice_submit, chatbot, state], [chatbot, msg, state]).then(
+            lambda: "", None, voice_submit
+        )
+        demo.unload(drop_voice_session)
+
 from fastapi.responses import FileResponse
 
 @app.get("/googlee16003a42fe50c79.html")
@@ -1353,8 +4526,23 @@ app = gr.mount_gradio_app(app, demo, path="/")
 @app.on_event("startup")
 async def startup():
     init_db()
+    get_discovery_document("calendar", "v3")
+    get_discovery_document("oauth2", "v2")
+    print(f"✅ DB pool ready: {db_pool.stats()}")
+    print(f"✅ Credential cache: size={CREDS_CACHE_SIZE}, ttl={CREDS_CACHE_TTL}s")
+    load_intent_model()
+    if LLM_CACHE_ENABLED:
+        print(f"✅ LLM response cache: {LLM_CACHE_BACKEND}, size={LLM_CACHE_SIZE}, ttl={LLM_CACHE_TTL}s")
+    if TOKEN_REFRESH_ENABLED:
+        token_refresher.start()
     print("✅ Calendar Agent with Full CRUD + Update Operations!")
 
+@app.on_event("shutdown")
+async def shutdown():
+    token_refresher.stop()
+    blocking_executor.shutdown(wait=False)
+    db_pool.closeall()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=int(os.environ.get("PORT", 10000)))
@@ -0,0 +1,146 @@
+"""
+Concurrency benchmark for the async chat pipeline.
+
+Groq and Google Calendar are replaced by local stand-ins with fixed latencies, so
+the numbers measure how many conversations one process overlaps, not provider speed.
+The baseline runs the equivalent blocking pipeline (sync Groq client + blocking
+Calendar call) on a thread pool the size of Gradio's default worker pool.
+
+Usage:
+    python scripts/bench_async_chat.py [--llm-ms 400] [--calendar-ms 150] [--concurrency 1 10 50 200]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+GRADIO_WORKERS = 40
+
+
+def _completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _reply_for(messages):
+    prompt = messages[0]["content"]
+    if prompt.startswith(("Extract deletion criteria", "Extract what to delete")):
+        return '{"type": "name", "value": "Bob", "except": {"type": null, "value": null}}'
+    return '{"intent": "delete_event", "confidence": 0.95}'
+
+
+class FakeAsyncGroq:
+    def __init__(self, latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, messages, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _completion(_reply_for(messages))
+
+
+class FakeGroq:
+    def __init__(self, latency):
+        self.latency = latency
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, messages, **kwargs):
+        time.sleep(self.latency)
+        return _completion(_reply_for(messages))
+
+
+def install_stand_ins(llm_latency, calendar_latency):
+    app.async_groq_client = FakeAsyncGroq(llm_latency)
+    app.groq_client = FakeGroq(llm_latency)
+
+    def fake_delete(user_id, criteria_type, criteria_value, except_criteria=None, progress=None):
+        time.sleep(calendar_latency)
+        return f"🗑️ Deleted **1** event(s) matching '{criteria_value}'"
+
+    app.delete_event_by_criteria = fake_delete
+
+
+def sync_turn(message):
+    """What chat() did per delete command before it went async"""
+    app.classify_intent(message)
+    criteria = app.extract_delete_criteria(message)
+    return app.delete_event_by_criteria("bench", criteria["type"], criteria["value"])
+
+
+async def async_turn(message):
+    request = SimpleNamespace(session={"user_id": "bench"})
+    history = []
+    async for history, _, _ in app.chat(message, [], {}, request):
+        pass
+    return history[-1]["content"]
+
+
+def run_sync(concurrency, turns_per_client):
+    latencies = []
+
+    def client():
+        for _ in range(turns_per_client):
+            started = time.perf_counter()
+            sync_turn("Cancel meeting with Bob")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=GRADIO_WORKERS) as pool:
+        for future in [pool.submit(client) for _ in range(concurrency)]:
+            future.result()
+    return time.perf_counter() - started, latencies
+
+
+async def run_async(concurrency, turns_per_client):
+    latencies = []
+
+    async def client():
+        for _ in range(turns_per_client):
+            started = time.perf_counter()
+            await async_turn("Cancel meeting with Bob")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - started, latencies
+
+
+def report(label, concurrency, turns, elapsed, latencies):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(f"{label:<6} c={concurrency:<4} {turns / elapsed:>8.1f} turns/s   p50 {p50 * 1e3:>7.0f} ms   p95 {p95 * 1e3:>7.0f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--llm-ms", type=float, default=400)
+    ap.add_argument("--calendar-ms", type=float, default=150)
+    ap.add_argument("--turns", type=int, default=3, help="turns per simulated client")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    args = ap.parse_args()
+
+    install_stand_ins(args.llm_ms / 1000, args.calendar_ms / 1000)
+    print(f"stand-ins: LLM {args.llm_ms:.0f} ms/call, Calendar {args.calendar_ms:.0f} ms/call, "
+          f"sync pool {GRADIO_WORKERS} threads, blocking pool {app.BLOCKING_POOL_SIZE} threads\n")
+
+    for concurrency in args.concurrency:
+        turns = concurrency * args.turns
+        elapsed, latencies = run_sync(concurrency, args.turns)
+        report("sync", concurrency, turns, elapsed, latencies)
+        elapsed, latencies = asyncio.run(run_async(concurrency, args.turns))
+        report("async", concurrency, turns, elapsed, latencies)
+
+
+if __name__ == "__main__":
+    main()
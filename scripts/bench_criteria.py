@@ -0,0 +1,125 @@
+"""
+Micro-benchmark for criteria matching.
+
+Compares the per-event cost of the compiled CriteriaMatcher against the old inline
+matching (fuzzy-parse the event start and the target string for every event).
+
+Usage:
+    python scripts/bench_criteria.py [--events 2000] [--repeat 5]
+"""
+
+import argparse
+import datetime
+import os
+import re
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytz
+from dateutil import parser
+
+import app
+
+CRITERIA = [
+    {"type": "name", "value": "Bob"},
+    {"type": "time", "value": "2 PM"},
+    {"type": "date", "value": "16 Dec 25"},
+    {"type": "all", "value": None, "except": {"type": "date", "value": "tomorrow"}},
+]
+
+
+def make_events(count, now):
+    names = ["Bob", "Aman", "Standup", "Review", "Lunch"]
+    events = []
+    for i in range(count):
+        start = now + datetime.timedelta(hours=3 * i + 1)
+        start = start.replace(minute=0, second=0, microsecond=0)
+        events.append({
+            "id": f"evt{i}",
+            "summary": f"Meeting with {names[i % len(names)]}",
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": (start + datetime.timedelta(hours=1)).isoformat()},
+        })
+    return events
+
+
+def legacy_matches(event, criteria, now):
+    """The matching the mutators did before the compiled matcher, one event at a time"""
+    criteria_type = criteria["type"]
+    value = (criteria.get("value") or "").lower().strip()
+    start = event["start"].get("dateTime", event["start"].get("date"))
+
+    def on_date(date_str):
+        event_dt = parser.parse(start)
+        if date_str == "today":
+            return event_dt.date() == now.date()
+        if date_str == "tomorrow":
+            return event_dt.date() == now.date() + datetime.timedelta(days=1)
+        year_match = re.search(r'\b(\d{2})\b$', date_str)
+        if year_match:
+            two_digit_year = int(year_match.group(1))
+            four_digit_year = 2000 + two_digit_year if two_digit_year < 50 else 1900 + two_digit_year
+            date_str = date_str.replace(year_match.group(1), str(four_digit_year))
+        return event_dt.date() == parser.parse(date_str, fuzzy=True).date()
+
+    if criteria_type == "name":
+        matched = value in event.get("summary", "").lower()
+    elif criteria_type == "time":
+        dt = parser.parse(start)
+        target_dt = parser.parse(value, fuzzy=True)
+        matched = dt.strftime('%H:%M') == target_dt.strftime('%H:%M')
+    elif criteria_type == "date":
+        matched = on_date(value)
+    else:
+        matched = True
+
+    except_criteria = criteria.get("except")
+    if matched and except_criteria:
+        matched = not on_date(except_criteria["value"].lower().strip())
+    return matched
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=2000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    now = datetime.datetime.now(pytz.timezone("Asia/Kolkata"))
+    events = make_events(args.events, now)
+
+    build_time, index = timed(lambda: app.EventIndex(events), args.repeat)
+    print(f"EventIndex build: {build_time * 1e3:.2f} ms for {len(events)} events "
+          f"({build_time / len(events) * 1e6:.2f} µs/event, paid once per calendar change)\n")
+
+    print(f"{'criteria':<48} {'legacy µs/ev':>13} {'matches µs/ev':>14} {'select µs/ev':>13} {'agree':>6}")
+    for criteria in CRITERIA:
+        matcher = app.compile_criteria(criteria, now.date())
+
+        legacy_time, legacy = timed(
+            lambda: [e["id"] for e in events if legacy_matches(e, criteria, now)], args.repeat)
+        predicate_time, compiled = timed(
+            lambda: [e["id"] for e in events if matcher.matches(e, index)], args.repeat)
+        select_time, selected = timed(lambda: matcher.select(index, now)[0], args.repeat)
+
+        agree = legacy == compiled == [e["id"] for e in selected]
+        label = repr({k: v for k, v in criteria.items() if v})[:48]
+        print(f"{label:<48} {legacy_time / len(events) * 1e6:>13.2f} "
+              f"{predicate_time / len(events) * 1e6:>14.3f} {select_time / len(events) * 1e6:>13.3f} "
+              f"{'yes' if agree else 'NO':>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Micro-benchmark for date/time resolution.
+
+Compares the old parse_datetime (timezone lookup plus two fuzzy parses per call) and the
+old per-event parser.parse in list_upcoming_events formatting against the memoized
+versions, cold (datetime_cache cleared before every call) and warm (cache populated).
+
+Usage:
+    python scripts/bench_datetime.py [--events 500] [--repeat 2000]
+"""
+
+import argparse
+import datetime
+import os
+import re
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytz
+from dateutil import parser
+
+import app
+
+SLOTS = [
+    ("tomorrow", "3 PM"),
+    ("today", "10:30 am"),
+    ("16 December", "6 o'clock"),
+    ("Dec 25", "2 PM"),
+    ("25/12/25", "14:00"),
+]
+
+
+def legacy_parse_datetime(date_str, time_str):
+    """parse_datetime as it was before memoization"""
+    india_tz = pytz.timezone('Asia/Kolkata')
+    today = datetime.datetime.now(india_tz)
+    date_str_lower = date_str.lower()
+    if "tomorrow" in date_str_lower:
+        target_date = today.date() + datetime.timedelta(days=1)
+    elif "today" in date_str_lower:
+        target_date = today.date()
+    else:
+        try:
+            temp_str = date_str
+            year_match = re.search(r'\b(\d{2})\b$', date_str)
+            if year_match:
+                two_digit_year = int(year_match.group(1))
+                four_digit_year = 2000 + two_digit_year if two_digit_year < 50 else 1900 + two_digit_year
+                temp_str = date_str.replace(year_match.group(1), str(four_digit_year))
+            parsed = parser.parse(temp_str, fuzzy=True, default=today.replace(year=today.year))
+            target_date = parsed.date()
+            if parsed.year == today.year and target_date < today.date():
+                target_date = target_date.replace(year=today.year + 1)
+        except Exception:
+            target_date = today.date()
+    try:
+        time_parsed = parser.parse(time_str, fuzzy=True)
+        hour, minute = time_parsed.hour, time_parsed.minute
+    except Exception:
+        hour, minute = 9, 0
+    naive_dt = datetime.datetime.combine(target_date, datetime.time(hour=hour, minute=minute))
+    return india_tz.localize(naive_dt)
+
+
+def make_starts(count):
+    now = datetime.datetime.now(app.INDIA_TZ).replace(minute=0, second=0, microsecond=0)
+    return [(now + datetime.timedelta(hours=3 * i + 1)).isoformat() for i in range(count)]
+
+
+def per_call_us(fn, calls, before=None):
+    started = time.perf_counter()
+    for _ in range(calls):
+        if before:
+            before()
+        fn()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    clear = app.datetime_cache.clear
+
+    print(f"{'parse_datetime':<36} {'legacy µs':>10} {'cold µs':>10} {'warm µs':>10} {'agree':>6}")
+    for date_str, time_str in SLOTS:
+        legacy = lambda: legacy_parse_datetime(date_str, time_str)
+        memoized = lambda: app.parse_datetime(date_str, time_str)
+        legacy_us = per_call_us(legacy, args.repeat)
+        cold_us = per_call_us(memoized, args.repeat, before=clear)
+        memoized()
+        warm_us = per_call_us(memoized, args.repeat)
+        agree = legacy() == memoized()
+        print(f"{date_str + ' / ' + time_str:<36} {legacy_us:>10.1f} {cold_us:>10.1f} {warm_us:>10.2f} "
+              f"{'yes' if agree else 'NO':>6}")
+
+    starts = make_starts(args.events)
+    listing_repeat = max(1, args.repeat // 100)
+
+    def legacy_format():
+        return [parser.parse(start).strftime('%b %d, %I:%M %p') for start in starts]
+
+    def memoized_format():
+        return [app.parse_timestamp(start).strftime('%b %d, %I:%M %p') for start in starts]
+
+    legacy_us = per_call_us(legacy_format, listing_repeat) / len(starts)
+    cold_us = per_call_us(memoized_format, listing_repeat, before=clear) / len(starts)
+    memoized_format()
+    warm_us = per_call_us(memoized_format, listing_repeat) / len(starts)
+    agree = legacy_format() == memoized_format()
+    print(f"\n{'list formatting (per event)':<36} {legacy_us:>10.1f} {cold_us:>10.1f} {warm_us:>10.2f} "
+          f"{'yes' if agree else 'NO':>6}")
+    print(f"\ndatetime_cache: {app.datetime_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Correctness and speed corpus for the date/time grammar.
+
+Every case is resolved against a fixed "today" (Wed 17 Dec 2025). The script checks the
+grammar path (match_date / match_time), the full resolvers with the dateutil fallback
+(parse_slot_date / parse_clock_time), and how plain dateutil fuzzy parsing would have
+answered, then times grammar vs dateutil per input. Exits non-zero on any mismatch.
+
+Usage:
+    python scripts/check_datetime_grammar.py [--repeat 2000]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from dateutil import parser
+
+import app
+
+TODAY = datetime.date(2025, 12, 17)  # a Wednesday
+D = datetime.date
+
+# (slot date text, expected parse_slot_date result, expected to take the grammar path);
+# fallback cases only check that the grammar declines them
+DATE_CASES = [
+    ("today", TODAY, True),
+    ("tomorrow", D(2025, 12, 18), True),
+    ("tomorrow morning", D(2025, 12, 18), True),
+    ("day after tomorrow", D(2025, 12, 19), True),
+    ("wednesday", TODAY, True),
+    ("friday", D(2025, 12, 19), True),
+    ("Monday", D(2025, 12, 22), True),
+    ("this friday", D(2025, 12, 19), True),
+    ("next friday", D(2025, 12, 19), True),
+    ("next wednesday", D(2025, 12, 24), True),
+    ("sat", D(2025, 12, 20), True),
+    ("16 Dec", D(2026, 12, 16), True),
+    ("18 Dec", D(2025, 12, 18), True),
+    ("16 december", D(2026, 12, 16), True),
+    ("Dec 25", D(2025, 12, 25), True),
+    ("December 25th", D(2025, 12, 25), True),
+    ("on the 25th of december", D(2025, 12, 25), True),
+    ("16 Dec 25", D(2025, 12, 16), True),
+    ("16 Dec 2026", D(2026, 12, 16), True),
+    ("jan 5", D(2026, 1, 5), True),
+    ("5 jan 26", D(2026, 1, 5), True),
+    ("sept 3", D(2026, 9, 3), True),
+    ("12/5", D(2026, 12, 5), True),
+    ("12/25", D(2025, 12, 25), True),
+    ("25/12", D(2025, 12, 25), True),
+    ("12/5/26", D(2026, 12, 5), True),
+    ("1-15-2026", D(2026, 1, 15), True),
+    ("2026-02-03", D(2026, 2, 3), True),
+    ("monday 22 dec", D(2025, 12, 22), True),
+    ("31 feb", None, False),
+    ("christmas eve", None, False),
+]
+
+# (time text, expected (hour, minute), expected to take the grammar path)
+TIME_CASES = [
+    ("3 PM", (15, 0), True),
+    ("3pm", (15, 0), True),
+    ("3 p.m.", (15, 0), True),
+    ("3:30 pm", (15, 30), True),
+    ("10:15 AM", (10, 15), True),
+    ("12 AM", (0, 0), True),
+    ("12 PM", (12, 0), True),
+    ("14:00", (14, 0), True),
+    ("9.45 am", (9, 45), True),
+    ("6 o'clock", (6, 0), True),
+    ("6 o clock", (6, 0), True),
+    ("6 oclock pm", (18, 0), True),
+    ("at 5 pm", (17, 0), True),
+    ("noon", (12, 0), True),
+    ("midnight", (0, 0), True),
+    ("7", (7, 0), True),
+    ("13 pm", None, False),
+    ("half past four", None, False),
+]
+
+
+def per_call_us(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def dateutil_date(text):
+    try:
+        default = datetime.datetime.combine(TODAY, datetime.time())
+        return parser.parse(app.expand_two_digit_year(text), fuzzy=True, default=default).date()
+    except Exception:
+        return None
+
+
+def dateutil_time(text):
+    try:
+        parsed = parser.parse(text, fuzzy=True)
+        return parsed.hour, parsed.minute
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=2000)
+    args = ap.parse_args()
+
+    failures = 0
+    print(f"{'date':<26} {'expected':>11} {'resolved':>11} {'path':>8} {'dateutil':>11} "
+          f"{'grammar µs':>11} {'dateutil µs':>12}")
+    for text, expected, via_grammar in DATE_CASES:
+        app.datetime_cache.clear()
+        matched = app.match_date(text, TODAY)
+        resolved = app.parse_slot_date(text, TODAY)
+        ok = (matched is not None) == via_grammar and (not via_grammar or resolved == expected)
+        failures += not ok
+        grammar_us = per_call_us(lambda: app.match_date(text, TODAY), args.repeat)
+        dateutil_us = per_call_us(lambda: dateutil_date(text), max(1, args.repeat // 10))
+        print(f"{text:<26} {str(expected):>11} {str(resolved):>11} "
+              f"{'grammar' if matched else 'fallback':>8} {str(dateutil_date(text)):>11} "
+              f"{grammar_us:>11.2f} {dateutil_us:>12.1f}{'' if ok else '   ✗'}")
+
+    print(f"\n{'time':<26} {'expected':>11} {'resolved':>11} {'path':>8} {'dateutil':>11} "
+          f"{'grammar µs':>11} {'dateutil µs':>12}")
+    for text, expected, via_grammar in TIME_CASES:
+        app.datetime_cache.clear()
+        matched = app.match_time(text)
+        resolved = app.parse_clock_time(text)
+        ok = (matched is not None) == via_grammar and (not via_grammar or resolved == expected)
+        failures += not ok
+        grammar_us = per_call_us(lambda: app.match_time(text), args.repeat)
+        dateutil_us = per_call_us(lambda: dateutil_time(text), max(1, args.repeat // 10))
+        print(f"{text:<26} {str(expected):>11} {str(resolved):>11} "
+              f"{'grammar' if matched else 'fallback':>8} {str(dateutil_time(text)):>11} "
+              f"{grammar_us:>11.2f} {dateutil_us:>12.1f}{'' if ok else '   ✗'}")
+
+    print(f"\npaths: {app.datetime_parse_paths}")
+    print(f"{failures} mismatch(es)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Latency regression check against a running Calendar Agent's /metrics.
+
+Reads the calendar_agent_stage_seconds histograms and estimates per-stage quantiles from
+the bucket counts, merging intents and outcomes unless --by-intent is given. Budgets
+are per stage, in milliseconds; the script exits non-zero if any budgeted stage's
+quantile is over budget. --save writes the current quantiles to a JSON file and
+--baseline compares against one, flagging stages that got slower by more than
+--tolerance (one bucket step is the finest difference the histogram can show).
+
+Usage:
+    python scripts/check_latency_budget.py --url http://localhost:7860/metrics \\
+        --budget chat_turn=3000 classify_intent=800 load_tokens=50 [--quantile 0.95]
+    python scripts/check_latency_budget.py --url ... --save baseline.json
+    python scripts/check_latency_budget.py --url ... --baseline baseline.json [--tolerance 0.25]
+"""
+
+import argparse
+import json
+import math
+import re
+import sys
+import urllib.request
+from collections import defaultdict
+
+METRIC = "calendar_agent_stage_seconds"
+_BUCKET_RE = re.compile(METRIC + r'_bucket\{(.*)\} (\S+)$')
+_LABEL_RE = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def scrape(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.read().decode()
+
+
+def bucket_counts(text, by_intent):
+    """{series: {le: cumulative count}}, series being the stage or (stage, intent)"""
+    series = defaultdict(lambda: defaultdict(float))
+    for line in text.splitlines():
+        match = _BUCKET_RE.match(line)
+        if not match:
+            continue
+        labels = dict(_LABEL_RE.findall(match.group(1)))
+        key = f"{labels['stage']}[{labels['intent']}]" if by_intent else labels["stage"]
+        le = math.inf if labels["le"] == "+Inf" else float(labels["le"])
+        series[key][le] += float(match.group(2))
+    return series
+
+
+def quantile(buckets, q):
+    """Upper bound (ms) of the bucket holding the q-th observation; None if empty or above
+    the largest finite bucket"""
+    bounds = sorted(buckets)
+    total = buckets[math.inf]
+    if not total:
+        return None
+    for bound in bounds:
+        if buckets[bound] >= q * total:
+            return None if bound == math.inf else bound * 1000
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://localhost:7860/metrics")
+    ap.add_argument("--quantile", type=float, default=0.95)
+    ap.add_argument("--budget", nargs="*", default=[], help="stage=ms")
+    ap.add_argument("--by-intent", action="store_true", help="one series per stage and intent")
+    ap.add_argument("--save", help="write the current quantiles to this JSON file")
+    ap.add_argument("--baseline", help="compare against quantiles saved with --save")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs the baseline")
+    args = ap.parse_args()
+
+    series = bucket_counts(scrape(args.url), args.by_intent)
+    current = {key: quantile(buckets, args.quantile) for key, buckets in sorted(series.items())}
+    budgets = {stage: float(ms) for stage, ms in (item.split("=", 1) for item in args.budget)}
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    failures = 0
+    label = f"p{args.quantile * 100:g}"
+    print(f"{'stage':<44} {'count':>7} {label + ' ms':>10} {'budget':>8} {'baseline':>9}")
+    for key, value in current.items():
+        count = int(series[key][math.inf])
+        budget = budgets.get(key.split("[")[0])
+        before = baseline.get(key)
+        shown = ">max" if value is None else f"{value:.0f}"
+        over_budget = budget is not None and (value is None or value > budget)
+        slower = before is not None and (value is None or value > before * (1 + args.tolerance))
+        failures += over_budget or slower
+        flags = ("  OVER BUDGET" if over_budget else "") + ("  SLOWER" if slower else "")
+        print(f"{key:<44} {count:>7} {shown:>10} {budget if budget is not None else '-':>8} "
+              f"{before if before is not None else '-':>9}{flags}")
+
+    missing = [stage for stage in budgets if not any(key.split("[")[0] == stage for key in current)]
+    if missing:
+        print(f"no samples yet for: {', '.join(missing)}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(current, file, indent=2, sort_keys=True)
+        print(f"saved {args.save}")
+
+    print(f"{failures} stage(s) over budget or slower than baseline")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Golden corpus for the rule-based delete/update argument parser.
+
+Each case pairs a command with the criteria JSON the extraction prompts ask the LLM for
+(the prompt examples plus common phrasings), or None where the rules are expected to
+decline and leave the message to the LLM. The script checks parse_delete_args /
+parse_update_args against the golden output and reports coverage and speed. With --llm
+it also runs every case through the Groq extraction and reports where the rules and the
+live LLM disagree once values are resolved (so "2 PM" and "2 pm" compare equal).
+
+Usage:
+    python scripts/check_rule_args.py [--llm]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+NO_EXCEPT = {"type": None, "value": None}
+
+DELETE_CASES = [
+    ("Cancel all meetings", {"type": "all", "value": None, "except": NO_EXCEPT}),
+    ("Delete event at 2 PM", {"type": "time", "value": "2 PM", "except": NO_EXCEPT}),
+    ("Cancel all events except meeting with Aman",
+     {"type": "all", "value": None, "except": {"type": "name", "value": "Aman"}}),
+    ("Delete all meetings except today's", {"type": "all", "value": None, "except": {"type": "date", "value": "today"}}),
+    ("Cancel all except tomorrow", {"type": "all", "value": None, "except": {"type": "date", "value": "tomorrow"}}),
+    ("Remove all events except 16 Dec", {"type": "all", "value": None, "except": {"type": "date", "value": "16 dec"}}),
+    ("🗑️ Cancel all events except meeting with Aman",
+     {"type": "all", "value": None, "except": {"type": "name", "value": "Aman"}}),
+    ("delete all events", {"type": "all", "value": None, "except": NO_EXCEPT}),
+    ("clear my calendar", {"type": "all", "value": None, "except": NO_EXCEPT}),
+    ("cancel my meeting with bob", {"type": "name", "value": "Bob", "except": NO_EXCEPT}),
+    ("please cancel my 10 am", {"type": "time", "value": "10 AM", "except": NO_EXCEPT}),
+    ("cancel the 3:30 pm meeting", {"type": "time", "value": "3:30 PM", "except": NO_EXCEPT}),
+    # extract_time_slot reads "6 o'clock" as 6 PM when creating events, so deletion does too
+    ("delete event at 6 o'clock", {"type": "time", "value": "6 PM", "except": NO_EXCEPT}),
+    ("delete everything except friday", {"type": "all", "value": None, "except": {"type": "date", "value": "friday"}}),
+    # Left to the LLM
+    ("remove the lunch event", None),
+    ("cancel the interview", None),
+    ("cancel everything on friday", None),
+    ("delete my next meeting", None),
+    ("cancel all except the important ones", None),
+    # Several exceptions or several targets: keeping only the best one would delete the rest
+    ("cancel all except today tomorrow", None),
+    ("cancel all meetings except friday monday", None),
+    ("delete everything except meeting with bob and meeting with alice", None),
+    ("cancel the meeting with bob at 3 pm", None),
+    # Filler words and guesses are not slots: a bare word is not a name, 9:30 is not surely PM
+    ("delete the meeting please", None),
+    ("cancel meeting now", None),
+    ("cancel all except mine", None),
+    ("cancel all events except aman", None),
+    ("delete my 9:30 meeting", None),
+]
+
+UPDATE_CASES = [
+    ("Postpone meeting with Bob by 2 hours",
+     {"action": "postpone", "criteria_type": "name", "criteria_value": "Bob", "time_amount": 2}),
+    ("Prepone 2 PM meeting by 1 hour",
+     {"action": "prepone", "criteria_type": "time", "criteria_value": "2 PM", "time_amount": 1}),
+    ("Postpone tomorrow's meeting by 3 hours",
+     {"action": "postpone", "criteria_type": "date", "criteria_value": "tomorrow", "time_amount": 3}),
+    ("Prepone next meeting by 30 minutes",
+     {"action": "prepone", "criteria_type": "next", "criteria_value": None, "time_amount": 0.5}),
+    ("Delay meeting at 6 o'clock by 1 hour",
+     {"action": "postpone", "criteria_type": "time", "criteria_value": "6 PM", "time_amount": 1}),
+    ("⏰ Delay next meeting by 30 minutes",
+     {"action": "postpone", "criteria_type": "next", "criteria_value": None, "time_amount": 0.5}),
+    ("Prepone tomorrow's meeting by 1 hour",
+     {"action": "prepone", "criteria_type": "date", "criteria_value": "tomorrow", "time_amount": 1}),
+    ("push the meeting with ravi back by 2 hours",
+     {"action": "postpone", "criteria_type": "name", "criteria_value": "Ravi", "time_amount": 2}),
+    ("bring forward my next meeting by 15 minutes",
+     {"action": "prepone", "criteria_type": "next", "criteria_value": None, "time_amount": 0.25}),
+    ("delay the meeting with priya by half an hour",
+     {"action": "postpone", "criteria_type": "name", "criteria_value": "Priya", "time_amount": 0.5}),
+    ("postpone my 10 am meeting by an hour",
+     {"action": "postpone", "criteria_type": "time", "criteria_value": "10 AM", "time_amount": 1}),
+    ("move my next meeting earlier by 1 and a half hours",
+     {"action": "prepone", "criteria_type": "next", "criteria_value": None, "time_amount": 1.5}),
+    # Direction words after "meeting" are not names
+    ("move my 2 pm meeting earlier by an hour",
+     {"action": "prepone", "criteria_type": "time", "criteria_value": "2 PM", "time_amount": 1}),
+    ("push my 4 pm meeting later by 30 minutes",
+     {"action": "postpone", "criteria_type": "time", "criteria_value": "4 PM", "time_amount": 0.5}),
+    # Left to the LLM
+    ("reschedule meeting with alice by 1 hour", None),
+    ("postpone the standup by 30 mins", None),
+    ("delay my meeting with neha", None),
+    ("postpone meeting later by 1 hour", None),
+    ("delay the meeting with priya at 3 pm by 1 hour", None),
+    ("postpone friday's meeting with bob by 2 hours", None),
+    ("postpone everything by 1 hour", None),
+    ("push back everything by 2 hours", None),
+    ("postpone it by 1 hour", None),
+    ("delay my 9:30 meeting by 1 hour", None),
+]
+
+
+def resolved(criteria):
+    """Criteria with time/date values resolved, so equivalent spellings compare equal"""
+    if not criteria:
+        return criteria
+    today = datetime.date(2025, 12, 17)
+    result = dict(criteria)
+    for type_key, value_key in (("type", "value"), ("criteria_type", "criteria_value")):
+        kind, value = result.get(type_key), result.get(value_key)
+        if value and kind == "time":
+            result[value_key] = app.resolve_target_time(value)
+        elif value and kind == "date":
+            result[value_key] = app.resolve_target_date(value, today)
+        elif value and kind == "name":
+            result[value_key] = value.lower()
+    if isinstance(result.get("except"), dict):
+        result["except"] = resolved(result["except"])
+    return result
+
+
+def run(label, cases, parse, llm_extract, use_llm):
+    failures = handled = 0
+    started = time.perf_counter()
+    for message, _ in cases:
+        parse(message)
+    per_call_us = (time.perf_counter() - started) / len(cases) * 1e6
+
+    print(f"{label}:")
+    for message, golden in cases:
+        parsed = parse(message)
+        taken = parsed if parsed and parsed[1] >= app.ARGS_RULES_THRESHOLD else None
+        handled += taken is not None
+        got = taken[0] if taken else None
+        ok = got == golden
+        failures += not ok
+        confidence = f"{parsed[1]:.2f}" if parsed else "  - "
+        print(f"  {'ok ' if ok else 'BAD'} {confidence} {message!r} → {got}")
+        if not ok:
+            print(f"        golden {golden}")
+        if use_llm and golden is not None:
+            live = llm_extract(message)
+            if resolved(live) != resolved(got):
+                print(f"        LLM differs: {live}")
+    print(f"  rules handled {handled}/{len(cases)}, {per_call_us:.0f} µs/message\n")
+    return failures
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--llm", action="store_true", help="compare with the live Groq extraction too")
+    args = ap.parse_args()
+
+    failures = run("delete", DELETE_CASES, app.parse_delete_args,
+                   lambda m: app.llm_call("extract_delete", m), args.llm)
+    failures += run("update", UPDATE_CASES, app.parse_update_args,
+                    lambda m: app.llm_call("extract_update", m), args.llm)
+    print(f"{failures} mismatch(es)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Regression corpus and benchmark for the slot scanner.
+
+The corpus is the UI's example commands plus the short follow-up answers slot filling
+asks for. Each case lists the expected name/date/time slots; the script checks
+extract_slots against them, shows where the old per-pattern extractors (kept below for
+comparison) disagreed, and times both. Exits non-zero if the scanner misses a case.
+
+Usage:
+    python scripts/check_slot_scanner.py [--repeat 5000]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+# (message, expected name, expected date, expected time)
+CORPUS = [
+    # Example commands
+    ("List my upcoming meetings", None, None, None),
+    ("Schedule meeting with Bob on 16 December at 6 o'clock", "Bob", "16 december", "6 PM"),
+    ("Book event on Dec 25 at 2 PM", None, "dec 25", "2 PM"),
+    ("Cancel all events except meeting with Aman", "Aman", None, None),
+    ("Delete all meetings except today's", None, "today", None),
+    ("Postpone meeting with Bob by 2 hours", "Bob", None, None),
+    ("Prepone tomorrow's meeting by 1 hour", None, "tomorrow", None),
+    ("Delay next meeting by 30 minutes", None, None, None),
+    # Slot-filling follow-ups
+    ("Bob", "Bob", None, None),
+    ("with Priya", "Priya", None, None),
+    ("tomorrow", None, "tomorrow", None),
+    ("friday", None, "friday", None),
+    ("next monday", None, "next monday", None),
+    ("on 25th of december", None, "25th of december", None),
+    ("12/5", None, "12/5", None),
+    ("at 3:30 pm", None, None, "3:30 PM"),
+    ("14:00", None, None, "14:00"),
+    ("10 am", None, None, "10 AM"),
+    ("11 o'clock", None, None, "11 AM"),
+    # Everything in one message
+    ("Schedule meeting with Alice next monday 10 am", "Alice", "next monday", "10 AM"),
+    ("meeting with Ravi on 16 Dec 25 at 12 pm", "Ravi", "16 dec 25", "12 PM"),
+    ("set up a meeting with Sam day after tomorrow at 4:15 pm", "Sam", "day after tomorrow", "4:15 PM"),
+]
+
+
+# --- The extractors as they were before the scanner ---
+
+def legacy_name(text):
+    text = text.lower().strip()
+    match = re.search(r'with\s+(\w+)', text)
+    if match:
+        name = match.group(1)
+        if name not in ["today", "tomorrow", "at", "on", "the", "a"]:
+            return name.capitalize()
+    match = re.search(r'(?:meeting|schedule|event)\s+(?:with\s+)?(\w+)', text)
+    if match:
+        name = match.group(1)
+        if name not in ["today", "tomorrow", "at", "on", "the", "a", "meeting", "with"]:
+            return name.capitalize()
+    words = text.split()
+    if len(words) == 1 and len(words[0]) > 2:
+        if words[0] not in ["today", "tomorrow", "yes", "no", "ok", "sure"]:
+            return words[0].capitalize()
+    return None
+
+
+def legacy_date(text):
+    text = text.lower().strip()
+    if "today" in text:
+        return "today"
+    if "tomorrow" in text:
+        return "tomorrow"
+    for day in ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]:
+        if day in text:
+            return day
+    months = ("jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|may|june|"
+              "july|august|september|october|november|december")
+    for pattern in [rf'(\d{{1,2}})\s+({months})(?:\s+(\d{{2,4}}))?',
+                    rf'({months})\s+(\d{{1,2}})(?:\s+(\d{{2,4}}))?',
+                    r'(\d{1,2})[/-](\d{1,2})(?:[/-](\d{2,4}))?']:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(0)
+    return None
+
+
+def legacy_time(text):
+    text = text.lower().strip()
+    match = re.search(r'(\d{1,2})\s*o[\'\s]?clock', text)
+    if match:
+        hour = int(match.group(1))
+        if 9 <= hour <= 11:
+            return f"{hour} AM"
+        return "12 PM" if hour == 12 else f"{hour} PM"
+    for pattern in [r'(\d{1,2})\s*(am|pm)', r'(\d{1,2}):(\d{2})\s*(am|pm)?']:
+        match = re.search(pattern, text)
+        if match:
+            if len(match.groups()) == 2 and match.group(2) in ['am', 'pm']:
+                return f"{match.group(1)} {match.group(2).upper()}"
+            elif len(match.groups()) == 3:
+                period = match.group(3).upper() if match.group(3) else "PM"
+                return f"{match.group(1)}:{match.group(2)} {period}"
+            return match.group(0)
+    return None
+
+
+def legacy_slots(text):
+    return {"name": legacy_name(text), "date": legacy_date(text), "time": legacy_time(text)}
+
+
+def per_message_us(fn, repeat):
+    messages = [case[0] for case in CORPUS]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            fn(message)
+    return (time.perf_counter() - started) / (repeat * len(messages)) * 1e6
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeat", type=int, default=5000)
+    args = ap.parse_args()
+
+    failures = 0
+    for message, name, date, time_ in CORPUS:
+        expected = {"name": name, "date": date, "time": time_}
+        scanned = app.extract_slots(message)
+        legacy = legacy_slots(message)
+        ok = scanned == expected
+        failures += not ok
+        print(f"{'ok ' if ok else 'BAD'} {message!r}")
+        if not ok:
+            print(f"      expected {expected}\n      scanner  {scanned}")
+        if legacy != expected:
+            diff = {slot: legacy[slot] for slot in expected if legacy[slot] != expected[slot]}
+            print(f"      legacy differed: {diff}")
+        candidates = app.scan_slots(message)
+        if candidates:
+            print("      " + ", ".join(f"{c.slot}={c.value!r}@{c.start}:{c.end} ({c.confidence:.2f})"
+                                       for c in candidates))
+
+    legacy_us = per_message_us(legacy_slots, args.repeat)
+    scanner_us = per_message_us(app.extract_slots, args.repeat)
+    print(f"\nlegacy extractors: {legacy_us:.2f} µs/message")
+    print(f"single-pass scan:  {scanner_us:.2f} µs/message ({legacy_us / scanner_us:.1f}x)")
+    print(f"{failures} mismatch(es)")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
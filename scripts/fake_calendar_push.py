@@ -0,0 +1,93 @@
+"""
+Local stand-in for Google Calendar push notifications.
+
+Posts synthetic events.watch notifications to a running Calendar Agent so the
+/calendar/notifications webhook can be exercised without a public HTTPS URL.
+
+Usage:
+    SESSION_SECRET=... python scripts/fake_calendar_push.py --user-id <google user id> --register
+    SESSION_SECRET=... python scripts/fake_calendar_push.py --channel-id <id> --state exists --count 5
+"""
+
+import argparse
+import hashlib
+import hmac
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+
+def channel_token(secret: str, channel_id: str) -> str:
+    # Must match app.channel_token()
+    return hmac.new(secret.encode(), channel_id.encode(), hashlib.sha256).hexdigest()
+
+
+def register_channel(database_url: str, channel_id: str, user_id: str):
+    """Insert a fake channel row, as register_watch_channel() would after events.watch"""
+    import psycopg2
+
+    with psycopg2.connect(database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO calendar_channels (channel_id, user_id, resource_id, expiration)
+                VALUES (%s, %s, %s, NOW() + INTERVAL '1 day')
+                ON CONFLICT (channel_id) DO NOTHING
+            """, (channel_id, user_id, f"fake-{channel_id}"))
+    conn.close()
+
+
+def post_notification(url, channel_id, token, state, message_number):
+    request = urllib.request.Request(url, data=b"", method="POST", headers={
+        "X-Goog-Channel-ID": channel_id,
+        "X-Goog-Channel-Token": token,
+        "X-Goog-Resource-ID": f"fake-{channel_id}",
+        "X-Goog-Resource-State": state,
+        "X-Goog-Message-Number": str(message_number),
+    })
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default="http://localhost:10000/calendar/notifications")
+    ap.add_argument("--channel-id", default=None)
+    ap.add_argument("--user-id", default=None, help="needed with --register")
+    ap.add_argument("--register", action="store_true", help="insert the channel into calendar_channels first")
+    ap.add_argument("--state", default="exists", choices=["sync", "exists", "not_exists"])
+    ap.add_argument("--count", type=int, default=1)
+    ap.add_argument("--interval", type=float, default=0.5, help="seconds between notifications")
+    ap.add_argument("--bad-token", action="store_true", help="send a forged token (expect 403)")
+    args = ap.parse_args()
+
+    secret = os.getenv("SESSION_SECRET", "change-me")
+    channel_id = args.channel_id or uuid.uuid4().hex
+
+    if args.register:
+        if not args.user_id:
+            ap.error("--register needs --user-id")
+        register_channel(os.environ["DATABASE_URL"], channel_id, args.user_id)
+        print(f"registered channel {channel_id} for {args.user_id}")
+
+    token = "forged" if args.bad_token else channel_token(secret, channel_id)
+    failures = 0
+    for n in range(1, args.count + 1):
+        status = post_notification(args.url, channel_id, token, args.state, n)
+        print(f"#{n} {args.state} -> HTTP {status}")
+        if status >= 300:
+            failures += 1
+        if n < args.count:
+            time.sleep(args.interval)
+
+    expected_failures = args.count if args.bad_token else 0
+    sys.exit(0 if failures == expected_failures else 1)
+
+
+if __name__ == "__main__":
+    main()
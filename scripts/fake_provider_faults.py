@@ -0,0 +1,224 @@
+"""
+Fault-injecting stand-ins for Groq and Google Calendar, to exercise the resilience layer.
+
+The Groq clients and a Calendar read (a GET request object passed to google_execute) are
+replaced by local fakes whose latency is log-normal around --latency-ms. Each phase of the
+run adds a fault profile: a share of calls that fail with a retryable error (a 503 for
+Groq, a reset connection for Calendar) and a share that stall for --stall-s, or until the
+per-attempt timeout the layer passes in. The same seeded phases run with the layer off
+(one attempt, no deadline) and on, and the script prints p50/p95/p99/max and failures per
+phase plus the policy counters and breaker states.
+
+Phases: healthy (also fills the hedge latency window), brownout (errors plus stalls),
+outage (every call fails, the breaker opens and calls fail fast), then recovery after
+BREAKER_RESET (the half-open probe succeeds and the breaker closes).
+
+Usage:
+    python scripts/fake_provider_faults.py [--target groq|google] [--calls 200] [--concurrency 20]
+        [--latency-ms 300] [--error-rate 0.1] [--stall-rate 0.05] [--stall-s 8]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("BREAKER_RESET", "2")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+
+class ServiceUnavailable(Exception):
+    """What the Groq SDK raises for a 503"""
+    status_code = 503
+
+
+class Faults:
+    """Draws one attempt's fate from the current phase's profile"""
+
+    def __init__(self, latency_s, seed):
+        self.latency_s = latency_s
+        self.rng = random.Random(seed)
+        self.profile = {"error_rate": 0.0, "stall_rate": 0.0, "stall_s": 0.0}
+        self.attempts = 0
+
+    def draw(self, timeout):
+        """(seconds to wait, whether to fail) for one attempt; timeout=None waits it out"""
+        self.attempts += 1
+        roll = self.rng.random()
+        if roll < self.profile["error_rate"]:
+            return self.latency_s * self.rng.uniform(0.1, 0.5), True
+        if roll < self.profile["error_rate"] + self.profile["stall_rate"]:
+            wait = self.profile["stall_s"]
+        else:
+            wait = self.latency_s * self.rng.lognormvariate(0, 0.3)
+        if timeout is not None and wait > timeout:
+            return timeout, "timeout"
+        return wait, False
+
+
+def _completion():
+    content = '{"intent": "list_events", "confidence": 0.95}'
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=None)
+
+
+class FakeAsyncGroq:
+    def __init__(self, faults):
+        self.faults = faults
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, timeout=None, **kwargs):
+        wait, fail = self.faults.draw(timeout)
+        await asyncio.sleep(wait)
+        if fail == "timeout":
+            raise TimeoutError("request timed out")
+        if fail:
+            raise ServiceUnavailable("503 Service Unavailable")
+        return _completion()
+
+
+class FakeCalendarRead:
+    """Stands in for an events.list HttpRequest; the socket timeout bounds each attempt"""
+    method = "GET"
+    http = SimpleNamespace(credentials=None)
+
+    def __init__(self, faults):
+        self.faults = faults
+
+    def execute(self, http=None):
+        wait, fail = self.faults.draw(app.GOOGLE_HTTP_TIMEOUT if app.RESILIENCE_ENABLED else None)
+        time.sleep(wait)
+        if fail == "timeout":
+            raise TimeoutError("timed out")
+        if fail:
+            raise ConnectionResetError("Connection reset by peer")
+        return {"items": []}
+
+
+def reset_policies():
+    """Fresh breakers, counters and latency windows for each mode"""
+    app.groq_policies = {tier: app.ResiliencePolicy(f"Groq ({model})", app.GROQ_DEADLINE, app.groq_retryable)
+                         for tier, model in app.LLM_MODELS.items()}
+    app.google_policy = app.ResiliencePolicy("Google Calendar", app.GOOGLE_DEADLINE, app.google_retryable,
+                                             hedge=True)
+    app.google_http = lambda credentials: None  # the fake ignores the connection it is handed
+
+
+async def run_groq_phase(calls, concurrency):
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            # other errors are swallowed into the classify fallback; an outage is raised
+            try:
+                result = await app.llm_call_async("classify", "what's on my calendar")
+            except app.ProviderUnavailable:
+                result = {}
+            latencies.append(time.perf_counter() - started)
+            failures += result.get("intent") != "list_events"
+
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, failures
+
+
+def run_google_phase(calls, concurrency, faults):
+    latencies, failures = [], 0
+
+    def one():
+        nonlocal failures
+        started = time.perf_counter()
+        try:
+            app.google_execute(FakeCalendarRead(faults))
+        except Exception:
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(one) for _ in range(calls)]:
+            future.result()
+    return latencies, failures
+
+
+def report(label, latencies, failures, elapsed):
+    latencies = sorted(latencies)
+
+    def quantile(q):
+        return latencies[int(q * (len(latencies) - 1))] * 1000
+
+    print(f"  {label:<10} {len(latencies):>5} calls {elapsed:>6.1f}s   p50 {statistics.median(latencies) * 1000:>6.0f}"
+          f"   p95 {quantile(0.95):>6.0f}   p99 {quantile(0.99):>6.0f}   max {latencies[-1] * 1000:>6.0f} ms"
+          f"   failed {failures}")
+
+
+def run_mode(args, enabled):
+    app.RESILIENCE_ENABLED = enabled
+    reset_policies()
+    faults = Faults(args.latency_ms / 1000, args.seed)
+    app.async_groq_client = FakeAsyncGroq(faults)
+
+    phases = [
+        ("healthy", {"error_rate": 0.0, "stall_rate": 0.0}),
+        ("brownout", {"error_rate": args.error_rate, "stall_rate": args.stall_rate}),
+        ("outage", {"error_rate": 1.0, "stall_rate": 0.0}),
+        ("recovery", {"error_rate": 0.0, "stall_rate": 0.0}),
+    ]
+
+    def run_phase(name, calls, concurrency):
+        faults.attempts = 0
+        started = time.perf_counter()
+        if args.target == "groq":
+            latencies, failures = asyncio.run(run_groq_phase(calls, concurrency))
+        else:
+            latencies, failures = run_google_phase(calls, concurrency, faults)
+        report(name, latencies, failures, time.perf_counter() - started)
+        print(f"  {'':<10} {faults.attempts} attempts reached the provider")
+
+    print(f"resilience {'on' if enabled else 'off'}:")
+    for name, profile in phases:
+        faults.profile = dict(profile, stall_s=args.stall_s)
+        if name == "recovery":
+            # past the reset timeout the breaker lets one probe through; the rest would fail fast
+            # until it answers, so send it on its own
+            time.sleep(app.BREAKER_RESET)
+            run_phase("probe", 1, 1)
+        run_phase(name, args.calls, args.concurrency)
+
+    if enabled:
+        stats = app.resilience_stats()
+        names = [f"groq:{tier}" for tier in app.LLM_MODELS] if args.target == "groq" else ["google"]
+        for name in names:
+            print(f"  {name}: {stats[name]}")
+    print()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--target", choices=["groq", "google"], default="groq")
+    ap.add_argument("--calls", type=int, default=200, help="calls per phase")
+    ap.add_argument("--concurrency", type=int, default=20)
+    ap.add_argument("--latency-ms", type=float, default=300)
+    ap.add_argument("--error-rate", type=float, default=0.1)
+    ap.add_argument("--stall-rate", type=float, default=0.05)
+    ap.add_argument("--stall-s", type=float, default=8)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    print(f"stand-in {args.target}: {args.latency_ms:.0f} ms typical, brownout {args.error_rate:.0%} errors "
+          f"+ {args.stall_rate:.0%} stalls of {args.stall_s:.0f}s, breaker reset {app.BREAKER_RESET:.0f}s\n")
+    run_mode(args, enabled=False)
+    run_mode(args, enabled=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Train and evaluate the local intent classifier.
+
+Training data is JSONL with {"text", "intent"} per line, optionally with the LLM's
+"confidence" and "latency_ms": scripts/intent_seed.jsonl, plus whatever the app has
+logged to INTENT_LOG_PATH. Later files win when the same normalized text appears twice.
+
+    python scripts/train_intent_classifier.py train --data scripts/intent_seed.jsonl intent_log.jsonl
+    python scripts/train_intent_classifier.py eval --data intent_log.jsonl [--llm]
+
+`train` holds out a split, reports how often the model agrees with the labels and how
+much traffic clears the confidence threshold, then refits on everything and saves the
+artifact the app loads at startup (INTENT_MODEL_PATH). `eval` reports the same against
+a saved model; with --llm it also asks Groq live and compares agreement and latency.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+
+os.environ.setdefault("GROQ_API_KEY", "bench")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import app
+
+
+def load_examples(paths, min_confidence):
+    examples = {}
+    llm_latencies = []
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record.get("confidence", 1.0) < min_confidence or record.get("intent") not in app.INTENTS:
+                    continue
+                text = app.normalize_message(record["text"])
+                if text:
+                    examples[text] = record["intent"]
+                if "latency_ms" in record:
+                    llm_latencies.append(record["latency_ms"])
+    return list(examples.items()), llm_latencies
+
+
+def report(model, examples, threshold, destructive_threshold, llm_latencies=None):
+    covered = agreed = covered_agreed = 0
+    confusion = Counter()
+    started = time.perf_counter()
+    for text, label in examples:
+        intent, confidence = model.predict(text)
+        agreed += intent == label
+        if app.accept_local_intent(text, intent, confidence, threshold, destructive_threshold):
+            covered += 1
+            covered_agreed += intent == label
+        if intent != label:
+            confusion[(label, intent)] += 1
+    local_us = (time.perf_counter() - started) / max(1, len(examples)) * 1e6
+
+    total = max(1, len(examples))
+    print(f"  examples:            {len(examples)}")
+    print(f"  agreement (all):     {agreed / total:.1%}")
+    print(f"  handled locally:     {covered / total:.1%} at threshold {threshold} "
+          f"({destructive_threshold} for delete/update)")
+    print(f"  agreement (local):   {covered_agreed / max(1, covered):.1%}")
+    print(f"  local latency:       {local_us:.0f} µs/message")
+    if llm_latencies:
+        print(f"  LLM latency (p50):   {statistics.median(llm_latencies):.0f} ms (logged)")
+    for (label, intent), count in confusion.most_common(5):
+        print(f"  confused {label} → {intent}: {count}")
+
+
+def train(args):
+    examples, llm_latencies = load_examples(args.data, args.min_confidence)
+    if len(examples) < 10:
+        sys.exit(f"need at least 10 examples, got {len(examples)}")
+    random.Random(args.seed).shuffle(examples)
+    split = int(len(examples) * (1 - args.holdout))
+    held_out = examples[split:]
+
+    if held_out:
+        model = app.IntentClassifier.train(examples[:split], epochs=args.epochs, seed=args.seed)
+        print(f"held-out evaluation ({len(held_out)} of {len(examples)}):")
+        report(model, held_out, args.threshold, args.destructive_threshold, llm_latencies)
+
+    model = app.IntentClassifier.train(examples, epochs=args.epochs, seed=args.seed)
+    model.save(args.out, metadata={
+        "examples": len(examples),
+        "intents": dict(Counter(intent for _, intent in examples)),
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    })
+    print(f"saved {args.out} ({len(model.weights)} features, {os.path.getsize(args.out) / 1024:.0f} KB)")
+
+
+def evaluate(args):
+    model = app.IntentClassifier.load(args.model)
+    examples, llm_latencies = load_examples(args.data, args.min_confidence)
+    print(f"{args.model} against logged labels:")
+    report(model, examples, args.threshold, args.destructive_threshold, llm_latencies)
+    if not args.llm:
+        return
+
+    agreed, latencies = 0, []
+    for text, _ in examples:
+        started = time.perf_counter()
+        llm_intent = app.llm_call("classify", text).get("intent")
+        latencies.append((time.perf_counter() - started) * 1000)
+        agreed += model.predict(text)[0] == llm_intent
+    print("live LLM comparison:")
+    print(f"  agreement:           {agreed / max(1, len(examples)):.1%}")
+    print(f"  LLM latency p50/p95: {statistics.median(latencies):.0f} / "
+          f"{sorted(latencies)[int(0.95 * (len(latencies) - 1))]:.0f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    train_ap = sub.add_parser("train")
+    train_ap.add_argument("--data", nargs="+", default=[os.path.join(os.path.dirname(__file__), "intent_seed.jsonl")])
+    train_ap.add_argument("--out", default=app.INTENT_MODEL_PATH)
+    train_ap.add_argument("--holdout", type=float, default=0.2)
+    train_ap.add_argument("--epochs", type=int, default=30)
+    train_ap.add_argument("--seed", type=int, default=0)
+    train_ap.set_defaults(func=train)
+
+    eval_ap = sub.add_parser("eval")
+    eval_ap.add_argument("--data", nargs="+", required=True)
+    eval_ap.add_argument("--model", default=app.INTENT_MODEL_PATH)
+    eval_ap.add_argument("--llm", action="store_true", help="also classify every example with Groq")
+    eval_ap.set_defaults(func=evaluate)
+
+    for parser in (train_ap, eval_ap):
+        parser.add_argument("--threshold", type=float, default=app.INTENT_LOCAL_THRESHOLD)
+        parser.add_argument("--destructive-threshold", type=float, default=app.INTENT_LOCAL_DESTRUCTIVE_THRESHOLD)
+        parser.add_argument("--min-confidence", type=float, default=0.7,
+                            help="skip logged labels the LLM itself was unsure of")
+
+    args = ap.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()